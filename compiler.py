@@ -0,0 +1,195 @@
+from __future__ import annotations
+from typing import Callable, TypeAlias
+from machine import Machine, Closure, Env, Value, Partial, Stuck, push, lookup
+from pgsn_term import Term, Variable, Abs, App, BuiltinFunction
+
+
+# Compiler of nameless terms to Python closures.
+# The code of a term performs the transitions of the environment machine (machine.py) on the term
+# without inspecting its structure.  Code returns either a weak head normal form, or the code to run next
+# with its environment, so that a long chain of beta-reductions does not grow the Python stack.
+# Builtins are applied through the machine, and the terms they return are compiled on demand.
+
+Result: TypeAlias = "Value | Partial | Stuck | tuple[Code, Env | None]"
+Code: TypeAlias = "Callable[[Machine, Env | None, int, list[Closure]], Result]"
+
+
+# Compiled code of terms, keyed by the identity of the term.
+# Entries keep their terms alive, so that identities are not reused while they are cached.
+class CompileCache:
+    def __init__(self, limit: int = 100000):
+        self.limit = limit
+        self._codes: dict[int, tuple[Term, Code]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def size(self) -> int:
+        return len(self._codes)
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return 0.0 if total == 0 else self.hits / total
+
+    def clear(self):
+        self._codes.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def code(self, term: Term) -> Code:
+        entry = self._codes.get(id(term))
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        if len(self._codes) >= self.limit:
+            self._codes.clear()
+        code = self._compile(term)
+        self._codes[id(term)] = (term, code)
+        return code
+
+    # Terms returned by builtins are mostly fresh and used once, so they are not cached.
+    # Caching them keeps large intermediate lists and records alive.
+    def transient_code(self, term: Term) -> Code:
+        entry = self._codes.get(id(term))
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+        return self._compile(term)
+
+    def _compile(self, term: Term) -> Code:
+        match term:
+            case App():
+                return self._compile_app(term)
+            case Variable():
+                return self._compile_variable(term)
+            case Abs():
+                return self._compile_abs(term)
+            case BuiltinFunction():
+                return self._compile_builtin(term)
+            case _:
+                return self._compile_data(term)
+
+    # Children are compiled on the first run.
+    # With sharing, a closed argument is a single closure shared by all the runs of the code in a machine,
+    # so that it is evaluated at most once in an evaluation.  Only the code is cached across evaluations.
+    def _compile_app(self, term: App) -> Code:
+        c = term.to_context()
+        head, args = c.head, tuple(reversed(c.args))
+        closed = tuple(arg.is_closed() for arg in args)
+        head_code = None
+
+        def run(m: CompiledMachine, env: Env | None, depth: int, stack: list[Closure]) -> Result:
+            nonlocal head_code
+            if m.sharing:
+                stack.extend([m.shared(arg) if is_closed else Closure(term=arg, env=env)
+                              for arg, is_closed in zip(args, closed)])
+            else:
+                stack.extend([Closure(term=arg, env=env) for arg in args])
+            if head_code is None:
+                head_code = self.code(head)
+            return head_code(m, env, depth, stack)
+        return run
+
+    def _compile_variable(self, term: Variable) -> Code:
+        num = term.num
+
+        def run(m: Machine, env: Env | None, depth: int, stack: list[Closure]) -> Result:
+            value = lookup(env, num)
+            if not isinstance(value, Closure):
+                return Stuck(head=m.variable(env, num, value, depth), args=tuple(reversed(stack)))
+            if not m.sharing:
+                return self.code(value.term), value.env
+            r = m.enter_shared(value, depth, stack)
+            if isinstance(r, Stuck):
+                return r
+            return self.code(r[0]), r[1]
+        return run
+
+    def _compile_abs(self, term: Abs) -> Code:
+        body = term.t
+        body_code = None
+
+        def run(m: Machine, env: Env | None, depth: int, stack: list[Closure]) -> Result:
+            nonlocal body_code
+            if len(stack) == 0:
+                return Value(term=term, env=env)
+            m.tick(term)
+            env = push(env, stack.pop())
+            if body_code is None:
+                body_code = self.code(body)
+            if isinstance(body, Abs):
+                return body_code(m, env, depth, stack)
+            return body_code, env
+        return run
+
+    def _compile_builtin(self, term: BuiltinFunction) -> Code:
+        def run(m: Machine, env: Env | None, depth: int, stack: list[Closure]) -> Result:
+            if len(stack) == 0:
+                return Value(term=term, env=env)
+            r = m.apply_stack(term, env, depth, stack)
+            if not isinstance(r, tuple):
+                return r
+            return self.transient_code(r[0]), r[1]
+        return run
+
+    def _compile_data(self, term: Term) -> Code:
+        def run(m: Machine, env: Env | None, depth: int, stack: list[Closure]) -> Result:
+            if len(stack) == 0:
+                return Value(term=term, env=env)
+            return Stuck(head=term, args=tuple(reversed(stack)))
+        return run
+
+
+cache = CompileCache()
+
+
+# The environment machine running compiled code.  Read-back and normal forms are inherited.
+class CompiledMachine(Machine):
+    def __init__(self, steps: int, sharing: bool = True, compile_cache: CompileCache | None = None,
+                 normal_forms=None):
+        super().__init__(steps, sharing, normal_forms)
+        self.cache = cache if compile_cache is None else compile_cache
+        # id -> the closure of a closed argument in the compiled code, shared in this machine
+        self._shared: dict[int, Closure] = {}
+
+    def shared(self, term: Term) -> Closure:
+        c = self._shared.get(id(term))
+        if c is None:
+            c = self._shared[id(term)] = Closure(term=term, env=None)
+        return c
+
+    def whnf(self, term: Term, env: Env | None, depth: int, stack: list[Closure] | None = None) \
+            -> Value | Partial | Stuck:
+        stack = [] if stack is None else stack
+        code = self.cache.code(term)
+        while True:
+            r = code(self, env, depth, stack)
+            if not isinstance(r, tuple):
+                return r
+            code, env = r
+
+
+# A compiled term, which is applied to argument terms
+class Compiled:
+    def __init__(self, term: Term, sharing: bool = True, compile_cache: CompileCache | None = None):
+        assert not term.is_named
+        self.term = term
+        self.sharing = sharing
+        self.cache = cache if compile_cache is None else compile_cache
+        self.cache.code(term)
+
+    # The normal form of self.term(args[0])...(args[n-1])
+    def __call__(self, *args: Term, steps: int = 1000) -> Term:
+        assert all(not arg.is_named for arg in args)
+        m = CompiledMachine(steps, self.sharing, self.cache)
+        stack = [Closure(term=arg, env=None) for arg in reversed(args)]
+        return m.nf_whnf(m.whnf(self.term, None, 0, stack), 0)
+
+
+def compile_term(term: Term, sharing: bool = True) -> Compiled:
+    return Compiled(term, sharing)
+
+
+def fully_eval(term: Term, steps: int = 1000) -> Term:
+    assert not term.is_named
+    return CompiledMachine(steps).count(term)
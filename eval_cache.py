@@ -0,0 +1,297 @@
+from __future__ import annotations
+import hashlib
+import importlib
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+import attrs
+import helpers
+import pgsn_term
+import prelude
+import serialize
+from pgsn_term import Term, Attributes, Delegated, Terms, Abs, App, List, Record, evaluation_engine
+
+# Caches of normal forms, keyed by the structural digest of nameless terms.
+# Evaluation looks up the term, and the closed applications the reducer reaches, which are evaluated and stored
+# if they are not found.  So a term sharing subterms with a term evaluated before, for example in a previous run,
+# only reduces the parts which have changed.  Only the machine engines reach the closed applications one by one,
+# so that the stores evaluate by need unless another engine is given.
+# EvalCache is a persistent store in an SQLite database, bounded by the number of entries and evicted
+# in the LRU order.  Incremental keeps the normal forms of the last evaluation in memory.
+
+
+# Digests are Merkle hashes over the class and the fields compared by equality, so that meta_info is ignored.
+# Digests of the subterms are memoized in memo, id -> (term, digest).
+# known holds digests computed before, which are copied to memo when their terms are met.
+def digest(term: Term, salt: bytes = b'', memo: dict[int, tuple[Term, bytes]] | None = None,
+           known: dict[int, tuple[Term, bytes]] | None = None) -> bytes:
+    memo = {} if memo is None else memo
+    stack = [(term, False)]
+    while stack:
+        t, expanded = stack.pop()
+        if id(t) in memo:
+            continue
+        if known is not None and id(t) in known:
+            memo[id(t)] = known[id(t)]
+            continue
+        fields = [a.name for a in attrs.fields(type(t)) if a.eq]
+        if not expanded:
+            stack.append((t, True))
+            for name in fields:
+                stack.extend((c, False) for c in _children(getattr(t, name)) if id(c) not in memo)
+            continue
+        h = hashlib.blake2b(salt, digest_size=16)
+        h.update(f'{type(t).__module__}.{type(t).__qualname__}'.encode())
+        for name in fields:
+            _update(h, getattr(t, name), memo)
+        memo[id(t)] = (t, h.digest())
+    return memo[id(term)][1]
+
+
+def _children(v):
+    match v:
+        case Term():
+            yield v
+        case tuple() | list() | Terms():
+            for x in v:
+                yield from _children(x)
+        case dict() | Attributes() | Delegated():
+            for x in v.values():
+                yield from _children(x)
+
+
+def _update(h, v, memo: dict[int, tuple[Term, bytes]]):
+    match v:
+        case Term():
+            h.update(b'T')
+            h.update(memo[id(v)][1])
+        case tuple() | list() | Terms():
+            h.update(f'({len(v)}'.encode())
+            for x in v:
+                _update(h, x, memo)
+        case dict() | Attributes() | Delegated():
+            h.update(f'{{{len(v)}'.encode())
+            for k, x in v.items():
+                _update(h, k, memo)
+                _update(h, x, memo)
+        case _:
+            r = repr(v).encode()
+            h.update(f'{type(v).__name__}{len(r)}:'.encode())
+            h.update(r)
+
+
+# Evaluation through a store of normal forms.  Subclasses implement get and put.
+class NormalForms(ABC):
+    def __init__(self, salt: bytes = b''):
+        self.hits = 0
+        self.misses = 0
+        self._salt = salt
+        self._known: dict[int, tuple[Term, bytes]] = {}
+        # Digests of the evaluation in progress
+        self._memo: dict[int, tuple[Term, bytes]] = {}
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return 0.0 if total == 0 else self.hits / total
+
+    @abstractmethod
+    def get(self, key: bytes) -> Term | None:
+        pass
+
+    @abstractmethod
+    def put(self, key: bytes, term: Term):
+        pass
+
+    # The engine used if none is given, the default engine read at each evaluation.
+    # The substitution reducer reduces the closed applications in place, so that their normal forms are neither
+    # stored nor reused, and evaluation by need is used instead of it.
+    @staticmethod
+    def engine() -> str:
+        return 'need' if pgsn_term.default_engine == 'substitution' else pgsn_term.default_engine
+
+    def fully_eval(self, term: Term, steps: int = 1000, engine: str | None = None) -> Term:
+        assert not term.is_named
+        engine = helpers.default(engine, self.engine())
+        # Unknown engines are errors even if the normal form is cached
+        if engine != 'substitution':
+            evaluation_engine(engine)
+        self._memo = {}
+        # As Term.fully_eval, for the builtins evaluating their arguments
+        token = pgsn_term.evaluation.set((steps, engine))
+        try:
+            return self.normal_form(term, lambda: self._eval(term, steps, engine))
+        finally:
+            pgsn_term.evaluation.reset(token)
+
+    # The normal form of a closed term, looked up, otherwise computed and stored
+    def normal_form(self, term: Term, compute: Callable[[], Term]) -> Term:
+        key = digest(term, self._salt, self._memo, self._known)
+        nf = self.get(key)
+        if nf is None:
+            nf = compute()
+            self.put(key, nf)
+        return nf
+
+    # Only the subterms the reducer reaches are looked up, so that the terms it discards are not evaluated.
+    # The machines look up the closed applications they normalize.  With the other engines, the closed applications
+    # are only looked up in the parts of the term which are in its normal form, under abstractions, lists and records.
+    def _eval(self, term: Term, steps: int, engine: str) -> Term:
+        match engine:
+            case 'machine' | 'need':
+                return importlib.import_module('machine').Machine(steps, sharing=engine == 'need',
+                                                                  normal_forms=self).normalize(term)
+            case 'compiled':
+                return importlib.import_module('compiler').CompiledMachine(steps, normal_forms=self).normalize(term)
+        # The term itself has been looked up
+        t = term if isinstance(term, App) else self._resolve(term, steps, engine)
+        return t.fully_eval(steps, engine=engine, cache=False)
+
+    # Replaces the closed applications in the normal form of the term by their normal forms
+    def _resolve(self, term: Term, steps: int, engine: str) -> Term:
+        match term:
+            case App() if term.is_closed():
+                return self.normal_form(term, lambda: term.fully_eval(steps, engine=engine, cache=False))
+            case Abs():
+                t = self._resolve(term.t, steps, engine)
+                return term if t is term.t else term.evolve(t=t)
+            case List():
+                terms = tuple(self._resolve(t, steps, engine) for t in term.terms)
+                return term if all(t1 is t2 for t1, t2 in zip(terms, term.terms)) else \
+                    List.nameless(meta_info=term.meta_info, terms=terms)
+            case Record():
+                return term.map_terms(lambda t: self._resolve(t, steps, engine))
+            case _:
+                return term
+
+
+class EvalCache(NormalForms):
+    # Hits of which the recency is written at once
+    batch = 256
+
+    def __init__(self, path: str, limit: int = 100000):
+        # Normal forms computed with other versions of the library are not used
+        super().__init__(prelude.source_digest().encode())
+        self.path = path
+        self.limit = limit
+        # The connection is opened by each process on its first use, since an SQLite connection must not be used
+        # across fork, for example by the workers of the server or of a batch
+        self._pid: int | None = None
+        self._connection: sqlite3.Connection | None = None
+        self._clock = 0
+        self._size = 0
+        # (used, digest) of the hits not written yet
+        self._used: list[tuple[int, bytes]] = []
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._connection = sqlite3.connect(self.path)
+            self._connection.execute('CREATE TABLE IF NOT EXISTS normal_forms '
+                                     '(digest BLOB PRIMARY KEY, term BLOB NOT NULL, used INTEGER NOT NULL)')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS normal_forms_used ON normal_forms (used)')
+            self._connection.commit()
+            self._clock = self._connection.execute('SELECT COALESCE(MAX(used), 0) FROM normal_forms').fetchone()[0]
+            self._size = self._connection.execute('SELECT COUNT(*) FROM normal_forms').fetchone()[0]
+            # The hits of the parent are written by the parent
+            self._used = []
+        return self._connection
+
+    def size(self) -> int:
+        # Read when the connection is opened
+        self._db
+        return self._size
+
+    def clear(self):
+        with self._db:
+            self._db.execute('DELETE FROM normal_forms')
+        self._size = 0
+        self._used = []
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        if self._pid == os.getpid():
+            with self._connection:
+                self._flush()
+            self._connection.close()
+        self._pid = self._connection = None
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    # Writes the recency of the hits, in a transaction
+    def _flush(self):
+        if self._used:
+            self._db.executemany('UPDATE normal_forms SET used = ? WHERE digest = ?', self._used)
+            self._used = []
+
+    def get(self, key: bytes) -> Term | None:
+        row = self._db.execute('SELECT term FROM normal_forms WHERE digest = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._used.append((self._tick(), key))
+        if len(self._used) >= self.batch:
+            with self._db:
+                self._flush()
+        return serialize.loads(row[0]).mark_normal()
+
+    def put(self, key: bytes, term: Term):
+        with self._db:
+            self._flush()
+            data, used = serialize.dumps(term), self._tick()
+            if self._db.execute('INSERT OR IGNORE INTO normal_forms VALUES (?, ?, ?)', (key, data, used)).rowcount:
+                self._size += 1
+            else:
+                self._db.execute('UPDATE normal_forms SET term = ?, used = ? WHERE digest = ?', (data, used, key))
+            over = self._size - self.limit
+            if over > 0:
+                self._size -= self._db.execute('DELETE FROM normal_forms WHERE digest IN '
+                                               '(SELECT digest FROM normal_forms ORDER BY used LIMIT ?)',
+                                               (over,)).rowcount
+
+
+# Re-evaluation of edited terms.
+# The normal forms stored or used by the last evaluation are kept, and the others are dropped,
+# so that the memory is bounded by the size of the last term.  The digests of the last evaluation are kept too,
+# so that the subterms the edited term shares with the last term are neither hashed nor reduced again.
+class Incremental(NormalForms):
+    def __init__(self):
+        super().__init__()
+        self._previous: dict[bytes, Term] = {}
+        self._current: dict[bytes, Term] = {}
+
+    def size(self) -> int:
+        return len(self._previous)
+
+    def get(self, key: bytes) -> Term | None:
+        nf = self._current.get(key)
+        if nf is None:
+            nf = self._previous.get(key)
+        if nf is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._current[key] = nf
+        return nf
+
+    def put(self, key: bytes, term: Term):
+        self._current[key] = term
+
+    def fully_eval(self, term: Term, steps: int = 1000, engine: str | None = None) -> Term:
+        t = term if not term.is_named else term.remove_name()
+        try:
+            nf = super().fully_eval(t, steps, engine)
+        except Exception:
+            # The normal forms computed before the failure are kept
+            self._previous.update(self._current)
+            self._known.update(self._memo)
+            self._current = {}
+            raise
+        self._previous, self._current = self._current, {}
+        self._known = self._memo
+        return nf
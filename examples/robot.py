@@ -1,7 +1,6 @@
 import sys
 
 sys.path.append("..")
-import json
 from gsn_term import *
 import gsn
 
@@ -49,4 +48,5 @@ if __name__ == '__main__':
     #print(s('sub_goals').fully_eval())
     print(system.fully_eval(steps=10000))
     n = gsn.pgsn_to_gsn(system, steps=10000)
-    print(json.dumps(gsn.python_val(n), sort_keys=True, indent=4))
+    gsn.write_json(n, sys.stdout, sort_keys=True, indent=4)
+    print()
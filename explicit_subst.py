@@ -0,0 +1,203 @@
+from __future__ import annotations
+from attrs import frozen, field
+import helpers
+from pgsn_term import Term, Variable, Abs, App, BuiltinFunction, List, Record, LambdaInterpreterError, \
+    NamingContext, not_none, non_negative
+
+
+# Explicit substitutions (lambda sigma calculus).
+# beta-reduction (\ a) b produces the closure a[b . id] instead of substituting b into a.
+# The substitution is pushed one level down only when the reducer or a builtin inspects the term.
+
+# The substitution t_0 . t_1 ... t_{n-1} . shift^k
+# maps the index i < n to t_i, and i >= n to i - n + k.
+@frozen
+class Substitution:
+    terms: tuple[Term, ...] = field(default=(), validator=not_none)
+    shift: int = field(default=0, validator=non_negative)
+
+    def is_identity(self) -> bool:
+        return len(self.terms) == 0 and self.shift == 0
+
+    def lookup(self, num: int) -> Term:
+        if num < len(self.terms):
+            return self.terms[num]
+        return Variable.nameless(num=num - len(self.terms) + self.shift)
+
+    # The substitution used under a binder: 0 . (self o shift)
+    def lift(self) -> Substitution:
+        up = Substitution(shift=1)
+        return Substitution(terms=(Variable.nameless(num=0),) + tuple(substituted(t, up) for t in self.terms),
+                            shift=self.shift + 1)
+
+    # The substitution applying self, then other
+    def compose(self, other: Substitution) -> Substitution:
+        return Substitution(
+            terms=tuple(substituted(t, other) for t in self.terms) + other.terms[self.shift:],
+            shift=other.shift + max(0, self.shift - len(other.terms)))
+
+    # The maximum free index of t[self]
+    def max_free_index(self, t: Term) -> int:
+        m = t.max_free_index()
+        from_terms = max((u.max_free_index() for u in self.terms[:m + 1]), default=-1)
+        from_shift = m - len(self.terms) + self.shift if m >= len(self.terms) else -1
+        return max(from_terms, from_shift)
+
+
+# The closure t[sigma].  Equal to the term obtained by pushing all the substitutions.
+@frozen(eq=False)
+class Substituted(Term):
+    t: Term = field(validator=not_none)
+    sigma: Substitution = field(validator=not_none)
+
+    def __eq__(self, other):
+        if not isinstance(other, Term):
+            return NotImplemented
+        return force(self) == force(other)
+
+    def __hash__(self):
+        return hash(force(self))
+
+    # Push the substitution one level down.  The result is not Substituted.
+    def expose(self) -> Term:
+        t, sigma = self.t, self.sigma
+        match t:
+            case Variable():
+                u = sigma.lookup(t.num)
+                return u.expose() if isinstance(u, Substituted) else u
+            case Abs():
+                return t.evolve(t=substituted(t.t, sigma.lift()))
+            case App():
+                return t.evolve(t1=substituted(t.t1, sigma), t2=substituted(t.t2, sigma))
+            case List():
+                return List.nameless(meta_info=t.meta_info, terms=tuple(substituted(u, sigma) for u in t.terms))
+            case Record():
+                return t.evolve(attributes={label: substituted(u, sigma) for label, u in t.attributes().items()})
+            case _:
+                return t
+
+    def _eval_or_none(self):
+        return self.expose()
+
+    def _shift(self, num: int, cutoff: int) -> Term:
+        return self.expose().shift(num, cutoff)
+
+    def _subst_or_none(self, variable: int, term: Term) -> Term | None:
+        return self.expose().subst(variable, term)
+
+    def _free_variables(self) -> set[str]:
+        assert False
+
+    def _remove_name_with_context(self, context: NamingContext) -> Term:
+        assert False
+
+    def _max_free_index(self) -> int:
+        return self.sigma.max_free_index(self.t)
+
+
+def substituted(t: Term, sigma: Substitution) -> Term:
+    if sigma.is_identity() or t.is_closed():
+        return t
+    match t:
+        case Substituted():
+            return substituted(t.t, t.sigma.compose(sigma))
+        case Variable():
+            return sigma.lookup(t.num)
+        case _:
+            return Substituted.nameless(t=t, sigma=sigma)
+
+
+# Push all substitutions
+def force(t: Term) -> Term:
+    match t:
+        case Substituted():
+            return force(t.expose())
+        case Abs():
+            return t.evolve(t=force(t.t))
+        case App():
+            return t.evolve(t1=force(t.t1), t2=force(t.t2))
+        case List():
+            return List.nameless(meta_info=t.meta_info, terms=tuple(force(u) for u in t.terms))
+        case Record():
+            return t.evolve(attributes={label: force(u) for label, u in t.attributes().items()})
+        case _:
+            return t
+
+
+# Leftmost outermost reduction, the same strategy as Term.fully_eval.
+# Pushing a substitution is not a reduction, so the reducer continues on the exposed term.
+class Reducer:
+    def __init__(self, steps: int):
+        self.steps = steps
+        self.reductions = 0
+
+    def tick(self, term: Term):
+        self.reductions += 1
+        if self.reductions > self.steps:
+            raise LambdaInterpreterError('Reduction did not terminate', term)
+
+    # The exposed term is returned even if it does not reduce
+    def step_exposed(self, exposed: Term) -> Term:
+        return helpers.default(self.step(exposed), exposed)
+
+    def step(self, t: Term) -> Term | None:
+        match t:
+            case Substituted():
+                return self.step_exposed(t.expose())
+            case App():
+                return self.step_context(t)
+            case Abs():
+                body = self.step(t.t)
+                return None if body is None else t.evolve(t=body)
+            case List():
+                stepped = [self.step(u) for u in t.terms]
+                if all(u is None for u in stepped):
+                    return None
+                return List.nameless(meta_info=t.meta_info,
+                                     terms=tuple(u if s is None else s for u, s in zip(t.terms, stepped)))
+            case Record():
+                stepped = {label: self.step(u) for label, u in t.attributes().items()}
+                if all(u is None for u in stepped.values()):
+                    return None
+                return t.evolve(attributes={label: u if stepped[label] is None else stepped[label]
+                                            for label, u in t.attributes().items()})
+            case _:
+                return None
+
+    def step_context(self, t: App) -> Term | None:
+        c = t.to_context()
+        head, args = c.head, c.args
+        if isinstance(head, Substituted):
+            return self.step_exposed(c.evolve(head=head.expose()).to_term())
+        if isinstance(head, Abs) and len(args) > 0:
+            self.tick(t)
+            return c.evolve(head=substituted(head.t, Substitution(terms=(args[0],))), args=args[1:]).to_term()
+        if isinstance(head, BuiltinFunction):
+            # Builtins inspect the top of the arguments
+            if any(isinstance(arg, Substituted) for arg in args):
+                exposed = tuple(arg.expose() if isinstance(arg, Substituted) else arg for arg in args)
+                return self.step_exposed(c.evolve(args=exposed).to_term())
+            if head.applicable_args(args):
+                self.tick(t)
+                reduced, rest = head.apply_args(args)
+                return c.evolve(head=reduced, args=rest).to_term()
+        head_reduced = self.step(head)
+        if head_reduced is not None:
+            return c.evolve(head=head_reduced).to_term()
+        for i, arg in enumerate(args):
+            arg_reduced = self.step(arg)
+            if arg_reduced is not None:
+                return c.evolve(args=args[:i] + (arg_reduced,) + args[i + 1:]).to_term()
+        return None
+
+    def fully_eval(self, t: Term) -> Term:
+        while True:
+            t_reduced = self.step(t)
+            if t_reduced is None:
+                return t
+            t = t_reduced
+
+
+def fully_eval(term: Term, steps: int = 1000) -> Term:
+    assert not term.is_named
+    return Reducer(steps).fully_eval(term)
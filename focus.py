@@ -0,0 +1,202 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from pgsn_term import Term, Abs, App, BuiltinFunction, List, Record, LambdaInterpreterError
+
+
+# Focused reducer.
+# Performs exactly the same steps as Term.fully_eval, but every node of the path to the redex
+# keeps a cursor pointing to the position under reduction.  The next step continues from the
+# cursor instead of searching the redex from the root, and subterms already found normal are
+# never visited again.  Terms are rebuilt only on the path to the redex, and only when needed.
+
+class Reducer:
+    def __init__(self):
+        self.steps = 0
+        # id -> term known to be in the normal form.  The term is kept to make the id stable.
+        self._normal: dict[int, Term] = {}
+
+    def is_known_normal(self, term: Term) -> bool:
+        return id(term) in self._normal
+
+    def mark_normal(self, term: Term):
+        self._normal[id(term)] = term
+
+    def cursor(self, term: Term) -> Cursor | None:
+        if self.is_known_normal(term):
+            return None
+        match term:
+            case App():
+                c = term.to_context()
+                return SpineCursor(self, c.head, list(c.args))
+            case Abs():
+                return AbsCursor(self, term)
+            case List():
+                return ListCursor(self, term)
+            case Record():
+                return RecordCursor(self, term)
+            case _:
+                return None
+
+    def fully_eval(self, term: Term, steps: int) -> Term:
+        c = self.cursor(term)
+        if c is None:
+            return term
+        for _ in range(steps):
+            if not c.step():
+                return c.to_term()
+            self.steps += 1
+        raise LambdaInterpreterError('Reduction did not terminate', c.to_term())
+
+
+class Cursor(ABC):
+    def __init__(self, reducer: Reducer):
+        self.reducer = reducer
+        self._term: Term | None = None
+
+    # One step of the reduction.  False if the term is in the normal form.
+    @abstractmethod
+    def _step(self) -> bool:
+        pass
+
+    def step(self) -> bool:
+        progressed = self._step()
+        if progressed:
+            self._term = None
+        else:
+            self.reducer.mark_normal(self.to_term())
+        return progressed
+
+    @abstractmethod
+    def _to_term(self) -> Term:
+        pass
+
+    def to_term(self) -> Term:
+        if self._term is None:
+            self._term = self._to_term()
+        return self._term
+
+
+# Evaluation context head(args[0])...(args[n-1]), where head is not an application.
+# Positions before self.position are in the normal form.  Position -1 is the head.
+class SpineCursor(Cursor):
+    def __init__(self, reducer: Reducer, head: Term, args: list[Term]):
+        super().__init__(reducer)
+        self.reset(head, args)
+
+    def reset(self, head: Term, args: list[Term]):
+        while isinstance(head, App):
+            args.insert(0, head.t2)
+            head = head.t1
+        self.head = head
+        self.args = args
+        self.position = -1
+        self.child: Cursor | None = None
+        self.child_started = False
+
+    def _at(self, position: int) -> Term:
+        return self.head if position < 0 else self.args[position]
+
+    def _sync_child(self):
+        if self.child is not None:
+            if self.position < 0:
+                self.head = self.child.to_term()
+            else:
+                self.args[self.position] = self.child.to_term()
+
+    def _step(self) -> bool:
+        if isinstance(self.head, Abs) and len(self.args) > 0:
+            head_substituted = self.head.t.subst(0, self.args[0].shift(1, 0)).shift(-1, 0)
+            self.reset(head_substituted, self.args[1:])
+            return True
+        if isinstance(self.head, BuiltinFunction):
+            self._sync_child()
+            if self.head.applicable_args(tuple(self.args)):
+                reduced, rest = self.head.apply_args(tuple(self.args))
+                self.reset(reduced, list(rest))
+                return True
+        while self.position < len(self.args):
+            if not self.child_started:
+                self.child = self.reducer.cursor(self._at(self.position))
+                self.child_started = True
+            if self.child is not None and self.child.step():
+                return True
+            self._sync_child()
+            self.position += 1
+            self.child = None
+            self.child_started = False
+        return False
+
+    def _to_term(self) -> Term:
+        self._sync_child()
+        term = self.head
+        for arg in self.args:
+            term = term(arg)
+        return term
+
+
+class AbsCursor(Cursor):
+    def __init__(self, reducer: Reducer, term: Abs):
+        super().__init__(reducer)
+        self.abs = term
+        self.child = reducer.cursor(term.t)
+
+    def _step(self) -> bool:
+        return self.child is not None and self.child.step()
+
+    def _to_term(self) -> Term:
+        if self.child is None:
+            return self.abs
+        return self.abs.evolve(t=self.child.to_term())
+
+
+# All elements are reduced in parallel in one step, as List._eval_or_none does.
+class ListCursor(Cursor):
+    def __init__(self, reducer: Reducer, term: List):
+        super().__init__(reducer)
+        self.list = term
+        self.terms = list(term.terms)
+        self.children = {i: c for i, c in enumerate(reducer.cursor(t) for t in term.terms) if c is not None}
+
+    def _step(self) -> bool:
+        progressed = False
+        for i, c in list(self.children.items()):
+            if c.step():
+                progressed = True
+            else:
+                self.terms[i] = c.to_term()
+                del self.children[i]
+        return progressed
+
+    def _to_term(self) -> Term:
+        for i, c in self.children.items():
+            self.terms[i] = c.to_term()
+        return List.nameless(meta_info=self.list.meta_info, terms=tuple(self.terms))
+
+
+class RecordCursor(Cursor):
+    def __init__(self, reducer: Reducer, term: Record):
+        super().__init__(reducer)
+        self.record = term
+        self.attributes = term.attributes().copy()
+        self.children = {label: c for label, c in ((label, reducer.cursor(t)) for label, t in self.attributes.items())
+                         if c is not None}
+
+    def _step(self) -> bool:
+        progressed = False
+        for label, c in list(self.children.items()):
+            if c.step():
+                progressed = True
+            else:
+                self.attributes[label] = c.to_term()
+                del self.children[label]
+        return progressed
+
+    def _to_term(self) -> Term:
+        for label, c in self.children.items():
+            self.attributes[label] = c.to_term()
+        return self.record.evolve(attributes=self.attributes)
+
+
+def fully_eval(term: Term, steps: int = 1000) -> Term:
+    assert not term.is_named
+    return Reducer().fully_eval(term, steps)
@@ -1,32 +1,50 @@
 from __future__ import annotations
+import argparse
+import functools
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import runpy
+import sys
+import time
 import uuid
 from abc import ABC, abstractmethod
+from typing import Callable, Iterator, Sequence, TextIO
 from attrs import field, frozen
 import helpers
 import pgsn_term
-import stdlib
+import prelude
 
 
 @frozen
 class GSN(ABC):
     description: str = field(validator=helpers.not_none)
 
+    # The part of this node, without its children
     @abstractmethod
-    def gsn_parts(self, parent_id: str, my_id: str) -> list[dict[str, str]]:
+    def part(self, parent_id: str, my_id: str, children_ids: list[str]) -> dict[str, str]:
         pass
 
+    def children(self) -> Sequence[GSN]:
+        return ()
+
+    def gsn_parts(self, parent_id: str, my_id: str) -> list[dict[str, str]]:
+        return list(iter_parts(self, parent_id, my_id))
+
 
 @frozen
 class Assumption(GSN):
 
-    def gsn_parts(self, parent_id, my_id):
+    def part(self, parent_id, my_id, children_ids):
         raise NotImplemented
 
 
 @frozen
 class Context(GSN):
 
-    def gsn_parts(self, parent_id, my_id):
+    def part(self, parent_id, my_id, children_ids):
         raise NotImplemented
 
 
@@ -37,20 +55,20 @@ class Support(GSN, ABC):
 
 @frozen
 class Undeveloped(Support):
-    def gsn_parts(self, parent_id, my_id):
+    def part(self, parent_id, my_id, children_ids):
         raise NotImplemented
 
 
 @frozen
 class Evidence(Support):
-    def gsn_parts(self, parent_id, my_id):
-        return [{
+    def part(self, parent_id, my_id, children_ids):
+        return {
                 "partsID": my_id,
                 "parent": parent_id,
-                "children": [],
+                "children": children_ids,
                 "kind": "Evidence",
                 "detail": self.description,
-            }]
+            }
 
 
 @frozen
@@ -62,19 +80,17 @@ class Strategy(Support):
         if len(v) == 0:
             raise ValueError('Strategy must have more than one sub-goals')
 
-    def gsn_parts(self, parent_id, my_id):
-        children_ids = [str(uuid.uuid4()) for _ in range(len(self.sub_goals))]
-        parts = [{
+    def part(self, parent_id, my_id, children_ids):
+        return {
             "partsID": my_id,
             "parent": parent_id,
             "children": children_ids,
             "kind": "Strategy",
             "detail": self.description,
-        }]
-        for i in range(len(self.sub_goals)):
-            part = self.sub_goals[i].gsn_parts(my_id, children_ids[i])
-            parts = parts + part
-        return parts
+        }
+
+    def children(self):
+        return self.sub_goals
 
 
 @frozen
@@ -83,70 +99,264 @@ class Goal(GSN):
     contexts: tuple[Context,...] = field()
     support: Support = field(validator=helpers.not_none)
 
-    def gsn_parts(self, parent_id, my_id):
-        support_id = str(uuid.uuid4())
-        return [
-            {'partsID': my_id,
-             'parent': parent_id,
-             'children': [support_id],
-             'kind': 'Goal',
-             'detail': self.description}
-        ] + self.support.gsn_parts(parent_id=my_id, my_id=support_id)
+    def part(self, parent_id, my_id, children_ids):
+        return {'partsID': my_id,
+                'parent': parent_id,
+                'children': children_ids,
+                'kind': 'Goal',
+                'detail': self.description}
+
+    def children(self):
+        return self.support,
+
+
+# IDs are derived from the ID of the parent, the position among the siblings and the content of the node,
+# so that the same tree has the same IDs in every run and an edit only changes the IDs below the edited node
+root_parent_id = str(uuid.UUID(int=0))
+
+
+def node_id(parent_id: str, index: int, node: GSN) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f'{parent_id}/{index}/{type(node).__name__}/{len(node.description)}:'.encode())
+    h.update(node.description.encode())
+    return str(uuid.UUID(bytes=h.digest()))
+
+
+# The parts of the tree in pre-order, one by one, without recursion
+def iter_parts(node: GSN, parent_id: str = root_parent_id, my_id: str | None = None) -> Iterator[dict[str, str]]:
+    stack = [(node, parent_id, node_id(parent_id, 0, node) if my_id is None else my_id)]
+    while stack:
+        n, p, i = stack.pop()
+        children = n.children()
+        children_ids = [node_id(i, k, c) for k, c in enumerate(children)]
+        yield n.part(p, i, children_ids)
+        stack.extend(zip(reversed(children), itertools.repeat(i), reversed(children_ids)))
+
+
+# Writes the parts as json.dump(python_val(node), stream, indent=indent, sort_keys=sort_keys) does,
+# without holding the list of the parts
+def write_json(node: GSN, stream: TextIO, indent: int | None = 4, sort_keys: bool = False):
+    encoder = json.JSONEncoder(indent=indent, sort_keys=sort_keys)
+    pad = None if indent is None else ' ' * indent
+    stream.write('[')
+    empty = True
+    for part in iter_parts(node):
+        text = encoder.encode(part)
+        if pad is None:
+            stream.write(text if empty else ', ' + text)
+        else:
+            stream.write(('\n' if empty else ',\n') + pad + text.replace('\n', '\n' + pad))
+        empty = False
+    stream.write(']' if pad is None or empty else '\n]')
 
 
 undeveloped: Undeveloped = Undeveloped(description='Undeveloped')
 
 
-def _dict_to_gsn(v: dict):
-    if 'gsn_type' not in v:
+# Fields of the records of each kind which hold nodes
+_node_fields = {'Strategy': ('sub_goals',), 'Goal': ('assumptions', 'contexts', 'support')}
+
+
+def _field(r: pgsn_term.Record, label: str) -> pgsn_term.Term:
+    t = r.attributes().get(label)
+    if t is None:
+        raise ValueError(f'GSN record without {label}')
+    return t
+
+
+def _description(r: pgsn_term.Record) -> str:
+    t = _field(r, 'description')
+    if not isinstance(t, pgsn_term.Data):
+        raise ValueError(f'PGSN term {type(t)} does not normalizes a Python value')
+    return t.value
+
+
+# Records of the nodes in the fields of the record, by field
+def _node_records(r: pgsn_term.Record, kind: str) -> list[list[pgsn_term.Term]]:
+    records = []
+    for label in _node_fields.get(kind, ()):
+        t = _field(r, label)
+        if label == 'support':
+            records.append([t])
+        elif isinstance(t, pgsn_term.List):
+            records.append(list(t.terms))
+        else:
+            raise ValueError(f'{label} must be a list')
+    return records
+
+
+def _kind(t: pgsn_term.Term) -> str:
+    gsn_type = t.attributes().get('gsn_type') if isinstance(t, pgsn_term.Record) else None
+    if not isinstance(gsn_type, pgsn_term.String):
         raise ValueError('PGSN term does not normalizes a GSN')
-    match v['gsn_type']:
+    return gsn_type.value
+
+
+def _node(r: pgsn_term.Record, kind: str, children: list[list]) -> GSN | None:
+    match kind:
         case 'Node':
             raise ValueError('Node with unspecified kind')
         case 'Support':
-            if v['description'] == 'Undeveloped':
+            if _description(r) == 'Undeveloped':
                 return undeveloped
             else:
-                raise ValueError(f'Support {v} without specific type')
+                raise ValueError(f'Support {_description(r)} without specific type')
         case 'Evidence':
-            return Evidence(description=v['description'])
+            return Evidence(description=_description(r))
         case 'Strategy':
-            if len(v['sub_goals']) == 0:
+            sub_goals, = children
+            if len(sub_goals) == 0:
                 raise ValueError('Strategy must have more than one sub-goals')
-            sub_goals = [_dict_to_gsn(g) for g in v['sub_goals']]
             if not all(isinstance(g, Goal) for g in sub_goals):
                 raise ValueError(f'Sub-goals {sub_goals} must be goals')
-            return Strategy(description=v['description'],
+            return Strategy(description=_description(r),
                             sub_goals=tuple(sub_goals))
         case 'Goal':
-            assumptions = [_dict_to_gsn(a) for a in v['assumptions']]
+            assumptions, contexts, (support,) = children
             if not all(isinstance(a, Assumption) for a in assumptions):
                 raise ValueError('Assumptions must be assumptions')
-            contexts = [_dict_to_gsn(c) for c in v['contexts']]
-            if not all(isinstance(c, Assumption) for c in contexts):
+            if not all(isinstance(c, Context) for c in contexts):
                 raise ValueError('Contexts must be Contexts')
-            support = _dict_to_gsn(v['support'])
             if not (isinstance(support, Strategy) or
                     isinstance(support, Evidence) or
                     support == undeveloped):
                 raise ValueError(f'support {support} must be either a strategy, an evidence or undeveloped')
-            return Goal(description=v['description'],
+            return Goal(description=_description(r),
                         assumptions=assumptions,
                         contexts=contexts,
                         support=support)
         case 'Assumption':
-            return Assumption(description=v['description'])
+            return Assumption(description=_description(r))
         case 'Context':
-            return Context(description=v['description'])
+            return Context(description=_description(r))
 
 
-def pgsn_to_gsn(t: pgsn_term.Term, steps=1000):
-    v = stdlib.value_of(t, steps=steps)
-    if not isinstance(v, dict):
+# Reads the GSN from the normal form of a PGSN term, in post-order without recursion.
+# Only the fields of the nodes are read, not the class information of the object records.
+def from_normal_form(t: pgsn_term.Term) -> GSN:
+    if not isinstance(t, pgsn_term.Record):
         raise ValueError('Term does not have a GSN')
-    return _dict_to_gsn(v)
+    # id -> node, for the records already read
+    nodes = {}
+    stack = [(t, False)]
+    while stack:
+        r, expanded = stack.pop()
+        if id(r) in nodes:
+            continue
+        kind = _kind(r)
+        records = _node_records(r, kind)
+        if not expanded:
+            stack.append((r, True))
+            stack.extend((c, False) for rs in records for c in reversed(rs) if id(c) not in nodes)
+            continue
+        nodes[id(r)] = _node(r, kind, [[nodes[id(c)] for c in rs] for rs in records])
+    return nodes[id(t)]
+
+
+def pgsn_to_gsn(t: pgsn_term.Term, steps=1000, engine: str | None = None, cache: bool = True):
+    return from_normal_form(t.fully_eval(steps, engine=engine, cache=cache))
 
 
 def python_val(gsn):
-    return gsn.gsn_parts(str(uuid.uuid4()), str(uuid.uuid4()))
+    return list(iter_parts(gsn))
+
+
+# Batch evaluation of many cases.
+# The prelude is normalized once, and worker processes are forked after it, so that they share it copy-on-write.
+# A case is a term, or a function returning a term, which is called in the worker.
+Case = pgsn_term.Term | Callable[[], pgsn_term.Term]
+
+
+@frozen
+class CaseResult:
+    index: int
+    gsn: GSN | None
+    # Reduction steps, for the substitution reducer and the machines
+    steps: int | None
+    seconds: float
+    error: str | None = None
+
+
+_batch: tuple[Sequence[Case], int, str | None] | None = None
+
+
+def _start_batch(cases: Sequence[Case], steps: int, engine: str | None):
+    global _batch
+    _batch = (cases, steps, engine)
+
+
+def _count_eval(t: pgsn_term.Term, steps: int, engine: str | None) -> tuple[pgsn_term.Term, int | None]:
+    engine = helpers.default(engine, pgsn_term.default_engine)
+    counted = engine in ('substitution', 'machine', 'need', 'compiled')
+    token = pgsn_term.step_count.set(0 if counted else None)
+    try:
+        return t.fully_eval(steps, engine=engine, cache=False), pgsn_term.step_count.get()
+    finally:
+        pgsn_term.step_count.reset(token)
+
+
+def _run_case(index: int) -> CaseResult:
+    cases, steps, engine = _batch
+    start = time.perf_counter()
+    try:
+        case = cases[index]
+        t = case if isinstance(case, pgsn_term.Term) else case()
+        t = t if not t.is_named else t.remove_name()
+        nf, n = _count_eval(t, steps, engine)
+        return CaseResult(index=index, gsn=from_normal_form(nf), steps=n, seconds=time.perf_counter() - start)
+    except Exception as e:
+        return CaseResult(index=index, gsn=None, steps=None, seconds=time.perf_counter() - start,
+                          error=f'{type(e).__name__}: {e}')
+
+
+# The results of the cases in order, as they are computed
+def pgsn_to_gsn_many(cases: Sequence[Case], steps=1000, engine: str | None = None,
+                     workers: int | None = None) -> Iterator[CaseResult]:
+    prelude.warm()
+    workers = min(helpers.default(workers, os.cpu_count() or 1), len(cases))
+    if workers <= 1:
+        _start_batch(cases, steps, engine)
+        yield from (_run_case(i) for i in range(len(cases)))
+        return
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    with context.Pool(workers, initializer=_start_batch, initargs=(cases, steps, engine)) as pool:
+        yield from pool.imap(_run_case, range(len(cases)))
+
+
+def _load_case(path: str, name: str) -> pgsn_term.Term:
+    return runpy.run_path(path)[name]
+
+
+# A case defined in the variable name of a Python file, loaded in the worker
+def case_file(path: str, name: str = 'system') -> Case:
+    return functools.partial(_load_case, path, name)
+
+
+# python gsn.py [--workers N] [--steps N] [--engine E] [--name NAME] case.py ...
+# Each file defines a case in the variable NAME.  Prints the result of each case and the throughput.
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description='Evaluate PGSN cases to GSN')
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--name', default='system')
+    parser.add_argument('--steps', type=int, default=10000)
+    parser.add_argument('--engine', default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    failed = 0
+    cases = [case_file(path, args.name) for path in args.files]
+    for r in pgsn_to_gsn_many(cases, steps=args.steps, engine=args.engine, workers=args.workers):
+        path = args.files[r.index]
+        if r.error is None:
+            print(f'{path}: {r.steps} steps, {r.seconds:.3f}s')
+        else:
+            failed += 1
+            print(f'{path}: {r.error}', file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    print(f'{len(cases)} cases, {failed} failed, {elapsed:.3f}s, {len(cases) / elapsed:.1f} cases/s')
+    return 1 if failed > 0 else 0
+
 
+if __name__ == '__main__':
+    sys.exit(main())
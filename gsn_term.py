@@ -40,3 +40,7 @@ assumption = lambda_abs_keywords(arguments={'description': _d},
                                  body=instantiate(assumption_class)({'description': _d}))
 context = lambda_abs_keywords(arguments={'description': _d},
                               body=instantiate(context_class)({'description': _d}))
+
+# The nameless normal forms of the definitions above, if a snapshot has been built
+import prelude
+prelude.load()
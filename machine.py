@@ -0,0 +1,359 @@
+from __future__ import annotations
+from attrs import define, frozen, field
+from pgsn_term import Term, Variable, Abs, App, Builtin, BuiltinFunction, List, Record, LambdaInterpreterError, \
+    not_none, non_negative, count_steps
+
+
+# Environment based evaluator (Krivine machine with read-back to normal forms).
+# beta-reduction never substitutes: the argument is pushed to the environment as a closure.
+# Builtins operate on terms, so their arguments are read back only when a builtin is about to fire.
+# With sharing (call-by-need), a closure is updated with its weak head normal form and normal form
+# when they are computed, and every other use of the closure reuses them.
+
+@define(eq=False)
+class Closure:
+    term: Term = field(validator=not_none)
+    env: Env | None = field()
+    # Caches for call-by-need.  Stuck terms and normal forms depend on the depth they are read back.
+    whnf: Value | Partial | Stuck | None = field(default=None)
+    whnf_depth: int = field(default=0)
+    nf: Term | None = field(default=None)
+    nf_depth: int = field(default=0)
+    # Read-back of whnf
+    form: Term | None = field(default=None)
+    form_depth: int = field(default=0)
+
+
+# The variable bound by the binder at de Bruijn level `level`, under which we normalize.
+@frozen
+class Neutral:
+    level: int = field(validator=non_negative)
+
+
+@frozen
+class Env:
+    value: Closure | Neutral = field(validator=not_none)
+    rest: Env | None = field()
+    size: int = field(validator=non_negative)
+
+
+def push(env: Env | None, value: Closure | Neutral) -> Env:
+    return Env(value=value, rest=env, size=1 if env is None else env.size + 1)
+
+
+def env_size(env: Env | None) -> int:
+    return 0 if env is None else env.size
+
+
+def lookup(env: Env | None, num: int) -> Closure | Neutral | None:
+    for _ in range(num):
+        if env is None:
+            return None
+        env = env.rest
+    return None if env is None else env.value
+
+
+# Weak head normal forms
+# A value is an abstraction, a data, a record, a list or a builtin without arguments.
+@frozen
+class Value:
+    term: Term = field(validator=not_none)
+    env: Env | None = field()
+
+
+# A builtin applied to fewer arguments than its arity
+@frozen
+class Partial:
+    head: BuiltinFunction = field(validator=not_none)
+    env: Env | None = field()
+    args: tuple[Closure, ...] = field(validator=not_none)
+
+
+# The application which does not reduce further at the head.
+# Arguments are either closures (not yet reduced) or terms (already read back).
+@frozen
+class Stuck:
+    head: Term = field(validator=not_none)
+    args: tuple[Closure | Term, ...] = field(validator=not_none)
+
+    def shift(self, num: int) -> Stuck:
+        if num == 0:
+            return self
+        return Stuck(head=self.head.shift(num, 0),
+                     args=tuple(arg.shift(num, 0) if isinstance(arg, Term) else arg for arg in self.args))
+
+
+# normal_forms is a store (eval_cache.NormalForms) looked up for the closed applications the machine normalizes,
+# and updated with their normal forms.
+class Machine:
+    def __init__(self, steps: int, sharing: bool = False, normal_forms=None):
+        self.steps = steps
+        self.sharing = sharing
+        self.normal_forms = normal_forms
+        self.reductions = 0
+        # The number of evaluations of closures replaced by the cached results
+        self.saved = 0
+        self._neutral_envs: list[Env | None] = [None]
+        # id -> (closed record, normal form).  A record delegated to, such as a class by its objects,
+        # is normalized once and stays shared.
+        self._records: dict[int, tuple[Record, Record]] = {}
+
+    def tick(self, term: Term):
+        self.reductions += 1
+        if self.reductions > self.steps:
+            raise LambdaInterpreterError('Reduction did not terminate', term)
+
+    # The environment which maps every index below depth to the binder of that index.
+    def neutral_env(self, depth: int) -> Env | None:
+        while len(self._neutral_envs) <= depth:
+            d = len(self._neutral_envs) - 1
+            self._neutral_envs.append(push(self._neutral_envs[d], Neutral(level=d)))
+        return self._neutral_envs[depth]
+
+    def push_neutral(self, env: Env | None, depth: int) -> Env:
+        if env is self.neutral_env(depth):
+            return self.neutral_env(depth + 1)
+        return push(env, Neutral(level=depth))
+
+    def variable(self, env: Env | None, num: int, value: Neutral | None, depth: int) -> Variable:
+        if value is None:
+            return Variable.nameless(num=num - env_size(env) + depth)
+        return Variable.nameless(num=depth - value.level - 1)
+
+    # Substitute the environment into the term without reduction.
+    def read_back(self, term: Term, env: Env | None, depth: int) -> Term:
+        if env is self.neutral_env(depth) or term.is_closed():
+            return term
+        match term:
+            case Variable():
+                value = lookup(env, term.num)
+                if isinstance(value, Closure):
+                    return self.read_back_closure(value, depth)
+                return self.variable(env, term.num, value, depth)
+            case Abs():
+                return term.evolve(t=self.read_back(term.t, self.push_neutral(env, depth), depth + 1))
+            case App():
+                return term.evolve(t1=self.read_back(term.t1, env, depth),
+                                   t2=self.read_back(term.t2, env, depth))
+            case List():
+                return List.nameless(meta_info=term.meta_info,
+                                     terms=tuple(self.read_back(t, env, depth) for t in term.terms))
+            case Record():
+                return term.map_terms(lambda t: self.read_back(t, env, depth))
+            case _:
+                return term
+
+    # With sharing, an evaluated closure is read back from its evaluated form
+    def read_back_closure(self, c: Closure, depth: int) -> Term:
+        if self.sharing and c.nf is not None:
+            return c.nf.shift(depth - c.nf_depth, 0)
+        if self.sharing and c.form is not None:
+            return c.form.shift(depth - c.form_depth, 0)
+        if self.sharing and c.whnf is not None:
+            c.form, c.form_depth = self.read_back_whnf(c.whnf, c.whnf_depth, depth), depth
+            return c.form
+        return self.read_back(c.term, c.env, depth)
+
+    def read_back_whnf(self, w: Value | Partial | Stuck, w_depth: int, depth: int) -> Term:
+        match w:
+            case Value():
+                return self.read_back(w.term, w.env, depth)
+            case Partial():
+                t = self.read_back(w.head, w.env, depth)
+                for arg in w.args:
+                    t = t(self.read_back_closure(arg, depth))
+                return t
+            case Stuck():
+                w = w.shift(depth - w_depth)
+                t = w.head
+                for arg in w.args:
+                    t = t(arg if isinstance(arg, Term) else self.read_back_closure(arg, depth))
+                return t
+
+    # Weak head normal form of a closure.  With sharing, computed only once.
+    def force(self, c: Closure, depth: int) -> Value | Partial | Stuck:
+        if not self.sharing:
+            return self.whnf(c.term, c.env, depth)
+        if c.whnf is not None:
+            self.saved += 1
+        else:
+            c.whnf, c.whnf_depth = self.whnf(c.term, c.env, depth), depth
+        return c.whnf.shift(depth - c.whnf_depth) if isinstance(c.whnf, Stuck) else c.whnf
+
+    def nf_closure(self, c: Closure, depth: int) -> Term:
+        if not self.sharing:
+            return self.nf(c.term, c.env, depth)
+        if c.nf is not None:
+            self.saved += 1
+        elif self.normal_forms is not None and isinstance(c.term, App) and c.term.is_closed():
+            c.nf, c.nf_depth = self.normal_forms.normal_form(
+                c.term, lambda: self.nf_whnf(self.force(c, depth), depth)), depth
+        else:
+            c.nf, c.nf_depth = self.nf_whnf(self.force(c, depth), depth), depth
+        return c.nf.shift(depth - c.nf_depth, 0)
+
+    # Reduce to weak head normal form
+    def whnf(self, term: Term, env: Env | None, depth: int, stack: list[Closure] | None = None) \
+            -> Value | Partial | Stuck:
+        # The last element of the stack is the first argument
+        stack = [] if stack is None else stack
+        while True:
+            match term:
+                case App():
+                    stack.append(Closure(term=term.t2, env=env))
+                    term = term.t1
+                case Variable():
+                    value = lookup(env, term.num)
+                    if isinstance(value, Closure) and not self.sharing:
+                        term, env = value.term, value.env
+                    elif isinstance(value, Closure):
+                        r = self.enter_shared(value, depth, stack)
+                        if isinstance(r, Stuck):
+                            return r
+                        term, env = r
+                    else:
+                        head = self.variable(env, term.num, value, depth)
+                        return Stuck(head=head, args=tuple(reversed(stack)))
+                case Abs() if len(stack) > 0:
+                    self.tick(term)
+                    env = push(env, stack.pop())
+                    term = term.t
+                case BuiltinFunction() if len(stack) > 0:
+                    r = self.apply_stack(term, env, depth, stack)
+                    if not isinstance(r, tuple):
+                        return r
+                    term, env = r
+                case _ if len(stack) > 0:
+                    return Stuck(head=term, args=tuple(reversed(stack)))
+                case _:
+                    return Value(term=term, env=env)
+
+    # Continue from the shared weak head normal form of the closure
+    def enter_shared(self, c: Closure, depth: int, stack: list[Closure]) -> tuple[Term, Env | None] | Stuck:
+        w = self.force(c, depth)
+        match w:
+            case Value():
+                return w.term, w.env
+            case Partial():
+                stack.extend(reversed(w.args))
+                return w.head, w.env
+            case Stuck():
+                if len(stack) == 0:
+                    return w
+                env = self.neutral_env(depth)
+                stack.extend(Closure(term=arg, env=env) if isinstance(arg, Term) else arg
+                             for arg in reversed(w.args))
+                return w.head, env
+
+    # Apply the builtin to the arguments on the stack.  The stack is replaced by the rest of the arguments.
+    def apply_stack(self, head: BuiltinFunction, env: Env | None, depth: int, stack: list[Closure]) \
+            -> tuple[Term, Env | None] | Partial | Stuck:
+        args = tuple(reversed(stack))
+        if len(args) < head.arity:
+            return Partial(head=head, env=env, args=args)
+        result = self.apply_builtin(head, env, args, depth)
+        if isinstance(result, Stuck):
+            return result
+        reduced, rest = result
+        env = self.neutral_env(depth)
+        stack[:] = [Closure(term=t, env=env) for t in reversed(rest)]
+        return reduced, env
+
+    # The substitution based reducer reduces a builtin application in the following order
+    # and fires as soon as the builtin becomes applicable:
+    # the head (lists and records) to the normal form, then each argument from the left,
+    # first to the weak head normal form then to the normal form.
+    # Intermediate forms always have App at the top and no builtin in the library applies to them.
+    def apply_builtin(self, head: Term, env: Env | None, args: tuple[Closure, ...], depth: int) \
+            -> tuple[Term, tuple[Term, ...]] | Stuck:
+        head_form = self.read_back(head, env, depth)
+        forms = [self.read_back_closure(c, depth) for c in args]
+        if head_form.applicable_args(tuple(forms)):
+            return self.fire(head_form, forms)
+        if isinstance(head_form, List) or isinstance(head_form, Record):
+            head_form = self.nf_whnf(Value(term=head, env=env), depth)
+            if head_form.applicable_args(tuple(forms)):
+                return self.fire(head_form, forms)
+        for i, c in enumerate(args):
+            w = self.force(c, depth)
+            if isinstance(w, Value):
+                forms[i] = self.read_back(w.term, w.env, depth)
+                if head_form.applicable_args(tuple(forms)):
+                    return self.fire_shared(head_form, forms, args[i + 1:], depth)
+            forms[i] = self.nf_closure(c, depth) if self.sharing else self.nf_whnf(w, depth)
+            if head_form.applicable_args(tuple(forms)):
+                return self.fire_shared(head_form, forms, args[i + 1:], depth)
+        return Stuck(head=head_form, args=tuple(forms))
+
+    # With sharing, closures referred from the rest of the arguments may have been evaluated
+    # after they were read back.  The arguments are read back again to pass the evaluated forms,
+    # otherwise the evaluation is repeated on the result of the builtin.
+    def fire_shared(self, head: Builtin, forms: list[Term], rest: tuple[Closure, ...], depth: int) \
+            -> tuple[Term, tuple[Term, ...]]:
+        if self.sharing and len(rest) > 0:
+            k = len(forms) - len(rest)
+            fresh = forms[:k] + [self.read_back_closure(c, depth) for c in rest]
+            if head.applicable_args(tuple(fresh)):
+                return self.fire(head, fresh)
+        return self.fire(head, forms)
+
+    def fire(self, head: Builtin, forms: list[Term]) -> tuple[Term, tuple[Term, ...]]:
+        self.tick(head)
+        return head.apply_args(tuple(forms))
+
+    def nf(self, term: Term, env: Env | None, depth: int) -> Term:
+        if self.normal_forms is not None and isinstance(term, App) and term.is_closed():
+            return self.normal_forms.normal_form(term, lambda: self.nf_whnf(self.whnf(term, env, depth), depth))
+        return self.nf_whnf(self.whnf(term, env, depth), depth)
+
+    # The normal form of a closed term, counting the reductions in pgsn_term.step_count
+    def count(self, term: Term) -> Term:
+        nf = self.nf(term, None, 0)
+        count_steps(self.reductions)
+        return nf
+
+    # The normal form of a closed term, which is not looked up in normal_forms
+    def normalize(self, term: Term) -> Term:
+        return self.nf_whnf(self.whnf(term, None, 0), 0)
+
+    # Normal form from a weak head normal form
+    def nf_whnf(self, w: Value | Partial | Stuck, depth: int) -> Term:
+        if isinstance(w, Partial):
+            # Arguments of a builtin which cannot be applied are reduced to the normal form
+            w = self.apply_builtin(w.head, w.env, w.args, depth)
+        if isinstance(w, Stuck):
+            t = w.head
+            for arg in w.args:
+                t = t(arg if isinstance(arg, Term) else self.nf_closure(arg, depth))
+            return t
+        term, env = w.term, w.env
+        # Normal forms returned by fully_eval are not walked again
+        if term.is_normal and term.is_closed():
+            return term
+        match term:
+            case Abs():
+                return term.evolve(t=self.nf(term.t, self.push_neutral(env, depth), depth + 1))
+            case List():
+                return List.nameless(meta_info=term.meta_info,
+                                     terms=tuple(self.nf(t, env, depth) for t in term.terms))
+            case Record():
+                if not term.is_closed():
+                    return term.map_terms(lambda t: self.nf(t, env, depth))
+                found = self._records.get(id(term))
+                if found is None:
+                    found = term, term.map_terms(lambda t: self.nf(t, env, depth)).mark_normal()
+                    self._records[id(term)] = found
+                return found[1]
+            case _:
+                return term
+
+
+def fully_eval(term: Term, steps: int = 1000) -> Term:
+    assert not term.is_named
+    return Machine(steps).count(term)
+
+
+# Call-by-need
+def fully_eval_by_need(term: Term, steps: int = 1000) -> Term:
+    assert not term.is_named
+    return Machine(steps, sharing=True).count(term)
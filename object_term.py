@@ -1,3 +1,4 @@
+import weakref
 import stdlib
 from stdlib import *
 from stdlib import lambda_abs, lambda_abs_vars
@@ -67,19 +68,102 @@ instantiate = lambda_abs_vars(
     )))
 is_obj = lambda_abs(_obj, has_label(_obj)(_label_instance))
 
-_class1 = stdlib.variable('_class1')
-_class2 = stdlib.variable('_class2')
-_is_subclass = stdlib.variable('_is_subclass')
-is_subclass = stdlib.fix\
-    (lambda_abs_vars((_is_subclass, _class1, _class2),
-                     if_then_else
-                     (has_label(_class1)(_label_class_name))
-                     (boolean_or
-                      (equal(_class1(_label_class_name))
-                       (_class2(_label_class_name)))
-                        (_is_subclass(_class1(_label_parent))(_class2)))
-                     (false)
-                     ))
+# Index of the class hierarchy.
+# The class names on the _parent chain of each class record, computed once per record.
+# Records are immutable, so an entry never changes, and a redefined class is a new record with its own entry.
+# Entries are dropped with their records.
+class ClassIndex:
+    def __init__(self):
+        # id -> (weak reference to the record, names on the chain, whether the chain ends with a non-class)
+        self._entries: dict[int, tuple[weakref.ref, frozenset[str], bool]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, r: Record) -> tuple[frozenset[str], bool] | None:
+        entry = self._entries.get(id(r))
+        if entry is not None and entry[0]() is r:
+            return entry[1], entry[2]
+        return None
+
+    def _put(self, r: Record, names: frozenset[str], complete: bool):
+        key = id(r)
+
+        def drop(ref):
+            if key in self._entries and self._entries[key][0] is ref:
+                del self._entries[key]
+
+        self._entries[key] = (weakref.ref(r, drop), names, complete)
+
+    # The class names of the ancestors of the class, itself included, and whether they are all known.
+    # The chain is not complete if a parent or a class name is not a normal form yet.
+    def ancestors(self, cls: Record) -> tuple[frozenset[str], bool]:
+        found = self._get(cls)
+        if found is not None:
+            self.hits += 1
+            return found
+        self.misses += 1
+        chain = []
+        names, complete = frozenset(), True
+        r = cls
+        while True:
+            found = self._get(r)
+            if found is not None:
+                names, complete = found
+                break
+            attributes = r.attributes()
+            name = attributes.get('_class_name')
+            if name is None:
+                break
+            parent = attributes.get('_parent')
+            if not isinstance(name, String) or not isinstance(parent, Record):
+                chain.append((r, name))
+                complete = False
+                break
+            chain.append((r, name))
+            r = parent
+        for r, name in reversed(chain):
+            if isinstance(name, String):
+                names = names | {name.value}
+            self._put(r, names, complete)
+        return names, complete
+
+
+class_index = ClassIndex()
+
+
+# is_subclass class1 class2 is true if the class name of class2 is on the _parent chain of class1.
+# Classes are identified by the class names.
+class IsSubclass(BuiltinFunction):
+    arity = 2
+    name = 'IsSubclass'
+
+    def _applicable_args(self, terms: tuple[Term, ...]):
+        if not isinstance(terms[0], Record):
+            return False
+        # A record which is not a class is a subclass of nothing, whatever class2 is
+        if '_class_name' not in terms[0].attributes():
+            return True
+        if not (isinstance(terms[1], Record) and isinstance(terms[1].attributes().get('_class_name'), String)):
+            return False
+        names, complete = class_index.ancestors(terms[0])
+        return complete or terms[1].attributes()['_class_name'].value in names
+
+    def _apply_args(self, terms: tuple[Term, ...]):
+        if '_class_name' not in terms[0].attributes():
+            return Boolean.build(is_named=self.is_named, value=False)
+        names, _ = class_index.ancestors(terms[0])
+        return Boolean.build(is_named=self.is_named, value=terms[1].attributes()['_class_name'].value in names)
+
+
+is_subclass = IsSubclass.named()
 
 _is_instance = stdlib.variable('_is_instance')
 is_instance = lambda_abs_vars(
@@ -0,0 +1,161 @@
+from __future__ import annotations
+import os
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+from multiprocessing.context import BaseContext
+import helpers
+import pgsn_term
+import serialize
+# The decoder only resolves the classes of the term modules loaded, so that they are imported in the workers
+# started by spawn or forkserver too
+import explicit_subst  # noqa: F401
+import object_term  # noqa: F401
+import stdlib  # noqa: F401
+from pgsn_term import Term, Abs, App, List, Record
+
+# Parallel normalization.
+# The closed applications in a term are independent of each other.  Those in the elements of lists and
+# the attributes of records from the root, for example the cases of a batch, are normalized by the sequential
+# reducer whatever the rest of the term.  The ones larger than the threshold are sent to a process pool
+# in the binary encoding of serialize.py and normalized there.  The term with their normal forms is then
+# normalized in this process, which does not walk the normal forms again.  A task which does not terminate
+# in the pool, or which a broken pool does not run, is left to this process.
+
+# Settings of the default evaluator, given by the environment variables PGSN_WORKERS and PGSN_PARALLEL_THRESHOLD
+default_workers = int(os.environ.get('PGSN_WORKERS', '0')) or os.cpu_count() or 1
+default_threshold = int(os.environ.get('PGSN_PARALLEL_THRESHOLD', '1000'))
+
+
+def _normalize(data: bytes, steps: int, engine: str | None) -> bytes:
+    return serialize.dumps(serialize.loads(data).fully_eval(steps, engine=engine, cache=False))
+
+
+# Sizes of the subterms, id -> (term, size)
+def _sizes(term: Term) -> dict[int, tuple[Term, int]]:
+    sizes = {}
+    stack = [(term, False)]
+    while stack:
+        t, expanded = stack.pop()
+        if id(t) in sizes:
+            continue
+        children = _children(t)
+        if not expanded:
+            stack.append((t, True))
+            stack.extend((c, False) for c in children if id(c) not in sizes)
+            continue
+        sizes[id(t)] = (t, 1 + sum(sizes[id(c)][1] for c in children))
+    return sizes
+
+
+def _children(t: Term) -> tuple[Term, ...]:
+    match t:
+        case App():
+            return t.t1, t.t2
+        case Abs():
+            return t.t,
+        case List():
+            return t.terms
+        case Record():
+            return tuple(t.attributes().values())
+        case _:
+            return ()
+
+
+class ParallelEvaluator:
+    def __init__(self, workers: int | None = None, threshold: int | None = None, engine: str | None = None,
+                 mp_context: BaseContext | None = None):
+        self.workers = default_workers if workers is None else workers
+        self.threshold = default_threshold if threshold is None else threshold
+        # The engine used in the workers and for the rest of the term
+        self.engine = engine
+        # The start method of the workers, the default one of the platform if None
+        self.mp_context = mp_context
+        self._pool: ProcessPoolExecutor | None = None
+        # The number of terms normalized in the workers
+        self.tasks = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=self.mp_context)
+        return self._pool
+
+    # The engine of the workers and of the rest of the term
+    def sequential_engine(self) -> str:
+        engine = helpers.default(self.engine, pgsn_term.default_engine)
+        return 'substitution' if engine == 'parallel' else engine
+
+    # The closed applications larger than the threshold in the elements of lists and the attributes of records
+    # from the root.  Applications elsewhere may be discarded by the reduction, so they are not evaluated ahead.
+    def tasks_of(self, term: Term) -> list[Term]:
+        sizes = _sizes(term)
+        tasks = []
+        stack = [term]
+        while stack:
+            t = stack.pop()
+            if sizes[id(t)][1] < self.threshold:
+                continue
+            match t:
+                case App() if t.is_closed():
+                    tasks.append(t)
+                case List() | Record():
+                    stack.extend(reversed(_children(t)))
+        return tasks
+
+    def fully_eval(self, term: Term, steps: int = 1000) -> Term:
+        assert not term.is_named
+        engine = self.sequential_engine()
+        tasks = self.tasks_of(term) if self.workers > 1 else []
+        if len(tasks) > 1:
+            futures = [self.pool().submit(_normalize, serialize.dumps(t), steps, engine) for t in tasks]
+            normal_forms = {}
+            for t, f in zip(tasks, futures):
+                try:
+                    normal_forms[id(t)] = serialize.loads(f.result()).mark_normal()
+                except (pgsn_term.LambdaInterpreterError, RecursionError, BrokenExecutor):
+                    pass
+            self.tasks += len(normal_forms)
+            term = _replace(term, normal_forms)
+        return term.fully_eval(steps, engine=engine, cache=False)
+
+
+def _replace(term: Term, normal_forms: dict[int, Term]) -> Term:
+    if id(term) in normal_forms:
+        return normal_forms[id(term)]
+    match term:
+        case App():
+            t1, t2 = _replace(term.t1, normal_forms), _replace(term.t2, normal_forms)
+            return term if t1 is term.t1 and t2 is term.t2 else term.evolve(t1=t1, t2=t2)
+        case Abs():
+            t = _replace(term.t, normal_forms)
+            return term if t is term.t else term.evolve(t=t)
+        case List():
+            terms = tuple(_replace(t, normal_forms) for t in term.terms)
+            return term if all(t1 is t2 for t1, t2 in zip(terms, term.terms)) else \
+                List.nameless(meta_info=term.meta_info, terms=terms)
+        case Record():
+            attributes = term.attributes()
+            replaced = {label: _replace(t, normal_forms) for label, t in attributes.items()}
+            return term if all(replaced[label] is t for label, t in attributes.items()) else \
+                term.evolve(attributes=replaced)
+        case _:
+            return term
+
+
+evaluator: ParallelEvaluator | None = None
+
+
+def fully_eval(term: Term, steps: int = 1000) -> Term:
+    global evaluator
+    if evaluator is None:
+        evaluator = ParallelEvaluator()
+    return evaluator.fully_eval(term, steps)
@@ -1,6 +1,13 @@
 from __future__ import annotations
+import contextvars
+import importlib
+import itertools
+import os
+import weakref
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
 from typing import TypeAlias, Generic
 from abc import ABC, abstractmethod
+import attrs
 from attrs import field, frozen, evolve
 from typing import TypeVar
 from meta_info import MetaInfo
@@ -23,10 +30,105 @@ def naming_context(names: set[str]) -> list[str]:
     return sorted(list(names))
 
 
+# The context used to remove names.
+# Maps a variable name to the stack of the levels of the binders of that name, so that looking up
+# and entering a binder are constant time.  Binders are entered and left in one pass over the term.
+# Free variables are numbered after all binders, in the order of the given list.
+class NamingContext:
+    def __init__(self, free: list[str]):
+        self.depth = 0
+        self._levels: dict[str, list[int]] = {}
+        self._free = {name: i for i, name in enumerate(free)}
+
+    def index(self, name: str) -> int:
+        levels = self._levels.get(name)
+        if levels:
+            return self.depth - levels[-1] - 1
+        return self.depth + self._free[name]
+
+    def bind(self, name: str):
+        self._levels.setdefault(name, []).append(self.depth)
+        self.depth += 1
+
+    def unbind(self, name: str):
+        self._levels[name].pop()
+        self.depth -= 1
+
+
 class LambdaInterpreterError(Exception):
     pass
 
 
+# Evaluation engines other than the substitution based reducer.
+# They live in their own modules, which are imported on the first use.
+# name -> (module, function to fully evaluate a term)
+engines: dict[str, tuple[str, str]] = {'machine': ('machine', 'fully_eval'),
+                                       'need': ('machine', 'fully_eval_by_need'),
+                                       'focus': ('focus', 'fully_eval'),
+                                       'explicit': ('explicit_subst', 'fully_eval'),
+                                       'compiled': ('compiler', 'fully_eval'),
+                                       'parallel': ('parallel', 'fully_eval')}
+default_engine = 'substitution'
+
+
+# Trusted (production) mode skips the validators of terms and the invariant checks on hot paths.
+# Switched on by the environment variable PGSN_TRUSTED, or by set_trusted() at the process start.
+trusted = False
+
+
+def set_trusted(flag: bool = True):
+    global trusted
+    trusted = flag
+
+
+# Validators of terms and of the evaluators' data, skipped in trusted mode.
+# Other attrs classes are always validated.
+def unless_trusted(validator):
+    def validate(instance, attribute, value):
+        if not trusted:
+            validator(instance, attribute, value)
+    return validate
+
+
+not_none = unless_trusted(helpers.not_none)
+non_negative = unless_trusted(helpers.non_negative)
+
+
+if os.environ.get('PGSN_TRUSTED', '') not in ('', '0'):
+    set_trusted()
+
+
+# The steps and the engine of the evaluation in progress, used by the builtins which evaluate their arguments
+evaluation: contextvars.ContextVar[tuple[int, str] | None] = contextvars.ContextVar('evaluation', default=None)
+
+
+# Reduction steps of the substitution reducer and the machines, added up while it is not None
+step_count: contextvars.ContextVar[int | None] = contextvars.ContextVar('step_count', default=None)
+
+
+def count_steps(n: int):
+    count = step_count.get()
+    if count is not None:
+        step_count.set(count + n)
+
+
+# Persistent cache of normal forms (eval_cache.EvalCache) used by fully_eval.  None if disabled.
+# Set by set_eval_cache(), or by the environment variable PGSN_EVAL_CACHE giving the path of the store.
+eval_cache = None
+
+
+def set_eval_cache(cache):
+    global eval_cache
+    eval_cache = cache
+
+
+def evaluation_engine(name: str):
+    if name not in engines:
+        raise LambdaInterpreterError(f'Unknown evaluation engine {name}')
+    module, function = engines[name]
+    return getattr(importlib.import_module(module), function)
+
+
 Castable: TypeAlias = "Term | int | str | bool | list | dict | None"
 
 
@@ -53,7 +155,24 @@ def cast(x: Castable, is_named: bool) -> Term:
 class Term(ABC):
     # meta_info is always not empty
     meta_info: MetaInfo = field(default=meta.empty, eq=False)
-    is_named: bool = field(validator=helpers.not_none)
+    is_named: bool = field(validator=not_none)
+    # Structural hash, set when the term is interned.  None if not interned.
+    _intern_hash: int | None = field(default=None, init=False, eq=False, repr=False)
+    # Computed once at construction.
+    # Free variables of a named term, and the maximum free de Bruijn index of a nameless term.
+    # -1 if the nameless term is closed.
+    _free_names: frozenset[str] = field(default=frozenset(), init=False, eq=False, repr=False)
+    _max_free: int = field(default=-1, init=False, eq=False, repr=False)
+    # The nameless form of a named term, memoized by remove_name
+    _nameless: Term | None = field(default=None, init=False, eq=False, repr=False)
+    # Set on the normal forms returned by fully_eval, so that the reducer does not walk them again
+    _normal: bool = field(default=False, init=False, eq=False, repr=False)
+
+    def __attrs_post_init__(self):
+        if self.is_named:
+            object.__setattr__(self, '_free_names', frozenset(self._free_variables()))
+        else:
+            object.__setattr__(self, '_max_free', self._max_free_index())
 
     @classmethod
     def build(cls, is_named: bool, **kwarg) -> Term:
@@ -77,14 +196,25 @@ class Term(ABC):
 
     # If None is returned, the reduction is terminated.
     def eval_or_none(self):
+        if self._normal:
+            return None
         if self.is_named:
             t = self.remove_name()
         else:
             t = self
         evaluated = t._eval_or_none()
-        assert (evaluated is None) or (not evaluated.is_named)
+        assert trusted or (evaluated is None) or (not evaluated.is_named)
         return evaluated
 
+    @property
+    def is_normal(self) -> bool:
+        return self._normal
+
+    def mark_normal(self) -> Term:
+        assert not self.is_named
+        object.__setattr__(self, '_normal', True)
+        return self
+
     def eval(self) -> Term:
         t = self if not self.is_named else self.remove_name()
         evaluated = helpers.default(t.eval_or_none(), t)
@@ -92,13 +222,33 @@ class Term(ABC):
         return evaluated
 
     # FIXME: Use contexts in intermediate steps, not terms
-    def fully_eval(self, steps=1000) -> Term:
+    def fully_eval(self, steps=1000, engine: str | None = None, cache: bool = True) -> Term:
         t = self if not self.is_named else self.remove_name()
-        for _ in range(steps):
+        # The store chooses the engine if none is given
+        if cache and eval_cache is not None:
+            t = eval_cache.fully_eval(t, steps, engine)
+            return (intern(t) if interning else t).mark_normal()
+        engine = helpers.default(engine, default_engine)
+        token = evaluation.set((steps, engine))
+        try:
+            return self._fully_eval(t, steps, engine)
+        finally:
+            evaluation.reset(token)
+
+    @staticmethod
+    def _fully_eval(t: Term, steps: int, engine: str) -> Term:
+        if engine != 'substitution':
+            return evaluation_engine(engine)(t, steps).mark_normal()
+        if interning:
+            t = intern(t)
+        for n in range(steps):
             t_reduced = t.eval_or_none()
-            assert t_reduced is None or t_reduced != t  # should progress
+            if t_reduced is not None and interning:
+                t_reduced = intern(t_reduced)
+            assert trusted or t_reduced is None or not term_equal(t_reduced, t)  # should progress
             if t_reduced is None:
-                return t
+                count_steps(n)
+                return t.mark_normal()
             t = t_reduced
         raise LambdaInterpreterError('Reduction did not terminate', t)
 
@@ -107,9 +257,11 @@ class Term(ABC):
         pass
 
     def shift(self, num: int, cutoff: int) -> Term:
-        assert not self.is_named
+        assert trusted or not self.is_named
+        if self._max_free < cutoff:
+            return self
         shifted = self._shift(num, cutoff)
-        assert not shifted.is_named
+        assert trusted or not shifted.is_named
         return shifted
 
     @abstractmethod
@@ -117,10 +269,11 @@ class Term(ABC):
         pass
 
     def subst_or_none(self, variable: int, term: Term) -> Term | None:
-        assert not self.is_named
-        assert not term.is_named
+        assert trusted or not self.is_named and not term.is_named
+        if self._max_free < variable:
+            return None
         substituted = self._subst_or_none(variable, term)
-        assert substituted is None or not substituted.is_named
+        assert trusted or substituted is None or not substituted.is_named
         return substituted
 
     def subst(self, variable:int, term: Term) -> Term:
@@ -132,16 +285,32 @@ class Term(ABC):
     def _free_variables(self) -> set[str]:
         pass
 
-    def free_variables(self) -> set[str]:
+    def free_variables(self) -> frozenset[str]:
         assert self.is_named
-        return self._free_variables()
+        return self._free_names
+
+    @abstractmethod
+    def _max_free_index(self) -> int:
+        pass
+
+    def max_free_index(self) -> int:
+        assert trusted or not self.is_named
+        return self._max_free
+
+    def is_closed(self) -> bool:
+        return len(self._free_names) == 0 if self.is_named else self._max_free < 0
 
     @abstractmethod
-    def _remove_name_with_context(self, context: list[str]) -> Term:
+    def _remove_name_with_context(self, context: NamingContext) -> Term:
         pass
 
-    def remove_name_with_context(self, context: list[str]) -> Term:
+    # The nameless form of a closed term does not depend on the context, so it is memoized.
+    def remove_name_with_context(self, context: list[str] | NamingContext) -> Term:
         assert self.is_named
+        if self.is_closed():
+            return self.remove_name()
+        if not isinstance(context, NamingContext):
+            context = NamingContext(context)
         nameless = self._remove_name_with_context(context)
         assert not nameless.is_named
         return nameless
@@ -152,18 +321,25 @@ class Term(ABC):
 
     def remove_name(self) -> Term:
         assert self.is_named
-        return self.remove_name_with_context(self.my_naming_context())
+        if self._nameless is None:
+            nameless = self._remove_name_with_context(NamingContext(self.my_naming_context()))
+            assert not nameless.is_named
+            object.__setattr__(self, '_nameless', nameless)
+        return self._nameless
+
+    @property
+    def is_interned(self) -> bool:
+        return self._intern_hash is not None
 
     def __call__(self, *args: Castable, **kwargs: Castable) -> Term:
-        arg_terms = list(map(lambda x: cast(x, is_named=self.is_named), args))
-        kwarg = Record.build(is_named=self.is_named,
-                             attributes={k: cast(v, is_named=self.is_named) for k, v in kwargs.items()})
         t = self
-        for arg in arg_terms:
-            t = App.build(t1=t, t2=arg, is_named=self.is_named)
-        if kwargs == {}:
+        for arg in args:
+            t = App(t1=t, t2=cast(arg, is_named=self.is_named), is_named=self.is_named)
+        if len(kwargs) == 0:
             return t
-        return App.build(t1=t, t2=kwarg, is_named=self.is_named)
+        kwarg = Record.build(is_named=self.is_named,
+                             attributes={k: cast(v, is_named=self.is_named) for k, v in kwargs.items()})
+        return App(t1=t, t2=kwarg, is_named=self.is_named)
 
 
 @frozen
@@ -172,10 +348,12 @@ class Variable(Term):
     name: str | None = field(default=None)
 
     @num.validator
+    @unless_trusted
     def _check_num(self, _, v):
         assert self.is_named or v is not None
 
     @name.validator
+    @unless_trusted
     def _check_name(self, _, v):
         assert not self.is_named or v is not None
 
@@ -194,6 +372,9 @@ class Variable(Term):
     def _free_variables(self) -> set[str]:
         return {self.name}
 
+    def _max_free_index(self) -> int:
+        return self.num
+
     def _eval_or_none(self):
         return None
 
@@ -209,33 +390,35 @@ class Variable(Term):
         else:
             return None
 
-    def _remove_name_with_context(self, context: list[str]) -> Term:
-        num = context.index(self.name)
-        return self.evolve(num=num)
+    def _remove_name_with_context(self, context: NamingContext) -> Term:
+        return Variable(meta_info=self.meta_info, is_named=False, num=context.index(self.name))
 
 
 @frozen
 class Abs(Term):
     v: Variable | None = field()
-    t: Term = field(validator=helpers.not_none)
+    t: Term = field(validator=not_none)
 
     @v.validator
+    @unless_trusted
     def _check_v(self, attribute, value):
         assert self.is_named or value is None
         assert not self.is_named or value.is_named and isinstance(value, Variable)
 
     @t.validator
+    @unless_trusted
     def _check_t(self, _, value):
         assert value.is_named == self.is_named
 
     def __attr_post_init__(self):
         assert self.v.is_named == self.t.is_named
 
+    # Constructed directly, which is much faster than attrs.evolve
     def evolve(self, t: Term, v: Variable | None = None):
         if v is None and not t.is_named:
-            return evolve(self, v=v, t=t, is_named=False)
+            return Abs(meta_info=self.meta_info, v=v, t=t, is_named=False)
         elif v is not None and v.is_named and t.is_named:
-            return evolve(self, v=v, t=t, is_named=True)
+            return Abs(meta_info=self.meta_info, v=v, t=t, is_named=True)
         else:
             assert False
 
@@ -258,22 +441,30 @@ class Abs(Term):
         f_vars = self.t.free_variables()
         return f_vars - {self.v.name}
 
-    def _remove_name_with_context(self, context: list[str]) -> Term:
-        new_context = [self.v.name] + context
-        name_less_t = self.t.remove_name_with_context(new_context)
+    def _max_free_index(self) -> int:
+        return max(self.t.max_free_index() - 1, -1)
+
+    def _remove_name_with_context(self, context: NamingContext) -> Term:
+        context.bind(self.v.name)
+        try:
+            name_less_t = self.t.remove_name_with_context(context)
+        finally:
+            context.unbind(self.v.name)
         return self.evolve(t=name_less_t, v=None)
 
 
 @frozen
 class App(Term):
-    t1: Term = field(validator=helpers.not_none)
-    t2: Term = field(validator=helpers.not_none)
+    t1: Term = field(validator=not_none)
+    t2: Term = field(validator=not_none)
 
     @t1.validator
+    @unless_trusted
     def _check_t1(self, _, v):
         assert v.is_named == self.is_named
 
     @t1.validator
+    @unless_trusted
     def _check_t2(self, _, v):
         assert v.is_named == self.is_named
 
@@ -295,9 +486,9 @@ class App(Term):
         if t2 is None:
             t2 = self.t2
         if t1.is_named and t2.is_named:
-            return evolve(self, t1=t1, t2=t2, is_named=True)
+            return App(meta_info=self.meta_info, t1=t1, t2=t2, is_named=True)
         elif not t1.is_named and not t2.is_named:
-            return evolve(self, t1=t1, t2=t2, is_named=False)
+            return App(meta_info=self.meta_info, t1=t1, t2=t2, is_named=False)
         else:
             assert False
 
@@ -331,7 +522,10 @@ class App(Term):
     def _free_variables(self) -> set[str]:
         return self.t1.free_variables() | self.t2.free_variables()
 
-    def _remove_name_with_context(self, context: list[str]) -> Term:
+    def _max_free_index(self) -> int:
+        return max(self.t1.max_free_index(), self.t2.max_free_index())
+
+    def _remove_name_with_context(self, context: NamingContext) -> Term:
         nameless_t1 = self.t1.remove_name_with_context(context)
         nameless_t2 = self.t2.remove_name_with_context(context)
         return self.evolve(t1=nameless_t1, t2=nameless_t2)
@@ -342,7 +536,7 @@ class App(Term):
 
 class Builtin(Term):
     # hack.  the default is an invalid value
-    arity: int = field(validator=[helpers.not_none, helpers.non_negative])
+    arity: int = field(validator=[not_none, non_negative])
     name: str | None = field()
 
     @abstractmethod
@@ -350,7 +544,7 @@ class Builtin(Term):
         pass
 
     def applicable_args(self, args: tuple[Term, ...]) -> bool:
-        assert (not self.is_named and all(not arg.is_named for arg in args))
+        assert trusted or (not self.is_named and all(not arg.is_named for arg in args))
         return len(args) >= self.arity and self._applicable_args(args)
 
     @abstractmethod
@@ -358,18 +552,18 @@ class Builtin(Term):
         pass
 
     def apply_args(self, args: tuple[Term, ...]) -> tuple[Term, tuple[Term, ...]]:
-        assert self.applicable_args(args)
+        assert trusted or self.applicable_args(args)
         reduced = self._apply_args(args)
-        assert not reduced.is_named
+        assert trusted or not reduced.is_named
         return reduced, args[self.arity:]
 
-    def _remove_name_with_context(self, context: list[str]) -> Term:
+    def _remove_name_with_context(self, context: NamingContext) -> Term:
         return evolve(self, is_named=False)
 
 
 @frozen
 class Constant(Builtin):
-    name: str = field(validator=helpers.not_none)
+    name: str = field(validator=not_none)
     arity = 0
 
     def _eval_or_none(self) -> Term | None:
@@ -384,7 +578,10 @@ class Constant(Builtin):
     def _free_variables(self) -> set[str]:
         return set()
 
-    def _remove_name_with_context(self, context: list[str]) -> Term:
+    def _max_free_index(self) -> int:
+        return -1
+
+    def _remove_name_with_context(self, context: NamingContext) -> Term:
         return evolve(self, is_named=False)
 
     def _applicable_args(self, _):
@@ -410,7 +607,10 @@ class BuiltinFunction(Builtin, ABC):
     def _free_variables(self) -> set[str]:
         return set()
 
-    def _remove_name_with_context(self, context: list[str]) -> Term:
+    def _max_free_index(self) -> int:
+        return -1
+
+    def _remove_name_with_context(self, context: NamingContext) -> Term:
         return evolve(self, is_named=False)
 
 
@@ -433,11 +633,107 @@ class Unary(BuiltinFunction, ABC):
         return self._apply_arg(args[0])
 
 
+# Hash consing
+# Interned terms are shared: structurally equal interned terms are the same object.
+# The table only holds weak references, so terms not used anymore are collected.
+# meta_info is not a part of the structure.  The meta_info of the first interned term is kept.
+class InternTable:
+    def __init__(self):
+        self._terms: weakref.WeakValueDictionary[tuple, Term] = weakref.WeakValueDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    def size(self) -> int:
+        return len(self._terms)
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def clear(self):
+        self._terms.clear()
+        self.hits = 0
+        self.misses = 0
+
+    # Returns the interned value, the key (children by identity) and the structural hash
+    def _intern_value(self, value):
+        match value:
+            case Term():
+                t = self.intern(value)
+                return t, id(t), t._intern_hash
+            case tuple() | Terms():
+                interned = tuple(self._intern_value(v) for v in value)
+                return tuple(v for v, _, _ in interned), tuple(k for _, k, _ in interned), \
+                    hash(tuple(h for _, _, h in interned))
+            case Attributes():
+                interned = tuple(self._intern_value(v) for v in value.terms)
+                # Attributes are equal to those of the same items in another order
+                return value.with_terms(tuple(v for v, _, _ in interned)), \
+                    (value.shape.labels, tuple(k for _, k, _ in interned)), \
+                    hash(frozenset(zip(value.shape.labels, (h for _, _, h in interned))))
+            case Delegated():
+                # Interned records are merged, so that their structural hashes are those of the items
+                return self._intern_value(value.flat())
+            case dict():
+                interned = {label: self._intern_value(v) for label, v in value.items()}
+                # the order of labels matters for ListLabels, but not for the equality
+                return {label: v for label, (v, _, _) in interned.items()}, \
+                    tuple((label, k) for label, (_, k, _) in interned.items()), \
+                    hash(frozenset((label, h) for label, (_, _, h) in interned.items()))
+            case _:
+                return value, value, hash(value)
+
+    def intern(self, term: Term) -> Term:
+        if term.is_interned:
+            return term
+        changes = {}
+        keys = [type(term)]
+        hashes = [type(term).__qualname__]
+        for a in attrs.fields(type(term)):
+            if not a.eq:
+                continue
+            value = getattr(term, a.name)
+            interned, k, h = self._intern_value(value)
+            if interned is not value:
+                changes[a.name.lstrip('_')] = interned
+            keys.append(k)
+            hashes.append(h)
+        key = tuple(keys)
+        found = self._terms.get(key)
+        if found is not None:
+            self.hits += 1
+            return found
+        self.misses += 1
+        if len(changes) > 0:
+            term = evolve(term, **changes)
+        object.__setattr__(term, '_intern_hash', hash(tuple(hashes)))
+        self._terms[key] = term
+        return term
+
+
+intern_table = InternTable()
+# If True, fully_eval interns the term at every step
+interning = False
+
+
+def intern(term: Term) -> Term:
+    return intern_table.intern(term)
+
+
+# Equality of terms.  Constant time if both terms are interned and different.
+def term_equal(t1: Term, t2: Term) -> bool:
+    if t1 is t2:
+        return True
+    if t1.is_interned and t2.is_interned and t1._intern_hash != t2._intern_hash:
+        return False
+    return t1 == t2
+
+
 # Evaluation Context
 @frozen
 class Context:
-    head: Term = field(validator=helpers.not_none)
-    args: tuple[Term,...] = field(default=(), validator=helpers.not_none)
+    head: Term = field(validator=not_none)
+    args: tuple[Term,...] = field(default=(), validator=not_none)
 
     @classmethod
     def build(cls, head, args):
@@ -466,7 +762,7 @@ class Context:
     # outermost leftmost reduction.
     def reduce_or_none(self) -> Context | None:
         if isinstance(self.head, Abs) and len(self.args) > 0:
-            head_substituted = self.head.t.subst(0, self.args[0]).shift(-1, 0)
+            head_substituted = self.head.t.subst(0, self.args[0].shift(1, 0)).shift(-1, 0)
             return self.evolve(head=head_substituted, args=self.args[1:])
         if isinstance(self.head, BuiltinFunction) and self.head.applicable_args(self.args):
             reduced, rest = self.head.apply_args(self.args)
@@ -486,7 +782,7 @@ class Context:
 # Builtin data types
 @frozen
 class Data(Builtin, Generic[T], ABC):
-    value: T = field(validator=helpers.not_none)
+    value: T = field(validator=not_none)
 
     @classmethod
     def nameless_repr(cls, value):
@@ -520,6 +816,9 @@ class Data(Builtin, Generic[T], ABC):
     def _free_variables(self):
         return set()
 
+    def _max_free_index(self):
+        return -1
+
     def _remove_name_with_context(self, _):
         return type(self).nameless(value=self.value)
 
@@ -553,15 +852,203 @@ class Boolean(Data[bool]):
     pass
 
 
+# Suffix of a sequence of terms, a tuple from a start.
+# The maximum free index and the free names of the terms from each start are computed when a tail needs them.
+class _Flat:
+    __slots__ = ('terms', '_max', '_names', '_max_from', '_names_from')
+
+    def __init__(self, terms: tuple[Term, ...]):
+        self.terms = terms
+        self._max: int | None = None
+        self._names: frozenset[str] | None = None
+        self._max_from: list[int] | None = None
+        self._names_from: list[frozenset[str]] | None = None
+
+    def max_free(self, start: int) -> int:
+        if self._max is None:
+            self._max = max((t._max_free for t in self.terms), default=-1)
+        if start == 0 or self._max < 0:
+            return self._max
+        if self._max_from is None:
+            m = -1
+            self._max_from = [m] * (len(self.terms) + 1)
+            for i in range(len(self.terms) - 1, -1, -1):
+                m = max(m, self.terms[i]._max_free)
+                self._max_from[i] = m
+        return self._max_from[start]
+
+    def free_names(self, start: int) -> frozenset[str]:
+        if self._names is None:
+            self._names = frozenset().union(*(t._free_names for t in self.terms))
+        if start == 0 or not self._names:
+            return self._names
+        if self._names_from is None:
+            names = frozenset()
+            self._names_from = [names] * (len(self.terms) + 1)
+            for i in range(len(self.terms) - 1, -1, -1):
+                if self.terms[i]._free_names:
+                    names = names | self.terms[i]._free_names
+                self._names_from[i] = names
+        return self._names_from[start]
+
+
+def _tree(t: Term, left: tuple | None, right: tuple | None) -> tuple:
+    if left is None:
+        return t, None, None, t._max_free, t._free_names
+    return t, left, right, max(t._max_free, left[3], right[3]), t._free_names | left[4] | right[4]
+
+
+def _spine(weight: int, tree: tuple, rest: tuple | None) -> tuple:
+    if rest is None:
+        return weight, tree, rest, tree[3], tree[4]
+    return weight, tree, rest, max(tree[3], rest[3]), tree[4] | rest[4]
+
+
+# Persistent sequences of terms, the terms of lists.
+# A sequence is a prefix of the terms added by cons, a skew binary random access list, followed by a suffix.
+# cons, head and tail take constant time and share the rest of the sequence.  Indexing takes logarithmic time
+# in the prefix and constant time in the suffix.  The free indices and names of the terms are aggregated
+# in the nodes, so that the lists built by cons and tail do not walk their terms.
+# The spine of the prefix is (weight, tree, rest, max free index, free names),
+# and a tree is (term, left, right, max free index, free names), the terms in pre-order.
+class Terms(Sequence):
+    __slots__ = ('_spine', '_size', '_flat', '_start', '_tuple')
+
+    def __init__(self, flat: _Flat, start: int = 0, spine: tuple | None = None, size: int = 0):
+        self._flat = flat
+        self._start = start
+        self._spine = spine
+        # The number of terms in the prefix
+        self._size = size
+        self._tuple: tuple[Term, ...] | None = None
+
+    @classmethod
+    def of(cls, terms: Iterable[Term] | None) -> Terms | None:
+        if terms is None or type(terms) is Terms:
+            return terms
+        return cls(_Flat(tuple(terms)))
+
+    def __len__(self) -> int:
+        return self._size + len(self._flat.terms) - self._start
+
+    def cons(self, t: Term) -> Terms:
+        spine = self._spine
+        if spine is not None and spine[2] is not None and spine[0] == spine[2][0]:
+            spine = _spine(2 * spine[0] + 1, _tree(t, spine[1], spine[2][1]), spine[2][2])
+        else:
+            spine = _spine(1, _tree(t, None, None), spine)
+        return Terms(self._flat, self._start, spine, self._size + 1)
+
+    def head(self) -> Term:
+        if self._spine is not None:
+            return self._spine[1][0]
+        return self._flat.terms[self._start]
+
+    def tail(self) -> Terms:
+        if self._spine is None:
+            if self._start >= len(self._flat.terms):
+                raise IndexError('Tail of the empty list')
+            return Terms(self._flat, self._start + 1)
+        weight, tree, rest = self._spine[:3]
+        if weight > 1:
+            half = weight // 2
+            rest = _spine(half, tree[1], _spine(half, tree[2], rest))
+        return Terms(self._flat, self._start, rest, self._size - 1)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.tuple()[i]
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError('List index out of range')
+        if i >= self._size:
+            return self._flat.terms[self._start + i - self._size]
+        spine = self._spine
+        while i >= spine[0]:
+            i -= spine[0]
+            spine = spine[2]
+        weight, tree = spine[:2]
+        while i > 0:
+            weight //= 2
+            if i <= weight:
+                tree, i = tree[1], i - 1
+            else:
+                tree, i = tree[2], i - 1 - weight
+        return tree[0]
+
+    def __iter__(self) -> Iterator[Term]:
+        if self._spine is None:
+            return itertools.islice(self._flat.terms, self._start, None)
+        return iter(self.tuple())
+
+    def tuple(self) -> tuple[Term, ...]:
+        if self._tuple is None:
+            if self._spine is None and self._start == 0:
+                self._tuple = self._flat.terms
+            else:
+                terms = []
+                spine = self._spine
+                while spine is not None:
+                    trees = [spine[1]]
+                    while trees:
+                        tree = trees.pop()
+                        terms.append(tree[0])
+                        if tree[1] is not None:
+                            trees.append(tree[2])
+                            trees.append(tree[1])
+                    spine = spine[2]
+                self._tuple = tuple(terms) + self._flat.terms[self._start:]
+        return self._tuple
+
+    def max_free(self) -> int:
+        m = self._flat.max_free(self._start)
+        return m if self._spine is None else max(m, self._spine[3])
+
+    def free_names(self) -> frozenset[str]:
+        names = self._flat.free_names(self._start)
+        return names if self._spine is None else names | self._spine[4]
+
+    def __eq__(self, other):
+        if type(other) is Terms:
+            return self is other or (len(self) == len(other) and self.tuple() == other.tuple())
+        if type(other) is tuple:
+            return self.tuple() == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.tuple())
+
+    def __add__(self, other) -> tuple[Term, ...]:
+        return self.tuple() + tuple(other)
+
+    def __radd__(self, other) -> tuple[Term, ...]:
+        return tuple(other) + self.tuple()
+
+    def __repr__(self):
+        return repr(self.tuple())
+
+    def __reduce__(self):
+        return Terms.of, (self.tuple(),)
+
+
 @frozen
 class List(Unary):
-    terms: tuple[Term, ...] = field(validator=helpers.not_none)
+    _terms: Terms = field(converter=Terms.of, validator=not_none)
     name: str = 'List'
 
     def __attr_post_init__(self):
         assert all(isinstance(t, Term) for t in self.terms)
         assert len(self.terms) == 0 or all((t == self.is_named for t in self.terms))
 
+    # The terms as a tuple.  The persistent sequence is sequence().
+    @property
+    def terms(self) -> tuple[Term, ...]:
+        return self._terms.tuple()
+
+    def sequence(self) -> Terms:
+        return self._terms
+
     def _eval_or_none(self):
         evaluated = [term.eval_or_none() for term in self.terms]
         if all(t is None for t in evaluated):
@@ -583,7 +1070,10 @@ class List(Unary):
             return evolve(self, terms=tuple(subst_expanded))
 
     def _free_variables(self):
-        return set().union(*[t.free_variables() for t in self.terms])
+        return set(self._terms.free_names())
+
+    def _max_free_index(self):
+        return self._terms.max_free()
 
     def _remove_name_with_context(self, context):
         return List.nameless(meta_info=self.meta_info,
@@ -593,69 +1083,367 @@ class List(Unary):
         return isinstance(term, Integer)
 
     def _apply_arg(self, term):
-        return self.terms[term.value]
+        return self._terms[term.value]
+
+
+# Shapes of records.
+# A shape is the labels of a record in order, and the slot of each label.  Shapes are interned, so that
+# the records with the same labels, such as the objects of a class, share one shape and only hold their terms.
+# Updates of records go through transitions between shapes, which are cached on the shapes,
+# so that adding, removing and overwriting labels copy the terms but not the labels.
+class Shape:
+    __slots__ = ('labels', 'slots', '_added', '_removed', '_merged', '__weakref__')
+
+    def __init__(self, labels: tuple[str, ...]):
+        self.labels = labels
+        self.slots = {label: i for i, label in enumerate(labels)}
+        self._added: dict[str, Shape] = {}
+        self._removed: dict[str, Shape] = {}
+        # shape of the overwriting attributes -> the shape of the result, and the slots of their terms
+        self._merged: dict[Shape, tuple[Shape, tuple[int, ...]]] = {}
+
+    # The label is added at the end
+    def add(self, label: str) -> Shape:
+        s = self._added.get(label)
+        if s is None:
+            s = shape(self.labels + (label,))
+            _count_transition()
+            self._added[label] = s
+        return s
+
+    def remove(self, label: str) -> Shape:
+        s = self._removed.get(label)
+        if s is None:
+            i = self.slots[label]
+            s = shape(self.labels[:i] + self.labels[i + 1:])
+            _count_transition()
+            self._removed[label] = s
+        return s
+
+    # The labels of other which are not in this shape are added at the end, in the order of other
+    def merge(self, other: Shape) -> tuple[Shape, tuple[int, ...]]:
+        merged = self._merged.get(other)
+        if merged is None:
+            s = self
+            for label in other.labels:
+                if label not in s.slots:
+                    s = s.add(label)
+            merged = s, tuple(s.slots[label] for label in other.labels)
+            _count_transition()
+            self._merged[other] = merged
+        return merged
+
+    def __repr__(self):
+        return f'Shape{self.labels!r}'
+
+
+_shapes: weakref.WeakValueDictionary[tuple[str, ...], Shape] = weakref.WeakValueDictionary()
+
+
+# The transitions cached on the shapes hold the shapes strongly.  They are all dropped when there are more than
+# max_transitions of them, so that the shapes no longer used are collected.
+max_transitions = 1 << 16
+_transitions = 0
+
+
+def _count_transition():
+    global _transitions
+    if _transitions >= max_transitions:
+        for s in list(_shapes.values()):
+            s._added.clear()
+            s._removed.clear()
+            s._merged.clear()
+        _transitions = 0
+    _transitions += 1
+
+
+def shape(labels: tuple[str, ...]) -> Shape:
+    s = _shapes.get(labels)
+    if s is None:
+        s = Shape(labels)
+        _shapes[labels] = s
+    return s
+
+
+# Attributes of a record, a read-only mapping from the labels of the shape to the terms in the slots.
+# Equal to the mappings with the same items, in any order, like dict.
+class Attributes(Mapping):
+    __slots__ = ('shape', 'terms')
+
+    def __init__(self, s: Shape, terms: tuple[Term, ...]):
+        assert len(s.labels) == len(terms)
+        self.shape = s
+        self.terms = terms
+
+    @classmethod
+    def of(cls, labels: tuple[str, ...], terms: tuple[Term, ...]) -> Attributes:
+        return cls(shape(labels), terms)
+
+    @classmethod
+    def convert(cls, attributes: Mapping[str, Term] | None) -> Attributes | Delegated | None:
+        if attributes is None or type(attributes) is Attributes or type(attributes) is Delegated:
+            return attributes
+        return cls(shape(tuple(attributes)), tuple(attributes.values()))
+
+    def with_terms(self, terms: tuple[Term, ...]) -> Attributes:
+        return Attributes(self.shape, terms)
+
+    # Functional updates, in the order of labels of dict
+
+    def set(self, label: str, term: Term) -> Attributes:
+        i = self.shape.slots.get(label)
+        if i is None:
+            return Attributes(self.shape.add(label), self.terms + (term,))
+        return Attributes(self.shape, self.terms[:i] + (term,) + self.terms[i + 1:])
+
+    def remove(self, label: str) -> Attributes:
+        i = self.shape.slots[label]
+        return Attributes(self.shape.remove(label), self.terms[:i] + self.terms[i + 1:])
+
+    def update(self, other: Attributes) -> Attributes:
+        if other.shape is self.shape:
+            return other
+        s, slots = self.shape.merge(other.shape)
+        terms = list(self.terms)
+        terms.extend([None] * (len(s.labels) - len(terms)))
+        for i, t in zip(slots, other.terms):
+            terms[i] = t
+        return Attributes(s, tuple(terms))
+
+    def __getitem__(self, label: str) -> Term:
+        return self.terms[self.shape.slots[label]]
+
+    def get(self, label: str, default=None):
+        i = self.shape.slots.get(label)
+        return default if i is None else self.terms[i]
+
+    def __contains__(self, label) -> bool:
+        return label in self.shape.slots
+
+    def __iter__(self):
+        return iter(self.shape.labels)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def items(self) -> tuple[tuple[str, Term], ...]:
+        return tuple(zip(self.shape.labels, self.terms))
+
+    def values(self) -> tuple[Term, ...]:
+        return self.terms
+
+    # A dict which can be modified
+    def copy(self) -> dict[str, Term]:
+        return dict(zip(self.shape.labels, self.terms))
+
+    def __eq__(self, other):
+        if type(other) is Attributes and self.shape is other.shape:
+            return self.terms == other.terms
+        return super().__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.copy())
+
+    def __reduce__(self):
+        return Attributes.of, (self.shape.labels, self.terms)
+
+
+# Attributes of a record which delegates to another record, the delegate.
+# Only the own attributes are held, and the other labels are looked up in the delegate, so that the objects
+# of a class share the attributes of the class instead of copying them.
+# The mapping is the same as the attributes of the delegate updated by the own attributes, in the same order.
+# The merged attributes of a delegating record are cached on it when a label is looked up through it,
+# so that lookups in the objects of a class do not walk the chain of its ancestors.
+# The terms of the delegate shadowed by the own attributes are reduced with the delegate, though never looked up.
+# So a record only delegates if they are closed normal forms, which neither reduce nor have free variables,
+# and otherwise holds the merged attributes.  Use of() to build the attributes.
+class Delegated(Mapping):
+    __slots__ = ('own', 'delegate', '_merged')
+
+    def __init__(self, own: Attributes, delegate: Record):
+        assert type(own) is Attributes and isinstance(delegate, Record)
+        self.own = own
+        self.delegate = delegate
+        self._merged: Attributes | None = None
+
+    @staticmethod
+    def of(own: Attributes, delegate: Record) -> Attributes | Delegated:
+        base = _merged_attributes(delegate)
+        for label in own.shape.labels:
+            t = base.get(label)
+            if t is not None and not _inert(t):
+                return base.update(own)
+        return Delegated(own, delegate)
+
+    # The attributes of the delegate
+    def _base(self) -> Attributes:
+        return _merged_attributes(self.delegate)
+
+    # The attributes of the delegate updated by the own attributes, not cached
+    def flat(self) -> Attributes:
+        return self._base().update(self.own) if self._merged is None else self._merged
+
+    @property
+    def shape(self) -> Shape:
+        return self._base().shape.merge(self.own.shape)[0]
+
+    @property
+    def terms(self) -> tuple[Term, ...]:
+        return self.flat().terms
+
+    # Functional updates, in the order of labels of dict
+
+    def set(self, label: str, term: Term) -> Attributes | Delegated:
+        return Delegated.of(self.own.set(label, term), self.delegate)
+
+    # The label may be shadowed, so the attributes are merged
+    def remove(self, label: str) -> Attributes:
+        return self.flat().remove(label)
+
+    def update(self, other: Attributes) -> Attributes | Delegated:
+        return Delegated.of(self.own.update(other), self.delegate)
+
+    def __getitem__(self, label: str) -> Term:
+        i = self.own.shape.slots.get(label)
+        return self._base()[label] if i is None else self.own.terms[i]
+
+    def get(self, label: str, default=None):
+        i = self.own.shape.slots.get(label)
+        return self._base().get(label, default) if i is None else self.own.terms[i]
+
+    def __contains__(self, label) -> bool:
+        return label in self.own.shape.slots or label in self._base().shape.slots
+
+    def __iter__(self):
+        return iter(self.shape.labels)
+
+    def __len__(self) -> int:
+        return len(self.shape.labels)
+
+    def items(self) -> tuple[tuple[str, Term], ...]:
+        return self.flat().items()
+
+    def values(self) -> tuple[Term, ...]:
+        return self.flat().terms
+
+    def copy(self) -> dict[str, Term]:
+        return self.flat().copy()
+
+    def __eq__(self, other):
+        if type(other) is Delegated:
+            if self.delegate is other.delegate and self.own == other.own:
+                return True
+            other = other.flat()
+        return self.flat() == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.copy())
+
+    def __reduce__(self):
+        return Delegated, (self.own, self.delegate)
+
+
+# The attributes of a record, merged and cached if it delegates
+def _merged_attributes(r: Record) -> Attributes:
+    a = r._attributes
+    if type(a) is Attributes:
+        return a
+    if a._merged is None:
+        a._merged = a._base().update(a.own)
+    return a._merged
+
+
+# Closed normal forms, marked so that they are checked once
+def _inert(t: Term) -> bool:
+    if t.is_named or not t.is_closed():
+        return False
+    if not t.is_normal and t.eval_or_none() is None:
+        t.mark_normal()
+    return t.is_normal
 
 
 @frozen
 class Record(Unary):
     name = 'Record'
-    _attributes: dict[str, Term] = \
-        field(validator=helpers.not_none)
+    _attributes: Attributes | Delegated = \
+        field(converter=Attributes.convert, validator=not_none)
 
     def __attr_post_init__(self):
         assert all(isinstance(k, str) for k in self.attributes().keys())
         assert all(isinstance(t, Term) for t in self.attributes().values())
 
     @classmethod
-    def build(cls, is_named: bool, attributes: dict[str, Term]):
-        return cls(is_named=is_named, attributes=attributes.copy())
+    def build(cls, is_named: bool, attributes: Mapping[str, Term]):
+        return cls(is_named=is_named, attributes=attributes)
 
-    def evolve(self, is_named: bool | None = None, attributes: dict[str, Term] | None =None):
+    def evolve(self, is_named: bool | None = None, attributes: Mapping[str, Term] | None =None):
         if attributes is None:
             attributes = self._attributes
         if is_named is None:
             is_named = self.is_named
-        return evolve(self, is_named=is_named, attributes=attributes.copy())
-
-    def attributes(self):
-        return self._attributes.copy()
+        return evolve(self, is_named=is_named, attributes=attributes)
+
+    # Read-only.  Use copy() to get a dict which can be modified.
+    def attributes(self) -> Attributes | Delegated:
+        return self._attributes
+
+    # The attributes held by the record, and the record it delegates the other labels to
+    def delegation(self) -> tuple[Attributes, Record | None]:
+        a = self._attributes
+        return (a, None) if type(a) is Attributes else (a.own, a.delegate)
+
+    # The record with f applied to the terms it holds and to its delegate, which is kept shared.
+    # f maps a record to a record, and keeps the closed normal forms shadowed in the delegate.
+    def map_terms(self, f: Callable[[Term], Term], is_named: bool | None = None) -> Record:
+        own, delegate = self.delegation()
+        own = own.with_terms(tuple(f(t) for t in own.terms))
+        return self.evolve(attributes=own if delegate is None else Delegated(own, f(delegate)), is_named=is_named)
+
+    # Same as map_terms for f returning None for the unchanged terms.  None if nothing changes.
+    def _map_terms_or_none(self, f: Callable[[Term], Term | None]) -> Record | None:
+        own, delegate = self.delegation()
+        mapped = tuple(f(t) for t in own.terms)
+        mapped_delegate = None if delegate is None else f(delegate)
+        if mapped_delegate is None and all(t is None for t in mapped):
+            return None
+        own = own.with_terms(tuple(t if u is None else u for t, u in zip(own.terms, mapped)))
+        if delegate is None:
+            return self.evolve(attributes=own)
+        return self.evolve(attributes=Delegated(own, helpers.default(mapped_delegate, delegate)))
 
     def _eval_or_none(self):
-        evaluated = {label: t.eval_or_none() for label, t in self.attributes().items()}
-        if all(t is None for _, t in evaluated.items()):
-            return None
-        else:
-            evaluated_expand = dict(evaluated)
-            for k in evaluated.keys():
-                if evaluated_expand[k] is None:
-                    evaluated_expand[k] = self.attributes()[k]
-            return self.evolve(attributes=evaluated_expand)
+        return self._map_terms_or_none(lambda t: t.eval_or_none())
 
     def _shift(self, d, c):
-        shifted = dict((label, t.shift(d, c)) for label, t in self.attributes().items())
-        return self.evolve(attributes=shifted)
+        return self.map_terms(lambda t: t.shift(d, c))
 
     def _subst_or_none(self, num, term):
-        subst = dict((label, t.subst_or_none(num, term)) for label, t in self.attributes().items())
-        if all(t is None for _, t in subst.items()):
-            return None
-        else:
-            for k in subst.keys():
-                if subst[k] is None:
-                    subst[k] = self._attributes[k]
-            return self.evolve(attributes=subst)
+        return self._map_terms_or_none(lambda t: t.subst_or_none(num, term))
 
     def _free_variables(self):
-        return set().union(*(t.free_variables() for _, t in self.attributes().items()))
+        own, delegate = self.delegation()
+        free = set().union(*(t.free_variables() for t in own.terms))
+        return free if delegate is None else free.union(delegate.free_variables())
+
+    def _max_free_index(self):
+        own, delegate = self.delegation()
+        m = max((t.max_free_index() for t in own.terms), default=-1)
+        return m if delegate is None else max(m, delegate.max_free_index())
 
     def _remove_name_with_context(self, context):
-        return self.evolve(
-            attributes=dict((label, t.remove_name_with_context(context)) for label, t
-                            in self.attributes().items()),
-            is_named=False)
+        return self.map_terms(lambda t: t.remove_name_with_context(context), is_named=False)
 
     def _applicable(self, term: Term):
-        return isinstance(term, String) and term.value in self.attributes()
+        return isinstance(term, String) and term.value in self._attributes
 
     def _apply_arg(self, term: String):
-        return self.attributes()[term.value]
+        return self._attributes[term.value]
+
+
+# The store is opened after all the terms are defined, since eval_cache imports this module
+if os.environ.get('PGSN_EVAL_CACHE', '') not in ('', '0'):
+    set_eval_cache(importlib.import_module('eval_cache').EvalCache(os.environ['PGSN_EVAL_CACHE']))
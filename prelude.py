@@ -0,0 +1,133 @@
+from __future__ import annotations
+import copyreg
+import hashlib
+import importlib
+import os
+import pickle
+import sys
+import attrs
+from pgsn_term import Term, LambdaInterpreterError
+
+# Snapshot of the prelude, the closed terms defined at the module level of the libraries.
+# The snapshot holds the nameless normal forms of the definitions.  Loading it sets them as the memoized
+# nameless forms of the definitions, so that terms using the definitions neither convert nor reduce them again.
+# The snapshot is built by running this module, and is ignored when the sources have changed.
+
+version = 1
+modules = ('stdlib', 'object_term', 'gsn_term')
+# Modules whose changes invalidate the snapshot
+sources = ('pgsn_term', 'helpers', 'meta_info', 'debug_info', 'machine', 'prelude') + modules
+default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__', 'pgsn_prelude.pickle')
+# Steps to normalize each definition.  A definition not normalized within the steps is stored unreduced.
+steps = 10000
+
+
+# The path of the snapshot, given by the environment variable PGSN_PRELUDE.  None if disabled.
+def snapshot_path() -> str | None:
+    path = os.environ.get('PGSN_PRELUDE', default_path)
+    return None if path in ('', '0') else path
+
+
+def source_digest() -> str:
+    h = hashlib.sha256(f'{version} {sys.version_info[:2]} {attrs.__version__}'.encode())
+    for name in sources:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), f'{name}.py'), 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+# (module, name) -> term for the closed named terms of the modules.
+# A term reexported by a later module is only listed under the first module.
+def definitions() -> dict[tuple[str, str], Term]:
+    defs = {}
+    seen = set()
+    for module_name in modules:
+        module = importlib.import_module(module_name)
+        for name, t in vars(module).items():
+            if isinstance(t, Term) and t.is_named and t.is_closed() and id(t) not in seen:
+                seen.add(id(t))
+                defs[(module_name, name)] = t
+    return defs
+
+
+def normalize(t: Term) -> Term:
+    nameless = t.remove_name()
+    try:
+        return nameless.fully_eval(steps=steps, engine='need', cache=False)
+    except (LambdaInterpreterError, RecursionError):
+        return nameless
+
+
+# Structural hashes of interned terms depend on the process, so they are not stored
+class _Pickler(pickle.Pickler):
+    def reducer_override(self, obj):
+        if not isinstance(obj, Term) or not obj.is_interned:
+            return NotImplemented
+        state = tuple(None if a.name == '_intern_hash' else getattr(obj, a.name) for a in attrs.fields(type(obj)))
+        return copyreg.__newobj__, (type(obj),), state
+
+
+def build(path: str | None = None) -> int:
+    path = path or snapshot_path() or default_path
+    terms = {key: normalize(t) for key, t in definitions().items()}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 100000))
+    try:
+        tmp = f'{path}.{os.getpid()}'
+        with open(tmp, 'wb') as f:
+            pickler = _Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickler.dump((version, source_digest()))
+            pickler.clear_memo()
+            pickler.dump(terms)
+        os.replace(tmp, path)
+    finally:
+        sys.setrecursionlimit(limit)
+    return len(terms)
+
+
+# Returns the number of the definitions loaded.  0 if the snapshot is missing or out of date.
+def load(path: str | None = None) -> int:
+    path = snapshot_path() if path is None else path
+    if path is None or not os.path.exists(path):
+        return 0
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 100000))
+    try:
+        with open(path, 'rb') as f:
+            # The terms are not read if the header does not match
+            if pickle.load(f) != (version, source_digest()):
+                return 0
+            terms = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return 0
+    finally:
+        sys.setrecursionlimit(limit)
+    loaded = 0
+    for (module_name, name), nameless in terms.items():
+        module = sys.modules.get(module_name)
+        t = getattr(module, name, None)
+        if isinstance(t, Term) and t.is_named and t.is_closed():
+            object.__setattr__(t, '_nameless', nameless)
+            loaded += 1
+    return loaded
+
+
+warmed = False
+
+
+# Sets the normal forms of the definitions, from the snapshot if it is up to date, otherwise computed here.
+# Returns the number of the definitions.
+def warm() -> int:
+    global warmed
+    defs = definitions()
+    if not warmed and load() == 0:
+        for t in defs.values():
+            object.__setattr__(t, '_nameless', normalize(t))
+    warmed = True
+    return len(defs)
+
+
+if __name__ == '__main__':
+    p = sys.argv[1] if len(sys.argv) > 1 else snapshot_path() or default_path
+    print(f'{build(p)} definitions written to {p}')
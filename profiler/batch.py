@@ -0,0 +1,38 @@
+import os
+import sys
+import subprocess
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import gsn
+
+root = os.path.join(os.path.dirname(__file__), '..')
+robot = os.path.join(root, 'examples', 'robot.py')
+
+
+# One process per case, as in the nightly runs
+def separate(n):
+    env = dict(os.environ, PYTHONPATH=root)
+    start = time.perf_counter()
+    for _ in range(n):
+        subprocess.run([sys.executable, '-c', f'import gsn, runpy; '
+                                              f'gsn.pgsn_to_gsn(runpy.run_path({robot!r})["system"], steps=10000)'],
+                       cwd=root, env=env, check=True)
+    return time.perf_counter() - start
+
+
+def batch(n, workers):
+    start = time.perf_counter()
+    results = list(gsn.pgsn_to_gsn_many([gsn.case_file(robot)] * n, steps=10000, workers=workers))
+    assert all(r.error is None for r in results)
+    return time.perf_counter() - start, results[0].steps
+
+
+if __name__ == '__main__':
+    # The snapshot is not used, so that the prelude is normalized in each process
+    os.environ['PGSN_PRELUDE'] = '0'
+    n = 8
+    elapsed = separate(n)
+    print(f'{n} processes: {elapsed:.3f}s, {n / elapsed:.1f} cases/s')
+    for workers in (1, 2, 4):
+        elapsed, steps = batch(n, workers)
+        print(f'batch, {workers} workers: {elapsed:.3f}s, {n / elapsed:.1f} cases/s, {steps} steps per case')
@@ -0,0 +1,36 @@
+import os
+import sys
+import pickle
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'examples'))
+import stdlib
+import serialize
+import robot
+
+
+def bench(name, t, repeat=20):
+    results = []
+    for fmt, dumps, loads in (('pickle', lambda x: pickle.dumps(x, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads),
+                              ('binary', serialize.dumps, serialize.loads)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            data = dumps(t)
+        encode = (time.perf_counter() - start) / repeat
+        start = time.perf_counter()
+        for _ in range(repeat):
+            loads(data)
+        decode = (time.perf_counter() - start) / repeat
+        mb = len(data) / 1e6
+        results.append(f'{fmt} {len(data)} bytes, encode {mb / encode:.1f}MB/s {encode * 1000:.2f}ms, '
+                       f'decode {mb / decode:.1f}MB/s {decode * 1000:.2f}ms')
+    print(f'{name}:\n  ' + '\n  '.join(results))
+
+
+if __name__ == '__main__':
+    sys.setrecursionlimit(100000)
+    bench('robot (named)', robot.system)
+    bench('robot (nameless)', robot.system.remove_name())
+    bench('robot (normal form)', robot.system.fully_eval(steps=10000))
+    bench('robot, robot and web_server', stdlib.list_term((robot.robot, robot.robot, robot.web_server)).remove_name())
+    bench('10000 integers', stdlib.list_term(tuple(stdlib.integer(i) for i in range(10000))).remove_name(), repeat=3)
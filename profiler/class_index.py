@@ -0,0 +1,46 @@
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import stdlib
+import object_term
+from stdlib import if_then_else, has_label, boolean_or, equal, false, lambda_abs_vars
+from object_term import define_class, instantiate, is_instance, base_class
+
+# The lambda-level is_subclass, which walks the _parent chain by reduction
+_c1 = stdlib.variable('_class1')
+_c2 = stdlib.variable('_class2')
+_f = stdlib.variable('_is_subclass')
+_name = stdlib.string('_class_name')
+recursive_is_subclass = stdlib.recursive(_f, lambda_abs_vars(
+    (_c1, _c2),
+    if_then_else(has_label(_c1)(_name))
+    (boolean_or(equal(_c1(_name))(_c2(_name)))(_f(_c1(stdlib.string('_parent')))(_c2)))
+    (false)))
+_obj = stdlib.variable('obj')
+_cls = stdlib.variable('cls')
+recursive_is_instance = lambda_abs_vars((_obj, _cls),
+                                        recursive_is_subclass(_obj(stdlib.string('_instance')))(_cls))
+
+
+def bench(name, checks, engine):
+    t = stdlib.list_term(tuple(checks))
+    start = time.perf_counter()
+    v = stdlib.value_of(t, steps=10 ** 7, engine=engine, cache=False)
+    assert all(v)
+    print(f'  {name}: {time.perf_counter() - start:.3f}s')
+
+
+# Checking that objects of the deepest class of a chain are instances of every class in the chain
+if __name__ == '__main__':
+    sys.setrecursionlimit(100000)
+    for depth in (5, 20, 50):
+        classes = [base_class]
+        for i in range(depth):
+            classes.append(define_class(stdlib.string(f'C{i}'))(classes[-1])(stdlib.empty_record))
+        obj = instantiate(classes[-1])(stdlib.empty_record)
+        print(f'depth {depth}, {len(classes)} checks')
+        for engine in ('need', 'compiled'):
+            bench(f'recursive, {engine}', [recursive_is_instance(obj)(c) for c in classes], engine)
+            object_term.class_index.clear()
+            bench(f'index, {engine}', [is_instance(obj)(c) for c in classes], engine)
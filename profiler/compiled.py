@@ -0,0 +1,43 @@
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'examples'))
+import stdlib
+import compiler
+import robot
+
+
+# The same template applied to different arguments, interpreted and compiled.
+def bench_foldr(lengths, engine):
+    template = stdlib.integer_sum.remove_name()
+    lists = [stdlib.list_term(tuple(stdlib.integer(i) for i in range(n))).remove_name() for n in lengths]
+    start = time.perf_counter()
+    if engine == 'compiled':
+        f = compiler.Compiled(template)
+        for ll in lists:
+            f(ll, steps=100000)
+    else:
+        for ll in lists:
+            template(ll).fully_eval(steps=100000, engine=engine)
+    return time.perf_counter() - start
+
+
+def bench_robot(repeat, engine):
+    t = robot.system.remove_name()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        t.fully_eval(steps=100000, engine=engine)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    for n in (10, 50, 100):
+        lengths = range(n - 10, n)
+        print(f'foldr, lists of length {n - 10}..{n - 1}: '
+              f'machine {bench_foldr(lengths, "machine"):.3f}s, need {bench_foldr(lengths, "need"):.3f}s, '
+              f'compiled {bench_foldr(lengths, "compiled"):.3f}s')
+    for repeat in (1, 10):
+        print(f'robot x {repeat}: machine {bench_robot(repeat, "machine"):.3f}s, '
+              f'need {bench_robot(repeat, "need"):.3f}s, compiled {bench_robot(repeat, "compiled"):.3f}s')
+    print(f'compile cache: {compiler.cache.size()} entries, hit rate {compiler.cache.hit_rate():.2f}')
@@ -0,0 +1,51 @@
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import server
+
+# Latency of evaluating a document on each edit, spawning Python against asking the server
+source = "from gsn_term import *\n" \
+         "system = goal(description='Top', support=strategy(description='Argument', sub_goals=[\n" + \
+         "".join(f"    goal(description='Goal {i}', support=evidence(description='Test {i}')),\n" for i in range(20)) + \
+         "]))\n"
+edits = 20
+
+
+def spawn(path):
+    start = time.perf_counter()
+    for _ in range(3):
+        subprocess.run([sys.executable, os.path.join(os.path.dirname(__file__), '..', 'gsn.py'), path,
+                        '--workers', '1'], check=True, capture_output=True)
+    print(f'spawn per edit: {(time.perf_counter() - start) / 3 * 1000:.1f}ms')
+
+
+def serve(socket_path, workers):
+    s = server.Server(socket_path, workers=workers)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(s.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    with server.Client(socket_path) as client:
+        for i in range(edits):
+            edited = source.replace('Goal 0', f'Goal 0 edit {i}')
+            assert 'gsn' in client.call('gsn', source=edited, key='doc', steps=100000)
+        metrics = client.call('metrics')['metrics']
+    print(f'server, {workers} workers: mean {metrics["latency_mean"] * 1000:.1f}ms, '
+          f'p95 {metrics["latency_p95"] * 1000:.1f}ms per edit')
+    asyncio.run_coroutine_threadsafe(s.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'case.py')
+        with open(path, 'w') as f:
+            f.write(source)
+        spawn(path)
+        serve(os.path.join(d, 'pgsn.sock'), 0)
+        serve(os.path.join(d, 'pgsn.sock'), 1)
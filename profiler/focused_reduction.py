@@ -0,0 +1,27 @@
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import stdlib
+
+
+# A redex deep inside a term whose other parts are already normal.
+# The substitution based reducer searches the whole term at every step.
+def wide_term(width: int, length: int):
+    normal = [stdlib.record({'description': stdlib.string(f'Goal {i}'), 'support': stdlib.empty})
+              for i in range(width)]
+    work = stdlib.integer_sum(stdlib.list_term(tuple(stdlib.integer(i) for i in range(length))))
+    return stdlib.list_term(tuple(normal) + (work,))
+
+
+def bench(term, engine):
+    t = term.remove_name()
+    start = time.perf_counter()
+    t.fully_eval(steps=100000, engine=engine)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    for width in (10, 100, 1000):
+        term = wide_term(width, 20)
+        print(f'width {width}: substitution {bench(term, "substitution"):.3f}s, focus {bench(term, "focus"):.3f}s')
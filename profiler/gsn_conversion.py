@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import gsn
+import stdlib
+from gsn_term import goal, strategy, evidence
+
+
+def wide(n):
+    return goal(description='Top', support=strategy(description='Argument', sub_goals=[
+        goal(description=f'Goal {i}', support=evidence(description=f'Test {i}')) for i in range(n)]))
+
+
+def deep(n):
+    t = goal(description=f'Goal {n}', support=evidence(description='Test'))
+    for i in range(n):
+        t = goal(description=f'Goal {i}', support=strategy(description=f'Argument {i}', sub_goals=[t]))
+    return t
+
+
+def bench(name, f):
+    start = time.perf_counter()
+    try:
+        f()
+        print(f'  {name}: {time.perf_counter() - start:.3f}s')
+    except RecursionError:
+        print(f'  {name}: RecursionError')
+
+
+# Conversion of the normal forms only.  The dict pass is what pgsn_to_gsn did before reading the dicts into nodes.
+if __name__ == '__main__':
+    sys.setrecursionlimit(100000)
+    for name, t in (('wide 1000', wide(1000)), ('wide 5000', wide(5000)), ('deep 200', deep(200)),
+                    ('deep 500', deep(500))):
+        nf = t.fully_eval(steps=10 ** 6, engine='need')
+        print(name)
+        bench('dict pass (stdlib._uncast)', lambda: stdlib._uncast(nf))
+        bench('from_normal_form', lambda: gsn.from_normal_form(nf))
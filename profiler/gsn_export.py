@@ -0,0 +1,40 @@
+import io
+import json
+import os
+import sys
+import time
+import uuid
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import gsn
+
+
+def tree(n):
+    return gsn.Goal(description='Top', assumptions=(), contexts=(), support=gsn.Strategy(
+        description='Argument', sub_goals=tuple(
+            gsn.Goal(description=f'Goal {i}', assumptions=(), contexts=(), support=gsn.Evidence(description='Test'))
+            for i in range(n))))
+
+
+# The export before the parts were generated: random IDs and concatenation of the lists of the sub-goals
+def concatenated(g, parent_id, my_id):
+    children_ids = [str(uuid.uuid4()) for _ in g.children()]
+    parts = [g.part(parent_id, my_id, children_ids)]
+    for c, i in zip(g.children(), children_ids):
+        parts = parts + concatenated(c, my_id, i)
+    return parts
+
+
+def bench(name, f):
+    start = time.perf_counter()
+    f()
+    print(f'  {name}: {time.perf_counter() - start:.3f}s')
+
+
+if __name__ == '__main__':
+    for n in (5000, 20000, 50000):
+        g = tree(n)
+        print(f'{2 * n + 2} nodes')
+        if n <= 20000:
+            bench('concatenated, uuid4', lambda: json.dumps(concatenated(g, 'root', 'top'), indent=4))
+        bench('python_val + json.dumps', lambda: json.dumps(gsn.python_val(g), indent=4))
+        bench('write_json', lambda: gsn.write_json(g, io.StringIO()))
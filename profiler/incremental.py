@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import eval_cache
+from gsn_term import goal, strategy, evidence
+
+
+def group(i, width, changed=None):
+    sub_goals = []
+    for j in range(width):
+        description = f'Test results {i}.{j}' + (' (revised)' if j == changed else '')
+        sub_goals.append(goal(description=f'Goal {i}.{j}', support=evidence(description=description)))
+    return goal(description=f'Group {i}', support=strategy(description=f'Argument over {i}', sub_goals=sub_goals))
+
+
+# A case of width * width goals, each supported by an evidence
+def case(groups):
+    return goal(description='Top', support=strategy(description='Argument over groups', sub_goals=groups))
+
+
+def timed(f):
+    start = time.perf_counter()
+    r = f()
+    return r, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    sys.setrecursionlimit(100000)
+    for width in (3, 6, 10):
+        groups = [group(i, width) for i in range(width)]
+        t = case(groups)
+        # The edited case shares the unchanged groups
+        edited = case(groups[:-1] + [group(width - 1, width, changed=width - 1)])
+        full, full_time = timed(lambda: edited.fully_eval(steps=100000, cache=False))
+        _, need_time = timed(lambda: edited.fully_eval(steps=100000, engine='need', cache=False))
+        incremental = eval_cache.Incremental()
+        _, first = timed(lambda: incremental.fully_eval(t, steps=100000))
+        hits, misses = incremental.hits, incremental.misses
+        nf, again = timed(lambda: incremental.fully_eval(edited, steps=100000))
+        assert nf == full
+        print(f'{width * width} goals: full {full_time:.3f}s, full by need {need_time:.3f}s, '
+              f'incremental first {first:.3f}s, '
+              f'after one edit {again:.3f}s ({incremental.hits - hits} hits, {incremental.misses - misses} misses)')
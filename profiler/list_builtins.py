@@ -0,0 +1,32 @@
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import stdlib
+from stdlib import lambda_abs, integer
+
+_x = stdlib.variable('x')
+
+
+def bench(name, term, engine='substitution'):
+    t = term.remove_name()
+    start = time.perf_counter()
+    t.fully_eval(steps=10 ** 6, engine=engine)
+    print(f'  {name}: {time.perf_counter() - start:.3f}s')
+
+
+if __name__ == '__main__':
+    sys.setrecursionlimit(100000)
+    for n in (1000, 10000, 100000):
+        print(f'{n} elements')
+        ll = stdlib.range_term(integer(0))(integer(n))
+        bench('range', ll)
+        bench('integer_sum', stdlib.integer_sum(ll))
+        bench('length', stdlib.length(ll))
+        bench('reverse', stdlib.reverse(ll))
+        bench('append', stdlib.append(ll)(ll))
+        bench('zip', stdlib.zip_term(ll)(ll))
+        bench('filter', stdlib.filter_term(lambda_abs(_x, stdlib.equal(_x)(integer(0))))(ll))
+        bench('list_all', stdlib.list_all(lambda_abs(_x, stdlib.true))(ll))
+        if n <= 1000:
+            bench('foldr (plus)', stdlib.foldr(stdlib.plus)(integer(0))(ll), engine='need')
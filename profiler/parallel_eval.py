@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import parallel
+import stdlib
+from gsn_term import goal, strategy, evidence
+
+
+# A strategy over width goals, each argued over depth evidences
+def wide_case(width, depth):
+    sub_goals = [goal(description=f'Goal {i}',
+                      support=strategy(description=f'Argument over {i}',
+                                       sub_goals=[goal(description=f'Goal {i}.{j}',
+                                                       support=evidence(description=f'Test {i}.{j}'))
+                                                  for j in range(depth)]))
+                 for i in range(width)]
+    return goal(description='Top', support=strategy(description='Argument over goals', sub_goals=sub_goals))
+
+
+if __name__ == '__main__':
+    sys.setrecursionlimit(100000)
+    cores = os.cpu_count() or 1
+    # A batch of cases, each normalized in a worker
+    t = stdlib.list_term(tuple(wide_case(8, 8) for _ in range(8))).remove_name()
+    start = time.perf_counter()
+    expected = t.fully_eval(steps=10 ** 6, engine='need', cache=False)
+    sequential = time.perf_counter() - start
+    print(f'{cores} cores, sequential {sequential:.3f}s')
+    for n in (2, 4, 8, 16, 32):
+        if n > max(cores, 2):
+            break
+        with parallel.ParallelEvaluator(workers=n, threshold=2000, engine='need') as evaluator:
+            # The pool is started before the measurement
+            list(evaluator.pool().map(int, range(n)))
+            start = time.perf_counter()
+            assert evaluator.fully_eval(t, steps=10 ** 6) == expected
+            elapsed = time.perf_counter() - start
+        print(f'{n} workers: {elapsed:.3f}s, {evaluator.tasks} tasks, speedup {sequential / elapsed:.2f}x')
@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'examples'))
+import pgsn_term
+import gsn
+import eval_cache
+import robot
+from gsn_term import goal, strategy, evidence
+
+
+# The robot case with one of its sub-arguments changed
+def changed_system():
+    web_server = goal(description="The server can deal with DoS attacks on the server",
+                      support=evidence(description="Access restriction and rate limiting"))
+    return goal(description="The robot does not make unintended movements",
+                support=strategy(description="Argument over the robot and the server",
+                                 sub_goals=[
+                                     goal(description="The robot behaves according to commands",
+                                          support=strategy(description="Argument over each threat",
+                                                           sub_goals=[robot.robot])),
+                                     goal(description="The server gives correct commands to the robot",
+                                          support=strategy(description="Argument over each threat",
+                                                           sub_goals=[web_server]))]))
+
+
+def bench(name, t, cache):
+    start = time.perf_counter()
+    hits, misses = cache.hits, cache.misses
+    gsn.pgsn_to_gsn(t, steps=10000)
+    print(f'{name}: {time.perf_counter() - start:.3f}s ({cache.hits - hits} hits, {cache.misses - misses} misses)')
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as d:
+        cache = eval_cache.EvalCache(os.path.join(d, 'cache.db'))
+        start = time.perf_counter()
+        gsn.pgsn_to_gsn(robot.system, steps=10000)
+        print(f'without cache: {time.perf_counter() - start:.3f}s')
+        pgsn_term.set_eval_cache(cache)
+        bench('cold', robot.system, cache)
+        bench('warm', robot.system, cache)
+        bench('one sub-argument changed', changed_system(), cache)
+        print(f'{cache.size()} entries')
@@ -0,0 +1,45 @@
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import stdlib
+from pgsn_term import List, Integer
+from stdlib import integer
+
+cons = stdlib.Cons.nameless()
+tail = stdlib.Tail.nameless()
+head = stdlib.Head.nameless()
+
+
+def bench(name, f):
+    start = time.perf_counter()
+    f()
+    print(f'  {name}: {time.perf_counter() - start:.3f}s')
+
+
+def build(n):
+    ll = List.nameless(terms=())
+    one = Integer.nameless(value=1)
+    for _ in range(n):
+        ll = cons._apply_args((one, ll))
+
+
+def consume(ll):
+    while head._applicable(ll):
+        head._apply_arg(ll)
+        ll = tail._apply_arg(ll)
+
+
+# Building a list by n Cons and consuming it by n Head and Tail, which copied the tuple of the list each time,
+# and folding it through the lambda-level foldr, which calls Head and Tail
+if __name__ == '__main__':
+    sys.setrecursionlimit(100000)
+    for n in (1000, 10000, 100000):
+        print(f'{n} elements')
+        named = stdlib.range_term(integer(0))(integer(n))
+        ll = named.fully_eval(steps=10 ** 6)
+        bench('cons', lambda: build(n))
+        bench('head, tail', lambda: consume(ll))
+        if n <= 10000:
+            bench('foldr (plus)', lambda: stdlib.foldr(stdlib.plus)(integer(0))(named).fully_eval(
+                steps=10 ** 7, engine='need'))
@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import tracemalloc
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import prelude
+import stdlib
+from pgsn_term import Record, Delegated
+from object_term import define_class, instantiate
+from gsn_term import goal_class
+
+
+def allocated(f, n):
+    tracemalloc.start()
+    kept = [f(i) for i in range(n)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size / n
+
+
+def bench(name, f, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        f()
+    print(f'  {name}: {(time.perf_counter() - start) / n * 1e6:.2f}us')
+
+
+# Objects of a class chain like CCGoal -> Goal -> GSN -> BaseClass, holding a copy of the attributes of the class
+# as before, and delegating to the class record
+if __name__ == '__main__':
+    prelude.warm()
+    cc_goal_term = define_class('CCGoal', goal_class, {'assurance_level': stdlib.string('EAL4')})
+    cc_goal = cc_goal_term.fully_eval(steps=10000, engine='need')
+    descriptions = [stdlib.string(f'Goal {i}') for i in range(10000)]
+    nameless = [d.remove_name() for d in descriptions]
+    extra = {f'field_{i}': stdlib.integer(i) for i in range(40)}
+    wide = define_class('Wide', cc_goal_term, extra).fully_eval(steps=10000, engine='need')
+    for cls in (cc_goal, wide):
+        print(f'class with {len(cls.attributes())} attributes')
+
+        def own(i):
+            return Record.nameless(attributes={'description': nameless[i], '_instance': cls}).attributes()
+
+        flat = allocated(lambda i: Record.nameless(attributes=cls.attributes().flat().update(own(i))), 10000)
+        delegated = allocated(lambda i: Record.nameless(attributes=Delegated(own(i), cls)), 10000)
+        print(f'  copied: {flat:.0f} bytes per object')
+        print(f'  delegated: {delegated:.0f} bytes per object')
+
+    x = stdlib.variable('x')
+    goals = stdlib.let(x, cc_goal_term,
+                       stdlib.list_term(tuple(instantiate(x)({'description': d}) for d in descriptions[:1000])))
+    start = time.perf_counter()
+    objs = goals.fully_eval(steps=10 ** 7, engine='need').terms
+    print(f'  instantiate 1000 goals, need: {time.perf_counter() - start:.3f}s, '
+          f'{len({id(o.delegation()[1]) for o in objs})} class records')
+
+    # Lookups of an attribute of the root of the chain
+    for depth in (1, 10, 50):
+        cls = cc_goal_term
+        for i in range(depth - 1):
+            cls = define_class(stdlib.string(f'C{i}'))(cls)(stdlib.empty_record)
+        obj = instantiate(cls)({'description': descriptions[0]}).fully_eval(steps=10 ** 6, engine='need')
+        copied = Record.nameless(attributes=obj.attributes().copy())
+        print(f'depth {depth}')
+        bench('lookup, copied', lambda: copied.attributes()['_object'], 100000)
+        bench('lookup, delegated', lambda: obj.attributes()['_object'], 100000)
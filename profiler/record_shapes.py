@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import pgsn_term
+import stdlib
+from gsn_term import goal, strategy, evidence
+
+
+def records(term):
+    found = {}
+    stack = [term]
+    while stack:
+        t = stack.pop()
+        if id(t) in found:
+            continue
+        found[id(t)] = t
+        match t:
+            case pgsn_term.Record():
+                stack.extend(t.attributes().values())
+            case pgsn_term.List():
+                stack.extend(t.terms)
+    return [t for t in found.values() if isinstance(t, pgsn_term.Record)]
+
+
+# Memory of the attributes of the records in the normal form of a GSN tree,
+# as the dicts held before and as the terms of the shapes
+if __name__ == '__main__':
+    n = 1000
+    t = goal(description='Top', support=strategy(description='Argument', sub_goals=[
+        goal(description=f'Goal {i}', support=evidence(description=f'Test {i}')) for i in range(n)]))
+    nf = t.fully_eval(steps=10 ** 6, engine='need')
+    rs = records(nf)
+    shapes = {id(r.attributes().shape): r.attributes().shape for r in rs}
+    as_dicts = sum(sys.getsizeof({label: u for label, u in r.attributes().items()}) for r in rs)
+    as_shapes = sum(sys.getsizeof(r.attributes()) + sys.getsizeof(r.attributes().terms) for r in rs) + \
+        sum(sys.getsizeof(s.labels) + sys.getsizeof(s.slots) for s in shapes.values())
+    nodes = 2 * n + 2
+    print(f'{len(rs)} records, {len(shapes)} shapes, {nodes} GSN nodes')
+    print(f'  dicts: {as_dicts / nodes:.0f} bytes per node')
+    print(f'  shapes: {as_shapes / nodes:.0f} bytes per node')
+    r = nf.attributes()['support']
+    label = stdlib.string('description').remove_name()
+    start = time.perf_counter()
+    for _ in range(100000):
+        r._apply_arg(label)
+    print(f'projection: {(time.perf_counter() - start) * 10:.2f}us')
+    start = time.perf_counter()
+    for _ in range(100000):
+        r.attributes().copy()[label.value]
+    print(f'projection copying the attributes: {(time.perf_counter() - start) * 10:.2f}us')
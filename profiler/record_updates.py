@@ -0,0 +1,46 @@
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import stdlib
+from pgsn_term import Record
+from object_term import define_class, instantiate
+from gsn_term import goal_class
+
+
+def bench(name, f, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        f()
+    print(f'  {name}: {(time.perf_counter() - start) / n * 1e6:.2f}us')
+
+
+# Updates of the records of a class chain like CCGoal -> Goal -> GSN -> BaseClass,
+# copying the attributes into a dict as before, and through the transitions of the shapes
+if __name__ == '__main__':
+    cc_goal = define_class('CCGoal', goal_class, {'assurance_level': stdlib.string('EAL4')})
+    obj = instantiate(cc_goal)({'description': stdlib.string('Goal')}).fully_eval(steps=10000)
+    parent = obj.attributes()['_parent']
+    extra = Record.nameless(attributes={'description': obj.attributes()['description'],
+                                        'note': obj.attributes()['description']})
+    print(f'object with {len(obj.attributes())} attributes')
+    t = obj.attributes()['description']
+
+    def add_dict():
+        d = obj.attributes().copy()
+        d['note'] = t
+        return Record.nameless(attributes=d)
+
+    def overwrite_dict():
+        d = parent.attributes().copy()
+        for k, u in extra.attributes().items():
+            d[k] = u
+        return Record.nameless(attributes=d)
+
+    bench('add, dict', add_dict, 100000)
+    bench('add, shape', lambda: Record.nameless(attributes=obj.attributes().set('note', t)), 100000)
+    bench('overwrite, dict', overwrite_dict, 100000)
+    bench('overwrite, shape', lambda: Record.nameless(attributes=parent.attributes().update(extra.attributes())),
+          100000)
+    bench('instantiate', lambda: instantiate(cc_goal)({'description': stdlib.string('Goal')}).fully_eval(
+        steps=10000, engine='need'), 20)
@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import stdlib
+import object_term
+import machine
+from stdlib import lambda_abs, lambda_abs_vars, if_then_else, equal, head, tail, empty, plus
+
+# The self application fixed point operator, replaced by the builtin Fix
+_f = stdlib.variable('f')
+_x = stdlib.variable('x')
+y_combinator = lambda_abs(_f, lambda_abs(_x, _f(_x(_x)))(lambda_abs(_x, _f(_x(_x)))))
+
+_foldr = stdlib.variable('_foldr')
+_acc = stdlib.variable('acc')
+_list = stdlib.variable('list')
+foldr_y = y_combinator(lambda_abs_vars((_foldr, _f, _acc, _list),
+                                       if_then_else(equal(_list)(empty))
+                                       (_acc)
+                                       (_f(head(_list))(_foldr(_f)(_acc)(tail(_list))))))
+
+_is_subclass = stdlib.variable('_is_subclass')
+_class1 = stdlib.variable('_class1')
+_class2 = stdlib.variable('_class2')
+_name = stdlib.string('_class_name')
+is_subclass_y = y_combinator(lambda_abs_vars((_is_subclass, _class1, _class2),
+                                             if_then_else(stdlib.has_label(_class1)(_name))
+                                             (stdlib.boolean_or(equal(_class1(_name))(_class2(_name)))
+                                              (_is_subclass(_class1(stdlib.string('_parent')))(_class2)))
+                                             (stdlib.false)))
+
+
+# The number of steps of the substitution based reducer
+def steps(t):
+    n = 0
+    while True:
+        t_reduced = t.eval_or_none()
+        if t_reduced is None:
+            return n
+        t = t_reduced
+        n += 1
+
+
+def bench(t):
+    t = t.remove_name() if t.is_named else t
+    start = time.perf_counter()
+    n = steps(t)
+    elapsed = time.perf_counter() - start
+    m = machine.Machine(10 ** 6, sharing=True)
+    m.nf(t, None, 0)
+    return f'{n} steps {elapsed:.3f}s (call-by-need {m.reductions} reductions)'
+
+
+# Normalized, so that only is_subclass is measured
+def class_hierarchy(depth):
+    cls = object_term.base_class
+    for i in range(depth):
+        cls = object_term.define_class(stdlib.string(f'Class{i}'))(cls)(stdlib.empty_record)
+    return cls.fully_eval(steps=10 ** 6, engine='need')
+
+
+if __name__ == '__main__':
+    sys.setrecursionlimit(100000)
+    for n in (10, 20, 40):
+        ll = stdlib.list_term(tuple(stdlib.integer(i) for i in range(n)))
+        print(f'sum of {n} integers: Y {bench(foldr_y(plus)(stdlib.integer(0))(ll))}, '
+              f'Fix {bench(stdlib.integer_sum(ll))}')
+    for depth in (5, 10, 20):
+        cls, base = class_hierarchy(depth), object_term.base_class.fully_eval()
+        print(f'is_subclass, depth {depth}: Y {bench(is_subclass_y.remove_name()(cls)(base))}, '
+              f'Fix {bench(object_term.is_subclass.remove_name()(cls)(base))}')
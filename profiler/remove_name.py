@@ -0,0 +1,42 @@
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'examples'))
+import stdlib
+import robot
+from stdlib import lambda_abs_vars, let
+
+
+def bench(name, make, repeat=1):
+    # Fresh terms, so that the memoized nameless forms are not used
+    terms = [make() for _ in range(repeat)]
+    start = time.perf_counter()
+    for t in terms:
+        t.remove_name()
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    for t in terms:
+        t.remove_name()
+    print(f'{name}: {elapsed:.3f}s, memoized {time.perf_counter() - start:.6f}s')
+
+
+def nested_abs(n):
+    names = [stdlib.variable(f'x{i}') for i in range(n)]
+    return lambda_abs_vars(names, names[0](names[n // 2])(names[-1]))
+
+
+def nested_let(n):
+    names = [stdlib.variable(f'x{i}') for i in range(n)]
+    t = names[-1]
+    for i in reversed(range(1, n)):
+        t = let(names[i], names[i - 1], t)
+    return lambda_abs_vars((names[0],), t)
+
+
+if __name__ == '__main__':
+    sys.setrecursionlimit(100000)
+    for n in (100, 1000, 5000):
+        bench(f'{n} nested abstractions', lambda: nested_abs(n))
+        bench(f'{n} nested lets', lambda: nested_let(n))
+    bench('robot', lambda: robot.system)
@@ -0,0 +1,36 @@
+import os
+import sys
+import subprocess
+import tempfile
+import time
+
+root = os.path.join(os.path.dirname(__file__), '..')
+
+# Time to the first GSN in a new process, with and without the prelude snapshot
+first_gsn = ('import time; start = time.perf_counter(); '
+             'import sys; sys.path.append("examples"); import robot, gsn; '
+             'imported = time.perf_counter(); '
+             'gsn.pgsn_to_gsn(robot.system, steps=10000); '
+             'print(imported - start, time.perf_counter() - imported)')
+
+
+def bench(snapshot, repeat=5):
+    env = dict(os.environ, PGSN_PRELUDE=snapshot, PYTHONPATH=root)
+    imports, evals, totals = [], [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', first_gsn], cwd=root, env=env, check=True,
+                             stdout=subprocess.PIPE, text=True).stdout
+        totals.append(time.perf_counter() - start)
+        i, e = out.split()
+        imports.append(float(i))
+        evals.append(float(e))
+    return f'process {min(totals):.3f}s, import {min(imports):.3f}s, first pgsn_to_gsn {min(evals):.3f}s'
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'prelude.pickle')
+        subprocess.run([sys.executable, 'prelude.py', path], cwd=root, check=True)
+        print(f'without snapshot: {bench("0")}')
+        print(f'with snapshot: {bench(path)}')
@@ -0,0 +1,27 @@
+import os
+import sys
+import subprocess
+import time
+
+root = os.path.join(os.path.dirname(__file__), '..')
+
+# Each workload runs in a new process, since the mode is chosen at the process start
+workloads = {
+    'test suite': [sys.executable, '-m', 'pytest', '-q', '-p', 'no:cacheprovider', 'tests'],
+    'robot': [sys.executable, '-c', 'import sys; sys.path.append("examples"); import robot, gsn; '
+                                    'gsn.pgsn_to_gsn(robot.system, steps=10000)'],
+}
+
+
+def bench(command, trusted):
+    env = dict(os.environ, PGSN_TRUSTED='1' if trusted else '0', PYTHONPATH=root)
+    start = time.perf_counter()
+    subprocess.run(command, cwd=root, env=env, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    for name, command in workloads.items():
+        debug = bench(command, False)
+        trusted = bench(command, True)
+        print(f'{name}: debug {debug:.3f}s, trusted {trusted:.3f}s, speedup {debug / trusted:.2f}x')
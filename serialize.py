@@ -0,0 +1,360 @@
+from __future__ import annotations
+import io
+import sys
+from typing import BinaryIO, Iterator
+import attrs
+from debug_info import DebugInfo
+from meta_info import MetaInfo
+from pgsn_term import Term, Attributes, Delegated, Terms
+
+# Binary serialization of terms.
+# A stream is the magic followed by records.  Records define strings, classes, meta infos and nodes,
+# each numbered in the order of definition, and mark roots, the terms written to the stream.
+# A node is the class and the init fields of a term, children being references to nodes defined before.
+# Structurally equal nodes are defined only once, so that the stream and the decoded terms are DAGs.
+# Integers are unsigned LEB128 varints, zigzag encoded if signed.
+
+magic = b'PGSN\x01'
+
+_R_STRING = 1
+_R_CLASS = 2
+_R_META = 3
+_R_NODE = 4
+_R_ROOT = 5
+
+_V_NONE = 0
+_V_FALSE = 1
+_V_TRUE = 2
+_V_INT = 3
+_V_STR = 4
+_V_NODE = 5
+_V_TUPLE = 6
+_V_LIST = 7
+_V_DICT = 8
+_V_META = 9
+_V_DEBUG = 10
+
+
+class SerializationError(Exception):
+    pass
+
+
+# Fields given to the constructor, and their argument names
+def _fields(cls: type) -> tuple[tuple[str, str], ...]:
+    fields = _class_fields.get(cls)
+    if fields is None:
+        fields = tuple((a.name, a.name.lstrip('_')) for a in attrs.fields(cls) if a.init)
+        _class_fields[cls] = fields
+    return fields
+
+
+# Modules whose classes a stream may name
+_term_modules = frozenset(('pgsn_term', 'stdlib', 'object_term', 'explicit_subst'))
+_class_fields: dict[type, tuple[tuple[str, str], ...]] = {}
+
+
+def _write_varint(out: bytearray, n: int):
+    while n > 0x7f:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _zigzag(n: int) -> int:
+    return n << 1 if n >= 0 else ((-n) << 1) - 1
+
+
+def _unzigzag(n: int) -> int:
+    return n >> 1 if n & 1 == 0 else -((n + 1) >> 1)
+
+
+# Writes terms to a binary stream.  Tables are kept across writes, so that terms written later
+# refer to the strings and nodes written before.
+class Encoder:
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self._out = bytearray(magic)
+        self._strings: dict[str, int] = {}
+        self._classes: dict[type, int] = {}
+        self._metas: dict[MetaInfo, int] = {}
+        # Structure of a node -> node number
+        self._nodes: dict[bytes, int] = {}
+        # id of a term -> (term, node number).  Terms are kept so that ids are not reused.
+        self._seen: dict[int, tuple[Term, int]] = {}
+
+    def write(self, term: Term):
+        n = self._node(term)
+        self._out.append(_R_ROOT)
+        _write_varint(self._out, n)
+        self.stream.write(self._out)
+        self._out = bytearray()
+
+    def _string(self, s: str) -> int:
+        n = self._strings.get(s)
+        if n is None:
+            n = len(self._strings)
+            self._strings[s] = n
+            b = s.encode('utf-8')
+            self._out.append(_R_STRING)
+            _write_varint(self._out, len(b))
+            self._out += b
+        return n
+
+    def _class(self, cls: type) -> int:
+        n = self._classes.get(cls)
+        if n is None:
+            module, name = self._string(cls.__module__), self._string(cls.__qualname__)
+            n = len(self._classes)
+            self._classes[cls] = n
+            self._out.append(_R_CLASS)
+            _write_varint(self._out, module)
+            _write_varint(self._out, name)
+        return n
+
+    def _meta(self, info: MetaInfo) -> int:
+        n = self._metas.get(info)
+        if n is None:
+            b = bytearray()
+            self._value(b, info.debug_info)
+            self._value(b, info.name_info)
+            n = len(self._metas)
+            self._metas[info] = n
+            self._out.append(_R_META)
+            self._out += b
+        return n
+
+    # Dispatches on the exact type first, since isinstance on terms goes through ABCMeta
+    def _value(self, out: bytearray, v):
+        t = type(v)
+        if t is MetaInfo:
+            out.append(_V_META)
+            _write_varint(out, self._meta(v))
+        elif v is None:
+            out.append(_V_NONE)
+        elif t is bool:
+            out.append(_V_TRUE if v else _V_FALSE)
+        elif t is str:
+            out.append(_V_STR)
+            _write_varint(out, self._string(v))
+        elif t is int:
+            out.append(_V_INT)
+            _write_varint(out, _zigzag(v))
+        elif t is tuple or t is list or t is Terms:
+            out.append(_V_LIST if t is list else _V_TUPLE)
+            _write_varint(out, len(v))
+            for x in v:
+                self._value(out, x)
+        elif t is dict or t is Attributes or t is Delegated:
+            out.append(_V_DICT)
+            _write_varint(out, len(v))
+            for k, x in v.items():
+                self._value(out, k)
+                self._value(out, x)
+        elif t is DebugInfo:
+            out.append(_V_DEBUG)
+            self._value(out, v.source)
+            self._value(out, v.location)
+        elif isinstance(v, Term):
+            out.append(_V_NODE)
+            _write_varint(out, self._seen[id(v)][1])
+        else:
+            raise SerializationError(f'Cannot serialize {v!r}')
+
+    # Children are defined before their parents, without recursion
+    def _node(self, term: Term) -> int:
+        seen = self._seen
+        stack = [(term, False)]
+        while stack:
+            t, expanded = stack.pop()
+            if id(t) in seen:
+                continue
+            fields = _fields(type(t))
+            if not expanded:
+                stack.append((t, True))
+                for name, _ in fields:
+                    _push_children(stack, getattr(t, name), seen)
+                continue
+            b = bytearray()
+            _write_varint(b, self._class(type(t)))
+            for name, _ in fields:
+                self._value(b, getattr(t, name))
+            key = bytes(b)
+            n = self._nodes.get(key)
+            if n is None:
+                n = len(self._nodes)
+                self._nodes[key] = n
+                self._out.append(_R_NODE)
+                self._out += key
+            seen[id(t)] = (t, n)
+        return seen[id(term)][1]
+
+
+_leaves = (MetaInfo, bool, str, int, DebugInfo, type(None))
+
+
+def _push_children(stack: list, v, seen: dict):
+    t = type(v)
+    if t in _leaves:
+        return
+    if t is tuple or t is list or t is Terms:
+        for x in v:
+            _push_children(stack, x, seen)
+    elif t is dict or t is Attributes or t is Delegated:
+        for x in v.values():
+            _push_children(stack, x, seen)
+    elif isinstance(v, Term) and id(v) not in seen:
+        stack.append((v, False))
+
+
+# Reads the terms written by an Encoder
+class Decoder:
+    def __init__(self, stream: BinaryIO, chunk: int = 1 << 16):
+        self.stream = stream
+        self.chunk = chunk
+        self._buf = b''
+        self._pos = 0
+        self._strings: list[str] = []
+        self._classes: list[tuple[type, tuple[tuple[str, str], ...]]] = []
+        self._metas: list[MetaInfo] = []
+        self._nodes: list[Term] = []
+        if self._read(len(magic)) != magic:
+            raise SerializationError('Not a serialized term')
+
+    def __iter__(self) -> Iterator[Term]:
+        while True:
+            t = self.read()
+            if t is None:
+                return
+            yield t
+
+    # The next root, or None at the end of the stream
+    def read(self) -> Term | None:
+        try:
+            return self._read_root()
+        except (IndexError, UnicodeDecodeError) as e:
+            raise SerializationError('Broken stream') from e
+
+    def _read_root(self) -> Term | None:
+        while True:
+            if self._pos == len(self._buf) and not self._fill(1):
+                return None
+            tag = self._byte()
+            if tag == _R_NODE:
+                cls, fields = self._classes[self._varint()]
+                self._nodes.append(cls(**{arg: self._value() for _, arg in fields}))
+            elif tag == _R_ROOT:
+                return self._nodes[self._varint()]
+            elif tag == _R_STRING:
+                self._strings.append(self._read(self._varint()).decode('utf-8'))
+            elif tag == _R_CLASS:
+                module, name = self._strings[self._varint()], self._strings[self._varint()]
+                self._classes.append(self._resolve(module, name))
+            elif tag == _R_META:
+                debug_info = self._value()
+                self._metas.append(MetaInfo(debug_info=debug_info, name_info=self._value()))
+            else:
+                raise SerializationError(f'Unknown record {tag}')
+
+    # Only terms of the loaded term modules are created, and nothing is imported, so that a stream cannot run
+    # arbitrary code
+    @staticmethod
+    def _resolve(module: str, name: str) -> tuple[type, tuple[tuple[str, str], ...]]:
+        try:
+            if module not in _term_modules:
+                raise KeyError(module)
+            cls = sys.modules[module]
+            for part in name.split('.'):
+                cls = getattr(cls, part)
+        except (KeyError, AttributeError) as e:
+            raise SerializationError(f'Unknown class {module}.{name}') from e
+        if not (isinstance(cls, type) and issubclass(cls, Term)):
+            raise SerializationError(f'{module}.{name} is not a term')
+        return cls, _fields(cls)
+
+    def _fill(self, n: int) -> bool:
+        rest = self._buf[self._pos:]
+        while len(rest) < n:
+            data = self.stream.read(max(self.chunk, n - len(rest)))
+            if not data:
+                self._buf, self._pos = rest, 0
+                return False
+            rest += data
+        self._buf, self._pos = rest, 0
+        return True
+
+    def _read(self, n: int) -> bytes:
+        if self._pos + n > len(self._buf) and not self._fill(n):
+            raise SerializationError('Unexpected end of stream')
+        b = self._buf[self._pos:self._pos + n]
+        self._pos += n
+        return b
+
+    def _byte(self) -> int:
+        try:
+            b = self._buf[self._pos]
+        except IndexError:
+            if not self._fill(1):
+                raise SerializationError('Unexpected end of stream')
+            b = self._buf[self._pos]
+        self._pos += 1
+        return b
+
+    def _varint(self) -> int:
+        b = self._byte()
+        if b < 0x80:
+            return b
+        n = b & 0x7f
+        shift = 7
+        while True:
+            b = self._byte()
+            n |= (b & 0x7f) << shift
+            if b < 0x80:
+                return n
+            shift += 7
+
+    def _value(self):
+        tag = self._byte()
+        if tag == _V_NODE:
+            return self._nodes[self._varint()]
+        elif tag == _V_META:
+            return self._metas[self._varint()]
+        elif tag == _V_STR:
+            return self._strings[self._varint()]
+        elif tag == _V_INT:
+            return _unzigzag(self._varint())
+        elif tag == _V_NONE:
+            return None
+        elif tag == _V_FALSE or tag == _V_TRUE:
+            return tag == _V_TRUE
+        elif tag == _V_TUPLE:
+            return tuple(self._value() for _ in range(self._varint()))
+        elif tag == _V_LIST:
+            return [self._value() for _ in range(self._varint())]
+        elif tag == _V_DICT:
+            return {self._value(): self._value() for _ in range(self._varint())}
+        elif tag == _V_DEBUG:
+            source = self._value()
+            return DebugInfo(source=source, location=self._value())
+        else:
+            raise SerializationError(f'Unknown value {tag}')
+
+
+def dump(term: Term, stream: BinaryIO):
+    Encoder(stream).write(term)
+
+
+def dumps(term: Term) -> bytes:
+    out = io.BytesIO()
+    dump(term, out)
+    return out.getvalue()
+
+
+def load(stream: BinaryIO) -> Term:
+    t = Decoder(stream).read()
+    if t is None:
+        raise SerializationError('No term in the stream')
+    return t
+
+
+def loads(data: bytes) -> Term:
+    return load(io.BytesIO(data))
@@ -0,0 +1,310 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import base64
+import collections
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import gsn
+import prelude
+import serialize
+from eval_cache import Incremental
+from pgsn_term import Term
+
+# Evaluation server for editors.
+# The server listens on a Unix socket for requests, one JSON object per line, and answers each of them
+# with one JSON object per line, in the order the evaluations finish.
+#   {"id": 1, "op": "eval", "term": <base64 of serialize.dumps>, "steps": 1000, "engine": null, "key": "doc"}
+#   {"id": 2, "op": "gsn", "source": <Python source>, "name": "system", "key": "doc"}
+#   {"id": 3, "op": "cancel", "target": 1}
+#   {"id": 4, "op": "metrics"}
+# Evaluations run in a bounded pool of worker processes, forked after the prelude is warmed.
+# Requests with the same key are documents being edited: they are run by the same worker, which keeps the normal
+# forms of the last version of the document, and a request supersedes the pending request of the same key.
+# A superseded or cancelled request is answered {"id": ..., "cancelled": true}.  If it is already running,
+# the worker finishes it and its result is dropped.
+
+default_socket = os.environ.get('PGSN_SOCKET', os.path.join(tempfile.gettempdir(), f'pgsn-{os.getuid()}.sock'))
+# Documents of which a worker keeps the normal forms
+documents_limit = 64
+# Latencies kept for the metrics
+latency_window = 1000
+
+
+class RequestError(Exception):
+    pass
+
+
+# key -> the normal forms of the last version of the document, in the worker
+_documents: dict[str, Incremental] = {}
+
+
+def _document(key: str) -> Incremental:
+    incremental = _documents.pop(key, None)
+    if incremental is None:
+        incremental = Incremental()
+        if len(_documents) >= documents_limit:
+            del _documents[next(iter(_documents))]
+    _documents[key] = incremental
+    return incremental
+
+
+def _fully_eval(t: Term, steps: int, engine: str | None, key: str | None) -> Term:
+    if key is None:
+        return t.fully_eval(steps, engine=engine)
+    return _document(key).fully_eval(t, steps, engine)
+
+
+# Runs an evaluation request in the worker
+def _evaluate(request: dict) -> dict:
+    steps = request.get('steps', 1000)
+    engine = request.get('engine')
+    key = request.get('key')
+    if 'term' in request:
+        t = serialize.loads(base64.b64decode(request['term']))
+    elif 'source' in request:
+        namespace = {}
+        exec(compile(request['source'], key or '<source>', 'exec'), namespace)
+        t = namespace.get(request.get('name', 'system'))
+        if not isinstance(t, Term):
+            raise RequestError(f"No term {request.get('name', 'system')} in the source")
+    else:
+        raise RequestError('No term or source')
+    nf = _fully_eval(t, steps, engine, key)
+    if request['op'] == 'eval':
+        return {'term': base64.b64encode(serialize.dumps(nf)).decode('ascii')}
+    return {'gsn': gsn.python_val(gsn.from_normal_form(nf))}
+
+
+class Server:
+    def __init__(self, path: str = default_socket, workers: int | None = None, queue_limit: int = 256):
+        self.path = path
+        # Worker processes.  0 runs the evaluations in a thread of the server.
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        # Requests waiting or running, beyond which requests are rejected
+        self.queue_limit = queue_limit
+        self._executors: list[Executor] = []
+        # Requests waiting or running on each executor
+        self._loads: list[int] = []
+        # (connection, id) -> evaluation, key -> evaluation of the request waiting or running
+        self._tasks: dict[tuple[int, object], asyncio.Future] = {}
+        self._keys: dict[str, asyncio.Future] = {}
+        self._server: asyncio.AbstractServer | None = None
+        self._started = time.monotonic()
+        self._latencies: collections.deque[float] = collections.deque(maxlen=latency_window)
+        self.counts = {'requests': 0, 'completed': 0, 'failed': 0, 'cancelled': 0, 'rejected': 0}
+
+    async def start(self):
+        prelude.warm()
+        if self.workers == 0:
+            self._executors = [ThreadPoolExecutor(1)]
+        else:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+            self._executors = [ProcessPoolExecutor(1, mp_context=context) for _ in range(self.workers)]
+        self._loads = [0] * len(self._executors)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._connection, path=self.path)
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for executor in self._executors:
+            executor.shutdown(cancel_futures=True)
+        self._executors = []
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def queue_depth(self) -> int:
+        return sum(self._loads)
+
+    def metrics(self) -> dict:
+        latencies = sorted(self._latencies)
+        n = len(latencies)
+        return dict(self.counts,
+                    queue_depth=self.queue_depth(),
+                    workers=self.workers,
+                    uptime=time.monotonic() - self._started,
+                    latency_mean=sum(latencies) / n if n > 0 else None,
+                    latency_p50=latencies[n // 2] if n > 0 else None,
+                    latency_p95=latencies[min(n - 1, n * 95 // 100)] if n > 0 else None)
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self._respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def _respond(self, line: bytes, writer: asyncio.StreamWriter):
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            request, response = {}, {'error': f'Invalid request: {e}'}
+        else:
+            if isinstance(request, dict):
+                response = await self.handle(request, id(writer))
+            else:
+                request, response = {}, {'error': 'Invalid request: not an object'}
+        writer.write(json.dumps(dict(response, id=request.get('id'))).encode() + b'\n')
+        await writer.drain()
+
+    # Request ids are those of the connection
+    async def handle(self, request: dict, connection: int = 0) -> dict:
+        match request.get('op'):
+            case 'eval' | 'gsn':
+                return await self._run(request, connection)
+            case 'cancel':
+                task = self._tasks.get((connection, request.get('target')))
+                return {'cancelled': task is not None and task.cancel()}
+            case 'metrics':
+                return {'metrics': self.metrics()}
+            case op:
+                return {'error': f'Unknown operation {op}'}
+
+    def _executor(self, key: str | None) -> int:
+        if key is not None:
+            return hash(key) % len(self._executors)
+        return min(range(len(self._executors)), key=self._loads.__getitem__)
+
+    # The load of an executor is released when the evaluation finishes, which is later than the cancellation
+    # of the request if it is already running in the worker
+    def _release(self, i: int):
+        loop = asyncio.get_running_loop()
+
+        def decrement():
+            self._loads[i] -= 1
+
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(decrement)
+            except RuntimeError:
+                # The loop is closed
+                pass
+        return release
+
+    async def _run(self, request: dict, connection: int) -> dict:
+        self.counts['requests'] += 1
+        if self.queue_depth() >= self.queue_limit:
+            self.counts['rejected'] += 1
+            return {'error': 'Too many requests'}
+        request_id, key = (connection, request.get('id')), request.get('key')
+        if key in self._keys:
+            self._keys[key].cancel()
+        i = self._executor(key)
+        start = time.perf_counter()
+        future = self._executors[i].submit(_evaluate, request)
+        self._loads[i] += 1
+        future.add_done_callback(self._release(i))
+        task = asyncio.wrap_future(future)
+        if request_id[1] is not None:
+            self._tasks[request_id] = task
+        if key is not None:
+            self._keys[key] = task
+        try:
+            response = await task
+            self.counts['completed'] += 1
+        except asyncio.CancelledError:
+            # The server itself is not being cancelled
+            if asyncio.current_task().cancelling():
+                raise
+            self.counts['cancelled'] += 1
+            return {'cancelled': True}
+        except Exception as e:
+            self.counts['failed'] += 1
+            return {'error': f'{type(e).__name__}: {e}'}
+        finally:
+            if self._tasks.get(request_id) is task:
+                del self._tasks[request_id]
+            if key is not None and self._keys.get(key) is task:
+                del self._keys[key]
+        self._latencies.append(time.perf_counter() - start)
+        return response
+
+
+# Synchronous client, for tools and tests
+class Client:
+    def __init__(self, path: str = default_socket, timeout: float | None = None):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(path)
+        self._file = self._socket.makefile('rwb')
+        self._next_id = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def send(self, op: str, **fields) -> int:
+        self._next_id += 1
+        self._file.write(json.dumps(dict(fields, op=op, id=self._next_id)).encode() + b'\n')
+        self._file.flush()
+        return self._next_id
+
+    def receive(self) -> dict:
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError('Connection closed by the server')
+        return json.loads(line)
+
+    # Sends a request and waits for its response, skipping the responses to other requests
+    def call(self, op: str, **fields) -> dict:
+        request_id = self.send(op, **fields)
+        while (response := self.receive())['id'] != request_id:
+            pass
+        return response
+
+    def eval(self, term: Term, steps: int = 1000, engine: str | None = None, key: str | None = None) -> Term:
+        response = self.call('eval', term=base64.b64encode(serialize.dumps(term if not term.is_named else term.remove_name())).decode('ascii'),
+                             steps=steps, engine=engine, key=key)
+        if 'error' in response:
+            raise RequestError(response['error'])
+        return serialize.loads(base64.b64decode(response['term']))
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description='PGSN evaluation server')
+    parser.add_argument('--socket', default=default_socket)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--queue-limit', type=int, default=256)
+    args = parser.parse_args(argv)
+    server = Server(args.socket, workers=args.workers, queue_limit=args.queue_limit)
+    print(f'Listening on {args.socket}', file=sys.stderr)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == '__main__':
+    main()
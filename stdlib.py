@@ -3,7 +3,7 @@ import helpers
 from typing import Sequence, Any
 from attrs import frozen, evolve, field
 from pgsn_term import BuiltinFunction, Term, Unary, Variable, Abs, App, String, Integer, \
-    Boolean, List, Record, Constant
+    Boolean, List, Record, Delegated, Constant, NamingContext, not_none
 import pgsn_term
 
 
@@ -30,27 +30,27 @@ class Cons(BuiltinFunction):
         return isinstance(args[1], List)
 
     def _apply_args(self, args: tuple[Term, List]):
-        return evolve(args[1], terms=(args[0],) + args[1].terms)
+        return evolve(args[1], terms=args[1].sequence().cons(args[0]))
 
 @frozen
 class Head(Unary):
     name = 'Head'
 
     def _applicable(self, arg: Term):
-        return isinstance(arg, List) and len(arg.terms) >= 1
+        return isinstance(arg, List) and len(arg.sequence()) >= 1
 
     def _apply_arg(self, arg: List) -> Term:
-        return arg.terms[0]
+        return arg.sequence().head()
 
 @frozen
 class Tail(Unary):
     name = 'Tail'
 
     def _applicable(self, arg: Term):
-        return isinstance(arg, List) and len(arg.terms) >= 1
+        return isinstance(arg, List) and len(arg.sequence()) >= 1
 
     def _apply_arg(self, arg: List) -> List:
-        return List(terms=arg.terms[1:], is_named=self.is_named)
+        return List(terms=arg.sequence().tail(), is_named=self.is_named)
 
 
 class Index(BuiltinFunction):
@@ -61,31 +61,7 @@ class Index(BuiltinFunction):
         return isinstance(args[0], List) and isinstance(args[1], Integer)
 
     def _apply_args(self, args: tuple[Term,...]) -> Term:
-        return args[0].terms[args[1].value]
-
-
-@frozen
-class Fold(BuiltinFunction):
-    name = 'Fold'
-    arity = 3
-
-    def _applicable_args(self, args: Sequence[Term]):
-        if not len(args) >= 3:
-            return False
-        if not isinstance(args[2], List):
-            return False
-        return True
-
-    def _apply_args(self, args: Sequence[Term]) -> Term:
-        fun = args[0]
-        init = args[1]
-        arg_list = args[2].terms
-        if len(arg_list) == 0:
-            return init
-        list_head = arg_list[0]
-        list_rest = arg_list[1:]
-        rest = List(terms=list_rest, is_named=self.is_named)
-        return fun(list_head)(self(fun)(init)(rest))
+        return args[0].sequence()[args[1].value]
 
 
 @frozen
@@ -107,6 +83,157 @@ class Map(BuiltinFunction):
         return map_result
 
 
+# Strict list functions.
+# They work on List.terms in a Python loop, and functions given as arguments are evaluated
+# to the normal form at each element, with the engine of the evaluation in progress.
+# The evaluations share its steps: the steps counted by each one are taken from those left to the next ones.
+def _apply_strict(fun: Term, args: tuple[Term, ...]) -> Term:
+    if isinstance(fun, BuiltinFunction) and fun.applicable_args(args):
+        t, rest = fun.apply_args(args)
+    else:
+        t, rest = fun, args
+    for arg in rest:
+        t = t(arg)
+    steps, engine = helpers.default(pgsn_term.evaluation.get(), (1000, None))
+    token = pgsn_term.step_count.set(0)
+    try:
+        nf = t.fully_eval(steps, engine=engine, cache=False)
+        used = pgsn_term.step_count.get()
+    finally:
+        pgsn_term.step_count.reset(token)
+    pgsn_term.count_steps(used)
+    pgsn_term.evaluation.set((steps - used, engine))
+    return nf
+
+
+@frozen
+class Length(Unary):
+    name = 'Length'
+
+    def _applicable(self, arg: Term):
+        return isinstance(arg, List)
+
+    def _apply_arg(self, arg: List) -> Integer:
+        return Integer.build(is_named=self.is_named, value=len(arg.sequence()))
+
+
+@frozen
+class IsEmpty(Unary):
+    name = 'IsEmpty'
+
+    def _applicable(self, arg: Term):
+        return isinstance(arg, List)
+
+    def _apply_arg(self, arg: List) -> Boolean:
+        return Boolean.build(is_named=self.is_named, value=len(arg.sequence()) == 0)
+
+
+@frozen
+class Append(BuiltinFunction):
+    name = 'Append'
+    arity = 2
+
+    def _applicable_args(self, args: Sequence[Term]):
+        return isinstance(args[0], List) and isinstance(args[1], List)
+
+    def _apply_args(self, args: tuple[List, List]) -> List:
+        return List(terms=args[0].terms + args[1].terms, is_named=self.is_named)
+
+
+@frozen
+class Reverse(Unary):
+    name = 'Reverse'
+
+    def _applicable(self, arg: Term):
+        return isinstance(arg, List)
+
+    def _apply_arg(self, arg: List) -> List:
+        return List(terms=arg.terms[::-1], is_named=self.is_named)
+
+
+# filter p l evaluates p on each element, which must return a boolean.
+# It is stuck until p and l are closed, since an open predicate or element may not be decided yet.
+@frozen
+class Filter(BuiltinFunction):
+    name = 'Filter'
+    arity = 2
+
+    def _applicable_args(self, args: Sequence[Term]):
+        return isinstance(args[1], List) and args[0].is_closed() and args[1].is_closed()
+
+    def _apply_args(self, args: tuple[Term, List]) -> List:
+        terms = []
+        for t in args[1].terms:
+            b = _apply_strict(args[0], (t,))
+            if not isinstance(b, Boolean):
+                raise pgsn_term.LambdaInterpreterError('Filter: the predicate does not return a boolean', b)
+            if b.value:
+                terms.append(t)
+        return List(terms=tuple(terms), is_named=self.is_named)
+
+
+# range m n is the list of integers m, m + 1, ..., n - 1
+@frozen
+class Range(BuiltinFunction):
+    name = 'Range'
+    arity = 2
+
+    def _applicable_args(self, args: Sequence[Term]):
+        return isinstance(args[0], Integer) and isinstance(args[1], Integer)
+
+    def _apply_args(self, args: tuple[Integer, Integer]) -> List:
+        return List(terms=tuple(Integer.build(is_named=self.is_named, value=i)
+                                for i in range(args[0].value, args[1].value)),
+                    is_named=self.is_named)
+
+
+# zip l1 l2 is the list of two element lists, as long as the shorter list
+@frozen
+class Zip(BuiltinFunction):
+    name = 'Zip'
+    arity = 2
+
+    def _applicable_args(self, args: Sequence[Term]):
+        return isinstance(args[0], List) and isinstance(args[1], List)
+
+    def _apply_args(self, args: tuple[List, List]) -> List:
+        return List(terms=tuple(List(terms=(t1, t2), is_named=self.is_named)
+                                for t1, t2 in zip(args[0].terms, args[1].terms)),
+                    is_named=self.is_named)
+
+
+# fold_left f a [x1, ..., xn] = f (... (f (f a x1) x2) ...) xn
+@frozen
+class FoldLeft(BuiltinFunction):
+    name = 'FoldLeft'
+    arity = 3
+
+    def _applicable_args(self, args: Sequence[Term]):
+        return isinstance(args[2], List)
+
+    def _apply_args(self, args: tuple[Term, Term, List]) -> Term:
+        acc = args[1]
+        for t in args[2].terms:
+            acc = _apply_strict(args[0], (acc, t))
+        return acc
+
+
+# fold_right f a [x1, ..., xn] = f x1 (f x2 (... (f xn a) ...))
+@frozen
+class FoldRight(BuiltinFunction):
+    name = 'FoldRight'
+    arity = 3
+
+    def _applicable_args(self, args: Sequence[Term]):
+        return isinstance(args[2], List)
+
+    def _apply_args(self, args: tuple[Term, Term, List]) -> Term:
+        acc = args[1]
+        for t in reversed(args[2].terms):
+            acc = _apply_strict(args[0], (t, acc))
+        return acc
+
+
 # Integer functions
 @frozen
 class Plus(BuiltinFunction):
@@ -131,7 +258,7 @@ class MultiArgFunction(BuiltinFunction):
     _keyword_args: dict[str, Term | None] = field(default={})
     # Hack: syntactically, body is an optional argument but must be specified otherwise
     # the runtime error occurs.
-    main: Term | None = field(default=None, validator=helpers.not_none)
+    main: Term | None = field(default=None, validator=not_none)
 
     def __attr_post_init__(self):
         assert all((var.is_named == self.is_named for var in self.positional_variable))
@@ -163,7 +290,7 @@ class MultiArgFunction(BuiltinFunction):
                    keyword_args=keyword_args.copy(),
                    main=main)
 
-    def _remove_name_with_context(self, context: list[str]) -> Term:
+    def _remove_name_with_context(self, context: NamingContext) -> Term:
         keyword_args = {k: t.remove_name_with_context(context) if t is not None else None for k, t in self._keyword_args.items()}
         main = self.main.remove_name_with_context(context)
         return self.evolve(is_named=False, keyword_args=keyword_args, main=main)
@@ -178,7 +305,7 @@ class MultiArgFunction(BuiltinFunction):
         return True
 
     def _apply_args(self, args: tuple[Term,...]):
-        r = args[self.arity - 1].attributes()
+        r = args[self.arity - 1].attributes().copy()
         for k, v in self._keyword_args.items():
             if k not in r and v is not None:
                 r[k] = v
@@ -215,16 +342,32 @@ class Guard(BuiltinFunction):
         return terms[1]
 
 
-# Comparison. does not compare App and Abs
+# fixed point operator
+# fix f x reduces to f (fix f) x.  The recursive reference fix f shares f, so the unfolding does not copy
+# the body of f, and fix f is a normal form until it is applied.
+class Fix(BuiltinFunction):
+    arity = 2
+    name = 'Fix'
+
+    def _applicable_args(self, terms: tuple[Term,...]):
+        return True
+
+    def _apply_args(self, terms: tuple[Term,...]):
+        f = terms[0]
+        return f(self(f))(terms[1])
+
+
+# Comparison. does not compare App, Abs and Variable
 class Equal(BuiltinFunction):
     arity = 2
     name = 'Equal'
 
     def _applicable_args(self, args: tuple[Term,...]):
-        return all((not isinstance(arg, App) and not isinstance(arg, Abs) for arg in args))
+        return all((not isinstance(arg, App) and not isinstance(arg, Abs) and not isinstance(arg, Variable)
+                    for arg in args))
 
     def _apply_args(self, args: tuple[Term,...]):
-        return Boolean.build(is_named=self.is_named, value=args[0] == args[1])
+        return Boolean.build(is_named=self.is_named, value=pgsn_term.term_equal(args[0], args[1]))
 
 
 class HasLabel(BuiltinFunction):
@@ -248,8 +391,7 @@ class AddAttribute(BuiltinFunction):
         return isinstance(terms[0], Record) and isinstance(terms[1], String)
 
     def _apply_args(self, terms: tuple[Term,...]):
-        attrs = terms[0].attributes()
-        attrs[terms[1].value] = terms[2]
+        attrs = terms[0].attributes().set(terms[1].value, terms[2])
         return Record.build(is_named=self.is_named, attributes=attrs)
 
 
@@ -261,8 +403,7 @@ class RemoveAttribute(BuiltinFunction):
         return isinstance(terms[0], Record) and isinstance(terms[1], String)
 
     def _apply_args(self, terms: tuple[Term,...]):
-        attrs = terms[0].attributes()
-        del attrs[terms[1].value]
+        attrs = terms[0].attributes().remove(terms[1].value)
         return Record.build(is_named=self.is_named, attributes=attrs)
 
 
@@ -285,27 +426,27 @@ class OverwriteRecord(BuiltinFunction):
         return isinstance(terms[0], Record) and isinstance(terms[1], Record)
 
     def _apply_args(self, terms: tuple[Term,...]):
-        r1 = terms[0].attributes()
-        r2 = terms[1].attributes()
-        r = r1
-        for k, t in r2.items():
-            r[k] = t
-        return Record.build(is_named=self.is_named, attributes=r)
+        # The overwritten record is shared as the delegate, not copied, unless shadowed terms may reduce
+        own = terms[1].attributes()
+        if type(own) is Delegated:
+            own = own.flat()
+        return Record.build(is_named=self.is_named, attributes=Delegated.of(own, terms[0]))
 
 
 Printable = String | Integer
 
 
+# The elements of a normal form are normal forms, so they are not evaluated again
 def _uncast(t: Term):
     match t:
         case pgsn_term.Data():
             return t.value
         case List():
             terms = t.terms
-            return [value_of(t1) for t1 in terms]
+            return [_uncast(t1) for t1 in terms]
         case Record():
             attr = t.attributes()
-            return {k: value_of(t1) for k, t1 in attr.items()}
+            return {k: _uncast(t1) for k, t1 in attr.items()}
         case _:
             raise ValueError(f'PGSN term {type(t)} does not normalizes a Python value')
 
@@ -369,15 +510,21 @@ def let_vars(assigns: tuple[tuple[Variable, Term],...], t: Term):
     return t
 
 
-# fixed point operator
-# fixed point operator
 def lambda_abs(v: Variable, t: Term) -> Term:
     return Abs.named(v=v, t=t)
 
 
-fix = lambda_abs(_f,
-                 lambda_abs(_x, _f(_x(_x)))(lambda_abs(_x, _f(_x(_x))))
-                 )
+fix = Fix.named()
+
+
+# The function t in which var refers to the function itself
+def recursive(var: Variable, t: Term) -> Term:
+    return fix(lambda_abs(var, t))
+
+
+# let rec var = t1 in t2
+def let_rec(var: Variable, t1: Term, t2: Term):
+    return let(var, recursive(var, t1), t2)
 
 # Boolean related
 def boolean(b: bool) -> Boolean:
@@ -419,29 +566,33 @@ cons = Cons.named()
 head = Head.named()
 tail = Tail.named()
 index = Index.named()
-#fold = Fold.named()
 map_term = Map.named()
+length = Length.named()
+is_empty = IsEmpty.named()
+append = Append.named()
+reverse = Reverse.named()
+filter_term = Filter.named()
+range_term = Range.named()
+zip_term = Zip.named()
+fold_left = FoldLeft.named()
+fold_right = FoldRight.named()
 
 _elem = variable('elem')
 _list = variable('list')
 _acc = variable('acc')
 _foldr = variable('_foldr')
 empty: List = List.named(terms=tuple())
-_F = lambda_abs_vars((_foldr, _f, _acc, _list),
-                     if_then_else(equal(_list)(empty))
-                     (_acc)
-                     (_f(head(_list))(_foldr(_f)(_acc)(tail(_list))) )
-                     )
-foldr = fix(_F)
+foldr = recursive(_foldr,
+                  lambda_abs_vars((_f, _acc, _list),
+                                  if_then_else(equal(_list)(empty))
+                                  (_acc)
+                                  (_f(head(_list))(_foldr(_f)(_acc)(tail(_list))))
+                                  ))
 fold = foldr
 
 list_all = lambda_abs_vars(
     (_x, _y),
-    let(
-        _f,
-        lambda_abs_vars((_z, _w), boolean_and(_x(_z))(_w)),
-        fold(_f)(_y)(true)
-    )
+    equal(length(filter_term(_x)(_y)))(length(_y))
 )
 
 
@@ -449,7 +600,7 @@ def integer(i: int) -> Integer:
     return Integer.named(value=i)
 
 
-integer_sum = fold(plus)(integer(0))
+integer_sum = fold_left(plus)(integer(0))
 
 
 # Record
@@ -488,6 +639,6 @@ def list_term(terms: tuple[Term,...]) -> List:
 
 
 # Extract python values from pgsn term
-def value_of(term: Term, steps=1000) -> Any:
-    t = term.fully_eval(steps)
+def value_of(term: Term, steps=1000, engine: str | None = None, cache: bool = True) -> Any:
+    t = term.fully_eval(steps, engine=engine, cache=cache)
     return _uncast(t)
\ No newline at end of file
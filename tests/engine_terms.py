@@ -0,0 +1,40 @@
+import stdlib
+import object_term
+import gsn_term
+from stdlib import let, lambda_abs, lambda_abs_vars, plus
+
+# Terms normalized by each evaluation engine in the tests, and compared with the substitution reducer
+x = stdlib.variable('x')
+y = stdlib.variable('y')
+c = stdlib.constant('c')
+d = stdlib.constant('d')
+one = stdlib.integer(1)
+two = stdlib.integer(2)
+label_a = stdlib.string('a')
+ll = stdlib.cons(one)(stdlib.cons(two)(stdlib.empty))
+cls = object_term.define_class(stdlib.string('Class'))(object_term.base_class)(stdlib.record({'a': stdlib.true}))
+obj = object_term.instantiate(cls)(stdlib.record({'b': c}))
+
+terms = [
+    lambda_abs(x, x)(lambda_abs(x, x)),
+    lambda_abs_vars((y, x), lambda_abs_vars((x, y), x)(x)(y))(c)(d),
+    lambda_abs(y, y(c)(d))(lambda_abs_vars((x, y), x)),
+    lambda_abs_vars((x, y), let(x, plus(x)(y), plus(x)(y)))(one)(two),
+    stdlib.integer_sum(ll),
+    stdlib.map_term(plus(one))(ll),
+    stdlib.tail(stdlib.cons(c)(ll)),
+    stdlib.list_term((plus(one)(one), lambda_abs(x, x)(lambda_abs(x, x)(two)), c)),
+    stdlib.record({'a': plus(one)(two), 'b': stdlib.if_then_else(stdlib.equal(one)(one))(c)(d)}),
+    stdlib.if_then_else(stdlib.equal(stdlib.head(ll))(one))(c)(d),
+    stdlib.guard(stdlib.false)(c),
+    stdlib.guard(stdlib.false)(plus(one)(one)),
+    stdlib.overwrite_record(stdlib.record({'a': x}))(stdlib.add_attribute(stdlib.empty_record)(label_a)(one)),
+    stdlib.list_labels(stdlib.record({'a': one, 'b': lambda_abs(x, x)(two)})),
+    stdlib.format_string(stdlib.string('{x}, {y}'), {'x': 1, 'y': plus(one)(two)}),
+    stdlib.record({'a': lambda_abs(x, plus(x)(one))})(label_a)(two),
+    obj,
+    object_term.method(obj)(label_a),
+    object_term.is_instance(obj)(cls),
+    object_term.is_subclass(object_term.base_class)(cls),
+    gsn_term.evidence(description='Test results'),
+]
@@ -0,0 +1,47 @@
+import pytest
+import compiler
+import pgsn_term
+import stdlib
+from stdlib import lambda_abs
+from tests.engine_terms import x, y, two, ll, terms
+
+a = stdlib.variable('a')
+
+
+@pytest.mark.parametrize('t', terms)
+def test_cached_code(t):
+    # Evaluated again with the code compiled before
+    nf = t.fully_eval(steps=10000, engine='compiled')
+    assert t.fully_eval(steps=10000, engine='compiled') == nf
+
+
+def test_shared_per_evaluation():
+    # Closed arguments are evaluated once in an evaluation, and again in the next one
+    arg = stdlib.integer_sum(stdlib.range_term(stdlib.integer(0))(stdlib.integer(100)))
+    t = lambda_abs(x, stdlib.plus(x)(x))(arg).remove_name()
+    counts = []
+    for _ in range(2):
+        m = compiler.CompiledMachine(1000)
+        assert m.nf(t, None, 0) == stdlib.integer(9900).remove_name()
+        counts.append(m.reductions)
+    assert counts[0] == counts[1]
+    with pytest.raises(pgsn_term.LambdaInterpreterError):
+        compiler.CompiledMachine(counts[0] - 1).nf(t, None, 0)
+
+
+def test_by_name():
+    t = stdlib.integer_sum(ll).remove_name()
+    m = compiler.CompiledMachine(1000, sharing=False)
+    assert m.nf(t, None, 0) == stdlib.integer(3).remove_name()
+
+
+def test_compiled():
+    cache = compiler.CompileCache()
+    f = compiler.Compiled(stdlib.integer_sum.remove_name(), compile_cache=cache)
+    assert f(ll.remove_name()) == stdlib.integer(3).remove_name()
+    assert f(stdlib.cons(two)(ll).remove_name()) == stdlib.integer(5).remove_name()
+    assert cache.hits > 0
+    g = compiler.Compiled(lambda_abs(x, lambda_abs(y, x(y))).remove_name(), compile_cache=cache)
+    assert g(a.remove_name_with_context(['a'])) == lambda_abs(y, a(y)).remove_name()
+    cache.clear()
+    assert cache.size() == 0 and cache.hit_rate() == 0.0
@@ -0,0 +1,184 @@
+import pytest
+import meta_info
+import pgsn_term
+import stdlib
+import gsn
+import gsn_term
+import eval_cache
+from stdlib import lambda_abs
+
+x = stdlib.variable('x')
+c = stdlib.constant('c')
+one = stdlib.integer(1)
+two = stdlib.integer(2)
+
+
+def test_digest():
+    t = stdlib.plus(one)(two).remove_name()
+    assert eval_cache.digest(t) == eval_cache.digest(stdlib.plus(one)(two).remove_name())
+    assert eval_cache.digest(t) != eval_cache.digest(stdlib.plus(two)(one).remove_name())
+    assert eval_cache.digest(t) != eval_cache.digest(t, salt=b'salt')
+    # meta_info is ignored
+    info = meta_info.MetaInfo(name_info='one')
+    assert eval_cache.digest(pgsn_term.Integer(meta_info=info, is_named=False, value=1)) == \
+        eval_cache.digest(one.remove_name())
+
+
+def test_eval_cache(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = eval_cache.EvalCache(path)
+    t = stdlib.integer_sum(stdlib.list_term((one, stdlib.plus(one)(two))))
+    assert cache.fully_eval(t.remove_name()) == stdlib.integer(4).remove_name()
+    assert cache.misses > 0 and cache.hits == 0
+    assert cache.fully_eval(t.remove_name()) == stdlib.integer(4).remove_name()
+    assert cache.hits == 1
+    # Closed subterms reached by the reducer are shared with the term evaluated before
+    cache.fully_eval(stdlib.list_term((two, stdlib.plus(one)(two))).remove_name(), engine='need')
+    hits = cache.hits
+    assert cache.fully_eval(stdlib.list_term((stdlib.plus(one)(two), c)).remove_name()) == \
+        stdlib.list_term((stdlib.integer(3), c)).remove_name()
+    assert cache.hits == hits + 1
+    cache.close()
+    # Persistent
+    cache = eval_cache.EvalCache(path)
+    assert cache.fully_eval(t.remove_name()) == stdlib.integer(4).remove_name()
+    assert cache.hits == 1 and cache.hit_rate() == 1.0
+    cache.clear()
+    assert cache.size() == 0
+
+
+def test_eviction(tmp_path):
+    cache = eval_cache.EvalCache(str(tmp_path / 'cache.db'), limit=2)
+    terms = [stdlib.integer(i).remove_name() for i in range(3)]
+    cache.fully_eval(terms[0])
+    cache.fully_eval(terms[1])
+    cache.fully_eval(terms[0])
+    cache.fully_eval(terms[2])
+    assert cache.size() == 2
+    # The least recently used is evicted
+    cache.fully_eval(terms[0])
+    assert cache.hits == 2
+    cache.fully_eval(terms[1])
+    assert cache.misses == 4
+
+
+def test_non_termination(tmp_path):
+    cache = eval_cache.EvalCache(str(tmp_path / 'cache.db'))
+    # Grows at each step
+    omega = lambda_abs(x, x(x)(x))
+    t = stdlib.if_then_else(stdlib.true)(c)(omega(omega))
+    assert cache.fully_eval(t.remove_name(), steps=100) == c.remove_name()
+
+
+def test_unreached(tmp_path):
+    omega = lambda_abs(x, x(x))(lambda_abs(x, x(x)))
+    discarded = stdlib.if_then_else(stdlib.true)(one)(omega)
+    under_abs = lambda_abs(x, one)(lambda_abs(x, omega))
+    for cache in (eval_cache.EvalCache(str(tmp_path / 'cache.db')), eval_cache.Incremental()):
+        for engine in ('substitution', 'machine', 'need', 'focus', 'explicit', 'compiled'):
+            assert cache.fully_eval(discarded.remove_name(), engine=engine) == one.remove_name()
+            assert cache.fully_eval(stdlib.list_term((discarded, under_abs)).remove_name(), engine=engine) == \
+                stdlib.list_term((one, one)).remove_name()
+        # Only the terms and the elements of the list are stored
+        assert cache.size() <= 4
+
+
+def test_store(tmp_path):
+    with pytest.raises(TypeError):
+        eval_cache.NormalForms()
+    path = str(tmp_path / 'cache.db')
+    cache = eval_cache.EvalCache(path)
+    cache.batch = 2
+    terms = [stdlib.integer(i).remove_name() for i in range(3)]
+    for t in terms + terms[::-1]:
+        cache.fully_eval(t)
+    assert cache.size() == 3 and cache.hits == 3
+    cache.close()
+    cache = eval_cache.EvalCache(path, limit=3)
+    assert cache.size() == 3
+    cache.fully_eval(stdlib.integer(3).remove_name())
+    # The recency of the hits is written when the cache is closed
+    assert cache.size() == 3
+    cache.fully_eval(terms[0])
+    assert cache.misses == 1
+    cache.fully_eval(terms[2])
+    assert cache.misses == 2
+    # The default engine is read at each evaluation
+    engine = pgsn_term.default_engine
+    pgsn_term.default_engine = 'unknown'
+    try:
+        with pytest.raises(pgsn_term.LambdaInterpreterError):
+            cache.fully_eval(terms[1])
+    finally:
+        pgsn_term.default_engine = engine
+
+
+def test_fork(tmp_path, monkeypatch):
+    cache = eval_cache.EvalCache(str(tmp_path / 'cache.db'))
+    t = stdlib.plus(one)(two).remove_name()
+    cache.fully_eval(t)
+    parent = cache._db
+    # A forked process opens its own connection
+    monkeypatch.setattr(eval_cache.os, 'getpid', lambda: -1)
+    assert cache._db is not parent and cache.size() == 1
+    hits = cache.hits
+    assert cache.fully_eval(t) == stdlib.integer(3).remove_name()
+    assert cache.hits == hits + 1
+    cache.close()
+
+
+def test_set_eval_cache(tmp_path):
+    cache = eval_cache.EvalCache(str(tmp_path / 'cache.db'))
+    t = gsn_term.goal(description='Goal', support=gsn_term.evidence(description='Test results'))
+    pgsn_term.set_eval_cache(cache)
+    try:
+        expected = gsn.pgsn_to_gsn(t, cache=False)
+        assert cache.hits + cache.misses == 0
+        assert gsn.pgsn_to_gsn(t) == expected
+        assert gsn.pgsn_to_gsn(t) == expected
+        assert cache.hits > 0
+        # The edited case reuses the normal forms of the unchanged goal on the default engine
+        shared = gsn_term.goal(description='Shared', support=gsn_term.evidence(description='Test results'))
+        gsn.pgsn_to_gsn(gsn_term.strategy(description='Strategy', sub_goals=[shared, t]))
+        hits = cache.hits
+        edited = gsn_term.strategy(description='Edited strategy', sub_goals=[shared, t])
+        assert gsn.pgsn_to_gsn(edited) == gsn.pgsn_to_gsn(edited, cache=False)
+        assert cache.hits > hits
+    finally:
+        pgsn_term.set_eval_cache(None)
+
+
+def test_incremental():
+    def case(description):
+        return gsn_term.strategy(description='Strategy',
+                                 sub_goals=[gsn_term.goal(description='Goal 1', support=support),
+                                            gsn_term.goal(description='Goal 2',
+                                                          support=gsn_term.evidence(description=description))])
+
+    support = gsn_term.evidence(description='Test results')
+    incremental = eval_cache.Incremental()
+    t = case('Review')
+    assert incremental.fully_eval(t) == t.fully_eval(cache=False)
+    edited = case('Revised review')
+    hits, misses = incremental.hits, incremental.misses
+    assert incremental.fully_eval(edited) == edited.fully_eval(cache=False)
+    # Only the edited goal and its ancestors are reduced again, on the default engine
+    assert incremental.hits > hits
+    assert incremental.misses - misses < misses
+    # Normal forms only used by the first term are dropped
+    size = incremental.size()
+    misses = incremental.misses
+    assert incremental.fully_eval(t) == t.fully_eval(cache=False)
+    assert incremental.misses > misses
+    assert incremental.size() == size
+
+
+def test_strict_builtins():
+    # The builtins evaluating their arguments are given the steps and the engine of the evaluation
+    n = stdlib.variable('n')
+    y = stdlib.variable('y')
+    total = stdlib.foldr(stdlib.lambda_abs_vars((x, y), stdlib.plus(x)(y)))(stdlib.integer(0))
+    slow = lambda_abs(n, stdlib.equal(total(stdlib.range_term(stdlib.integer(0))(n)))(stdlib.integer(1225)))
+    t = stdlib.list_all(slow)(stdlib.list_term((stdlib.integer(50),) * 3))
+    for engine in (None, 'need', 'compiled'):
+        assert eval_cache.Incremental().fully_eval(t, steps=100000, engine=engine).value
@@ -0,0 +1,23 @@
+import explicit_subst
+from explicit_subst import Substitution, Substituted, substituted, force
+import stdlib
+from stdlib import lambda_abs, lambda_abs_vars
+from tests.engine_terms import x, y, c, one
+
+
+def test_lazy_beta():
+    t = lambda_abs_vars((x, y), y(x))(c).remove_name()
+    stepped = explicit_subst.Reducer(10).step(t)
+    assert isinstance(stepped, Substituted)
+    assert stepped == lambda_abs(y, y(c)).remove_name()
+
+
+def test_substitution():
+    var = stdlib.variable('v').remove_name()
+    body = lambda_abs(x, x(stdlib.variable('v'))).remove_name()
+    o = one.remove_name()
+    sigma = Substitution(terms=(o,))
+    assert force(substituted(body, sigma)) == body.subst(0, o)
+    assert substituted(o, sigma) is o
+    assert force(substituted(substituted(var, Substitution(shift=2)), sigma)) == \
+           stdlib.variable('v').remove_name().shift(1, 0)
@@ -0,0 +1,25 @@
+import pytest
+import focus
+import stdlib
+from tests.engine_terms import ll, terms
+
+
+def baseline_steps(t):
+    t = t.remove_name()
+    n = 0
+    while (t_reduced := t.eval_or_none()) is not None:
+        t = t_reduced
+        n += 1
+    return t, n
+
+
+@pytest.mark.parametrize('t', terms)
+def test_same_steps(t):
+    reducer = focus.Reducer()
+    normal_form, n = baseline_steps(t)
+    assert reducer.fully_eval(t.remove_name(), 10000) == normal_form
+    assert reducer.steps == n
+
+
+def test_engine():
+    assert stdlib.value_of(stdlib.integer_sum(ll), engine='focus') == 3
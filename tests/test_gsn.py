@@ -0,0 +1,88 @@
+import io
+import json
+import gsn
+import pgsn_term
+import stdlib
+import pytest
+from gsn_term import goal, strategy, evidence
+
+cases = [goal(description=f'Goal {i}', support=evidence(description=f'Test {i}')) for i in range(3)]
+
+
+def broken():
+    return stdlib.integer(1)
+
+
+def test_pgsn_to_gsn_many():
+    expected = [gsn.pgsn_to_gsn(t, steps=10000) for t in cases]
+    for workers in (1, 2):
+        results = list(gsn.pgsn_to_gsn_many(cases + [broken], steps=10000, workers=workers))
+        assert [r.index for r in results] == [0, 1, 2, 3]
+        assert [r.gsn for r in results[:3]] == expected
+        assert all(r.steps > 0 and r.error is None for r in results[:3])
+        assert results[3].gsn is None and 'does not have a GSN' in results[3].error
+    results = list(gsn.pgsn_to_gsn_many(cases[:1], steps=10000, engine='need'))
+    assert results[0].gsn == expected[0] and results[0].steps > 0
+    # The default engine is resolved before the machine is chosen
+    engine = pgsn_term.default_engine
+    pgsn_term.default_engine = 'need'
+    try:
+        assert list(gsn.pgsn_to_gsn_many(cases[:1], steps=10000))[0].steps == results[0].steps
+    finally:
+        pgsn_term.default_engine = engine
+
+
+def test_pgsn_to_gsn_many_strict():
+    # Builtins evaluating their arguments are given the steps of the batch
+    x = stdlib.variable('x')
+    y = stdlib.variable('y')
+    n = stdlib.variable('n')
+    total = stdlib.foldr(stdlib.lambda_abs_vars((x, y), stdlib.plus(x)(y)))(stdlib.integer(0))
+    slow = stdlib.lambda_abs(n, stdlib.equal(total(stdlib.range_term(stdlib.integer(0))(n)))(stdlib.integer(1225)))
+    checked = stdlib.list_all(slow)(stdlib.list_term((stdlib.integer(50),)))
+    case = goal(description=stdlib.if_then_else(checked)(stdlib.string('Checked'))(stdlib.string('Unchecked')),
+                support=evidence(description='Test'))
+    for engine in (None, 'need'):
+        result = list(gsn.pgsn_to_gsn_many([case], steps=100000, engine=engine))[0]
+        assert result.error is None and result.gsn == gsn.pgsn_to_gsn(case, steps=100000, engine=engine)
+        assert result.steps > 0
+
+
+def test_main(tmp_path, capsys):
+    path = tmp_path / 'case.py'
+    path.write_text("from gsn_term import *\n"
+                    "system = goal(description='Goal', support=evidence(description='Test'))\n")
+    assert gsn.main([str(path), str(path), '--workers', '2']) == 0
+    out = capsys.readouterr().out
+    assert '2 cases, 0 failed' in out and 'cases/s' in out
+    assert gsn.main([str(path), '--name', 'missing']) == 1
+
+
+def test_python_val():
+    top = gsn.Goal(description='Top', assumptions=(), contexts=(), support=gsn.Strategy(
+        description='Argument', sub_goals=tuple(
+            gsn.Goal(description='Goal', assumptions=(), contexts=(), support=gsn.Evidence(description='Test'))
+            for _ in range(2))))
+    parts = gsn.python_val(top)
+    assert parts == gsn.python_val(top)
+    assert [p['kind'] for p in parts] == ['Goal', 'Strategy', 'Goal', 'Evidence', 'Goal', 'Evidence']
+    ids = [p['partsID'] for p in parts]
+    assert len(set(ids)) == len(ids)
+    assert parts[0]['parent'] == gsn.root_parent_id
+    assert parts[1]['children'] == [ids[2], ids[4]] and parts[4]['parent'] == ids[1]
+    assert [p['parent'] for p in top.gsn_parts('parent', 'top')[:2]] == ['parent', 'top']
+    for indent in (None, 0, 4):
+        out = io.StringIO()
+        gsn.write_json(top, out, indent=indent, sort_keys=True)
+        assert out.getvalue() == json.dumps(parts, indent=indent, sort_keys=True)
+
+
+def test_from_normal_form():
+    t = goal(description='Top', support=strategy(description='Argument', sub_goals=cases))
+    g = gsn.from_normal_form(t.fully_eval(steps=10000))
+    assert g.description == 'Top' and g.support.description == 'Argument'
+    assert g.support.sub_goals == tuple(gsn.pgsn_to_gsn(c, steps=10000) for c in cases)
+    with pytest.raises(ValueError, match='does not have a GSN'):
+        gsn.from_normal_form(stdlib.integer(1).remove_name())
+    with pytest.raises(ValueError, match='does not normalizes a GSN'):
+        gsn.pgsn_to_gsn(stdlib.record({'description': stdlib.string('x')}))
@@ -0,0 +1,53 @@
+import gc
+import pgsn_term
+import stdlib
+import object_term
+from pgsn_term import InternTable
+
+
+def test_intern_shares():
+    table = InternTable()
+    t1 = table.intern(stdlib.record({'a': stdlib.list_term((stdlib.integer(1),))}).remove_name())
+    t2 = table.intern(stdlib.record({'a': stdlib.list_term((stdlib.integer(1),))}).remove_name())
+    assert t1 is t2
+    assert t1.attributes()['a'] is t2.attributes()['a']
+    assert table.hits == 3
+    assert table.size() == 3
+    assert table.hit_rate() == 0.5
+
+
+def test_intern_equality():
+    table = InternTable()
+    one = table.intern(stdlib.integer(1).remove_name())
+    true = table.intern(stdlib.true.remove_name())
+    assert one != true
+    assert not pgsn_term.term_equal(one, true)
+    r1 = table.intern(pgsn_term.Record.nameless(attributes={'a': one, 'b': true}))
+    r2 = table.intern(pgsn_term.Record.nameless(attributes={'b': true, 'a': one}))
+    # The order of labels is kept
+    assert r1 is not r2
+    assert list(r2.attributes().keys()) == ['b', 'a']
+    assert pgsn_term.term_equal(r1, r2)
+
+
+def test_intern_weak():
+    table = InternTable()
+    t = table.intern(stdlib.string('unused').remove_name())
+    assert table.size() == 1
+    del t
+    gc.collect()
+    assert table.size() == 0
+
+
+def test_interning_fully_eval():
+    cls = object_term.define_class(stdlib.string('Class'))(object_term.base_class)(stdlib.record({'a': stdlib.true}))
+    t = object_term.is_instance(object_term.instantiate(cls)(stdlib.empty_record))(cls)
+    pgsn_term.interning = True
+    try:
+        r = t.fully_eval()
+        assert r.is_interned
+        assert r.value
+        assert pgsn_term.intern_table.hits > 0
+    finally:
+        pgsn_term.interning = False
+        pgsn_term.intern_table.clear()
@@ -12,4 +12,33 @@ def test_list():
     ll = List.named(terms=(x, y, z))
     assert ll.terms == (x, y, z)
     i = stdlib.integer(1)
-    assert ll(i).eval().name == 'y'
\ No newline at end of file
+    assert ll(i).eval().name == 'y'
+
+def test_sequence():
+    ints = [stdlib.integer(i).remove_name() for i in range(40)]
+    s = pgsn_term.Terms.of(tuple(ints[20:]))
+    model = tuple(ints[20:])
+    # cons and tail in the prefix and the suffix, checked against tuples
+    for i in range(19, -1, -1):
+        s, model = s.cons(ints[i]), (ints[i],) + model
+        assert s == model and len(s) == len(model) and s[-1] == model[-1]
+        assert [s[j] for j in range(len(s))] == list(model) and s.head() == model[0]
+    while len(model) > 0:
+        assert s.tuple() == model and tuple(s) == model and s[3:5] == model[3:5]
+        s, model = s.tail(), model[1:]
+    assert s == () and s.max_free() == -1
+    x = pgsn_term.Variable.nameless(num=2)
+    with_free = pgsn_term.Terms.of((x,) + tuple(ints[:3])).cons(ints[0])
+    assert with_free.max_free() == 2 and with_free.tail().tail().max_free() == -1
+    named = List.named(terms=(stdlib.variable('x'), stdlib.constant('y')))
+    assert named.free_variables() == {'x'}
+    assert stdlib.tail(stdlib.cons(stdlib.variable('y'))(named)).remove_name().is_closed() is False
+
+
+def test_cons_tail():
+    ll = stdlib.range_term(stdlib.integer(0))(stdlib.integer(5))
+    t = stdlib.cons(stdlib.integer(9))(stdlib.tail(stdlib.tail(ll)))
+    assert stdlib.value_of(t) == [9, 2, 3, 4]
+    assert stdlib.value_of(stdlib.index(t)(stdlib.integer(0))) == 9
+    assert stdlib.value_of(stdlib.length(t)) == 4
+    assert t.fully_eval() == List.nameless(terms=tuple(stdlib.integer(i).remove_name() for i in (9, 2, 3, 4)))
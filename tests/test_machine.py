@@ -0,0 +1,43 @@
+import pytest
+import pgsn_term
+import machine
+import stdlib
+from stdlib import lambda_abs, plus
+from tests.engine_terms import x, y, c, ll
+
+a = stdlib.variable('a')
+
+
+def test_sharing():
+    # The argument is used twice, but evaluated once
+    t = lambda_abs(x, plus(x)(x))(stdlib.integer_sum(ll)).remove_name()
+    by_name = machine.Machine(1000)
+    by_need = machine.Machine(1000, sharing=True)
+    assert by_need.nf(t, None, 0) == by_name.nf(t, None, 0) == stdlib.integer(6).remove_name()
+    assert by_need.reductions < by_name.reductions
+    assert by_need.saved > 0
+
+
+def test_free_variables():
+    t = lambda_abs(x, lambda_abs(y, x(y)))(a)
+    assert t.fully_eval(engine='machine') == lambda_abs(y, a(y)).remove_name()
+    assert t.fully_eval(engine='need') == lambda_abs(y, a(y)).remove_name()
+    # A stuck term shared under different binders
+    t = lambda_abs(x, lambda_abs(y, x(y)(x)))(a(c))
+    assert t.fully_eval(engine='need') == lambda_abs(y, a(c)(y)(a(c))).remove_name()
+
+
+def test_default_engine():
+    pgsn_term.default_engine = 'machine'
+    try:
+        assert stdlib.value_of(stdlib.integer_sum(ll)) == 3
+    finally:
+        pgsn_term.default_engine = 'substitution'
+
+
+def test_non_termination():
+    omega = lambda_abs(x, x(x))
+    with pytest.raises(pgsn_term.LambdaInterpreterError):
+        omega(omega).fully_eval(engine='machine')
+    with pytest.raises(pgsn_term.LambdaInterpreterError):
+        c.fully_eval(engine='unknown')
@@ -72,6 +72,29 @@ def test_subclass():
     assert is_subclass(cls)(cls).fully_eval().value
     assert is_subclass(cls1)(cls).fully_eval().value
     assert not is_subclass(object_term.base_class)(cls).fully_eval().value
+    # A record which is not a class is a subclass of nothing, as with the recursive definition
+    omega = stdlib.variable('x')
+    omega = lambda_abs(omega, omega(omega))(lambda_abs(omega, omega(omega)))
+    for engine in (None, 'need', 'machine', 'compiled'):
+        for class2 in (cls, stdlib.empty_record, stdlib.integer(1), omega):
+            assert not is_subclass(stdlib.empty_record)(class2).fully_eval(engine=engine).value
+
+
+def test_class_index():
+    index = object_term.class_index
+    cls1_nf = cls1.fully_eval()
+    names, complete = index.ancestors(cls1_nf)
+    assert names == {'Child', 'Class', 'BaseClass'} and complete
+    hits = index.hits
+    assert is_subclass(cls1)(cls).fully_eval().value
+    assert index.hits > hits
+    # A class redefined with the same name and another parent
+    redefined = object_term.define_class(name1)(object_term.base_class)(stdlib.empty_record)
+    assert not is_subclass(redefined)(cls).fully_eval().value
+    assert is_subclass(redefined)(cls1).fully_eval().value
+    for engine in ('need', 'machine', 'compiled'):
+        assert is_subclass(cls1)(cls).fully_eval(engine=engine).value
+        assert not is_instance(instantiate(cls)(stdlib.empty_record))(cls1).fully_eval(engine=engine).value
 
 
 attrs2 = stdlib.record({'b': b, 'c': c})
@@ -129,6 +152,31 @@ def test_obj_methods():
     assert method(obj3)(label_value).fully_eval().value == 'c'
 
 
+def test_delegation():
+    cls_nf = cls.fully_eval()
+    x = stdlib.variable('x')
+    objs = let(x, cls, stdlib.list_term((instantiate(x)(attrs2), instantiate(x)(attrs3)))).fully_eval(engine='need').terms
+    for obj in objs:
+        own, delegate = obj.delegation()
+        assert set(own.keys()) == {'b', 'c', '_instance'} | ({'a'} if obj is objs[1] else set())
+        assert delegate == cls_nf
+    # The objects share the class record, which is evaluated once by need
+    assert objs[0].delegation()[1] is objs[1].delegation()[1]
+    # The same mapping as the copied attributes, in the same order
+    flat = cls_nf.attributes().copy() | attrs3.fully_eval().attributes().copy() | {'_instance': cls_nf}
+    assert objs[1].attributes() == flat
+    assert list(objs[1].attributes()) == list(flat)
+    assert objs[1] == pgsn_term.Record.nameless(attributes=flat)
+    assert [label.value for label in stdlib.list_labels(obj3).fully_eval().terms] == list(flat)
+    for engine in ('need', 'machine', 'compiled', 'focus'):
+        assert not obj3(a).fully_eval(engine=engine).value
+        assert method(obj3)(label_value).fully_eval(engine=engine).value == 'c'
+        assert is_instance(obj3)(cls).fully_eval(engine=engine).value
+    # Removing a shadowing label exposes neither of the values
+    removed = stdlib.remove_attribute(obj3)(a).fully_eval()
+    assert 'a' not in removed.attributes() and removed.delegation()[1] is None
+
+
 parent = stdlib.variable('parent')
 attrs = stdlib.variable("attrs")
 inherit_x = lambda_abs_vars((parent, attrs),
@@ -0,0 +1,87 @@
+import multiprocessing
+import pytest
+import parallel
+import pgsn_term
+import stdlib
+from stdlib import lambda_abs
+from gsn_term import goal, strategy, evidence
+
+sub_goals = [goal(description=f'Goal {i}', support=evidence(description=f'Test {i}')) for i in range(3)]
+case = goal(description='Top', support=strategy(description='Argument over goals', sub_goals=sub_goals))
+# Cases evaluated together
+batch = stdlib.list_term(tuple(goal(description=f'Case {i}', support=case) for i in range(3)))
+
+
+def _fail(data: bytes, steps: int, engine: str | None) -> bytes:
+    raise RecursionError('Worker failure')
+
+
+def _error(data: bytes, steps: int, engine: str | None) -> bytes:
+    raise RuntimeError('Bug')
+
+
+def test_tasks():
+    t = batch.remove_name()
+    evaluator = parallel.ParallelEvaluator(workers=2, threshold=10)
+    tasks = evaluator.tasks_of(t)
+    assert len(tasks) == 3
+    assert all(task.is_closed() for task in tasks)
+    assert evaluator.tasks_of(stdlib.integer(1).remove_name()) == []
+    # Applications are not looked into, since their arguments may be discarded
+    assert len(evaluator.tasks_of(case.remove_name())) == 1
+    assert parallel.ParallelEvaluator(workers=2, threshold=10 ** 6).tasks_of(t) == []
+
+
+def test_parallel():
+    t = batch.remove_name()
+    expected = t.fully_eval(steps=10000)
+    with parallel.ParallelEvaluator(workers=2, threshold=10, engine='need') as evaluator:
+        assert evaluator.fully_eval(t, steps=10000) == expected
+        assert evaluator.tasks == 3
+    # Sequential with one worker
+    evaluator = parallel.ParallelEvaluator(workers=1, threshold=10)
+    assert evaluator.fully_eval(t, steps=10000) == expected
+    assert evaluator.tasks == 0
+    assert stdlib.integer_sum(stdlib.list_term((stdlib.integer(1), stdlib.integer(2)))).fully_eval(
+        engine='parallel').value == 3
+
+
+def test_discarded():
+    x = stdlib.variable('x')
+    loop = lambda_abs(x, x(x))(lambda_abs(x, x(x)))
+    t = stdlib.if_then_else(stdlib.true)(stdlib.integer(1))(loop)
+    one = stdlib.integer(1).remove_name()
+    with parallel.ParallelEvaluator(workers=2, threshold=12) as evaluator:
+        assert evaluator.fully_eval(stdlib.list_term((t, t)).remove_name()).terms == (one, one)
+
+
+def test_default_engine():
+    engine = pgsn_term.default_engine
+    pgsn_term.default_engine = 'parallel'
+    try:
+        assert stdlib.integer(1).fully_eval().value == 1
+        assert parallel.ParallelEvaluator(workers=1).sequential_engine() == 'substitution'
+    finally:
+        pgsn_term.default_engine = engine
+
+
+def test_worker_failure(monkeypatch):
+    monkeypatch.setattr(parallel, '_normalize', _fail)
+    t = batch.remove_name()
+    with parallel.ParallelEvaluator(workers=2, threshold=10) as evaluator:
+        assert evaluator.fully_eval(t, steps=10000) == t.fully_eval(steps=10000)
+        assert evaluator.tasks == 0
+    # Other errors are not hidden
+    monkeypatch.setattr(parallel, '_normalize', _error)
+    with parallel.ParallelEvaluator(workers=2, threshold=10) as evaluator:
+        with pytest.raises(RuntimeError):
+            evaluator.fully_eval(t, steps=10000)
+
+
+def test_spawn():
+    # The workers started afresh know the classes of the terms
+    t = batch.remove_name()
+    with parallel.ParallelEvaluator(workers=2, threshold=10, mp_context=multiprocessing.get_context('spawn')) \
+            as evaluator:
+        assert evaluator.fully_eval(t, steps=10000) == t.fully_eval(steps=10000)
+        assert evaluator.tasks == 3
@@ -0,0 +1,35 @@
+import gsn
+import gsn_term
+import object_term
+import prelude
+import stdlib
+
+
+def test_prelude(tmp_path):
+    path = str(tmp_path / 'prelude.pickle')
+    definitions = prelude.definitions()
+    assert ('gsn_term', 'goal_class') in definitions
+    saved = {key: t._nameless for key, t in definitions.items()}
+    t = gsn_term.goal(description='Goal', support=gsn_term.evidence(description='Test results'))
+    expected = gsn.pgsn_to_gsn(t)
+    try:
+        assert prelude.build(path) == len(definitions)
+        assert prelude.load(path) == len(definitions)
+        # Definitions are replaced by their normal forms
+        assert object_term.base_class.remove_name() == object_term.base_class.fully_eval()
+        assert gsn.pgsn_to_gsn(t) == expected
+        assert stdlib.integer_sum(stdlib.list_term((stdlib.integer(1), stdlib.integer(2)))).fully_eval().value == 3
+        # The snapshot is ignored if the sources have changed
+        digest = prelude.source_digest
+        prelude.source_digest = lambda: 'changed'
+        try:
+            assert prelude.load(path) == 0
+        finally:
+            prelude.source_digest = digest
+        assert prelude.load(str(tmp_path / 'missing.pickle')) == 0
+        broken = tmp_path / 'broken.pickle'
+        broken.write_bytes(b'broken')
+        assert prelude.load(str(broken)) == 0
+    finally:
+        for key, t in definitions.items():
+            object.__setattr__(t, '_nameless', saved[key])
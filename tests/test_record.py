@@ -1,3 +1,4 @@
+import gc
 import meta_info
 import pgsn_term
 from pgsn_term import String, Integer, Record
@@ -16,6 +17,21 @@ def test_record():
     assert r(k2).eval_or_none() is None
 
 
+def test_shape():
+    x = stdlib.constant('x')
+    y = stdlib.constant('y')
+    r1 = stdlib.record({'x': x, 'y': y})
+    r2 = stdlib.record({'x': y, 'y': x})
+    assert r1.attributes().shape is r2.attributes().shape
+    assert r1.attributes().shape is not stdlib.record({'y': y, 'x': x}).attributes().shape
+    assert r1 == stdlib.record({'y': y, 'x': x}) and r1 != r2
+    assert r1.attributes() == {'x': x, 'y': y} and list(r1.attributes()) == ['x', 'y']
+    assert r1.attributes().get('z') is None and 'z' not in r1.attributes()
+    added = stdlib.add_attribute(r1)(stdlib.string('z'))(x).fully_eval()
+    assert list(added.attributes()) == ['x', 'y', 'z'] and len(r1.attributes()) == 2
+    assert stdlib.overwrite_record(r1)(stdlib.record({'x': y})).fully_eval().attributes()['x'] == y.remove_name()
+
+
 x = stdlib.variable('x')
 y = stdlib.variable('y')
 z = stdlib.variable('z')
@@ -51,3 +67,50 @@ def test_self_reference3():
 def test_self_reference4():
     r = stdlib.overwrite_record(r1)(stdlib.add_attribute(r2)(label_2)(r1),)
     assert set(r.fully_eval().attributes().keys()) == {'l1', 'l2'}
+
+
+def test_update():
+    x = stdlib.constant('x').remove_name()
+    y = stdlib.constant('y').remove_name()
+    attributes = Record.nameless(attributes={'a': x, 'b': y}).attributes()
+    assert attributes.set('c', x) == {'a': x, 'b': y, 'c': x} and list(attributes.set('c', x)) == ['a', 'b', 'c']
+    assert attributes.set('a', y) == {'a': y, 'b': y} and list(attributes.set('a', y)) == ['a', 'b']
+    assert attributes.remove('a') == {'b': y}
+    updated = attributes.update(Record.nameless(attributes={'c': y, 'a': y}).attributes())
+    assert updated == {'a': y, 'b': y, 'c': y} and list(updated) == ['a', 'b', 'c']
+    assert attributes.set('c', x).shape is attributes.set('c', y).shape
+    assert attributes.remove('b').shape is Record.nameless(attributes={'a': y}).attributes().shape
+
+
+def test_shape_transitions(monkeypatch):
+    monkeypatch.setattr(pgsn_term, 'max_transitions', 4)
+    monkeypatch.setattr(pgsn_term, '_transitions', 0)
+    base = pgsn_term.shape(('shape_test',))
+    added = base.add('a')
+    assert base.add('a') is added and base.merge(added)[0] is added
+    # Shapes reached only through the transitions of other shapes are collected once the cache is full
+    added.add('b').remove('a')
+    del added
+    for label in ('c', 'd', 'e'):
+        base.add(label)
+    gc.collect()
+    assert all(labels not in pgsn_term._shapes for labels in (('shape_test', 'a'), ('shape_test', 'a', 'b')))
+    assert base.add('e').labels == ('shape_test', 'e')
+
+
+def test_shadowed_divergence():
+    x = stdlib.variable('x')
+    y = stdlib.variable('y')
+    omega = stdlib.lambda_abs(x, x(x))(stdlib.lambda_abs(x, x(x)))
+    overwritten = stdlib.overwrite_record(stdlib.record({'a': omega}))(stdlib.record({'a': stdlib.integer(1)}))
+    added = stdlib.add_attribute(stdlib.overwrite_record(stdlib.record({'a': omega}))(stdlib.empty_record))(
+        stdlib.string('a'))(stdlib.integer(1))
+    # A shadowed free variable
+    shadowed = stdlib.lambda_abs(y, stdlib.overwrite_record(stdlib.record({'a': y}))(stdlib.record({'a': stdlib.integer(1)})))
+    for engine in ('substitution', 'machine', 'need', 'focus', 'explicit', 'compiled'):
+        for t in (overwritten, added):
+            nf = t.fully_eval(engine=engine)
+            assert nf == Record.nameless(attributes={'a': stdlib.integer(1).remove_name()})
+            assert nf.delegation()[1] is None
+        nf = shadowed.fully_eval(engine=engine)
+        assert nf.is_closed() and nf.t.delegation()[1] is None
@@ -0,0 +1,87 @@
+import io
+import sys
+import pytest
+import meta_info
+import pgsn_term
+import debug_info
+import serialize
+import stdlib
+import gsn_term
+from stdlib import lambda_abs, lambda_abs_vars
+
+x = stdlib.variable('x')
+y = stdlib.variable('y')
+ll = stdlib.list_term((stdlib.integer(-1), stdlib.integer(2 ** 70), stdlib.string('あ'), stdlib.true))
+info = meta_info.MetaInfo(debug_info=debug_info.DebugInfo(source='test.py', location=3), name_info='f')
+terms = [
+    lambda_abs_vars((x, y), x(y)(stdlib.constant('c'))),
+    stdlib.record({'a': ll, 'b': stdlib.empty_record, 'c': stdlib.integer_sum}),
+    gsn_term.goal,
+    gsn_term.goal_class,
+    gsn_term.goal(description='Goal', support=gsn_term.evidence(description='Test results')),
+    stdlib.if_then_else(stdlib.false)(x)(y),
+]
+
+
+@pytest.mark.parametrize('t', terms)
+def test_round_trip(t):
+    assert serialize.loads(serialize.dumps(t)) == t
+    nameless = t.remove_name()
+    assert serialize.loads(serialize.dumps(nameless)) == nameless
+
+
+def test_sharing():
+    t = stdlib.integer_sum.remove_name()
+    i = lambda_abs(x, x).remove_name()
+    shared = pgsn_term.List.nameless(terms=(t, t, i, lambda_abs(x, x).remove_name()))
+    data = serialize.dumps(shared)
+    # Only the references are repeated
+    assert len(data) == len(serialize.dumps(pgsn_term.List.nameless(terms=(t, i)))) + 4
+    decoded = serialize.loads(data)
+    assert decoded == shared
+    assert decoded.terms[0] is decoded.terms[1]
+    assert decoded.terms[2] is decoded.terms[3]
+
+
+def test_meta_info():
+    t = pgsn_term.Integer(meta_info=info, is_named=False, value=2)
+    decoded = serialize.loads(serialize.dumps(pgsn_term.List.nameless(terms=(t, stdlib.integer(2).remove_name()))))
+    assert decoded.terms[0].meta_info == info
+    assert decoded.terms[1].meta_info == meta_info.empty
+
+
+def test_stream():
+    out = io.BytesIO()
+    encoder = serialize.Encoder(out)
+    for t in terms:
+        encoder.write(t)
+    n = len(out.getvalue())
+    # Tables are shared between the terms in a stream
+    encoder.write(terms[0])
+    assert len(out.getvalue()) - n <= 3
+    decoder = serialize.Decoder(io.BytesIO(out.getvalue()), chunk=7)
+    assert list(decoder) == terms + [terms[0]]
+
+
+def test_errors():
+    with pytest.raises(serialize.SerializationError):
+        serialize.loads(b'not a term')
+    with pytest.raises(serialize.SerializationError):
+        serialize.loads(serialize.dumps(terms[0])[:-3])
+    with pytest.raises(serialize.SerializationError):
+        serialize.dumps(pgsn_term.Constant.nameless(name=1.5))
+    # Only terms are created
+    data = bytearray(serialize.magic)
+    for s in (b'os', b'system'):
+        data += bytes((1, len(s))) + s
+    data += bytes((2, 0, 1))
+    with pytest.raises(serialize.SerializationError):
+        serialize.loads(bytes(data))
+    # Nor are modules outside the term modules imported
+    data = bytearray(serialize.magic)
+    for s in (b'this', b'Term'):
+        data += bytes((1, len(s))) + s
+    data += bytes((2, 0, 1))
+    with pytest.raises(serialize.SerializationError):
+        serialize.loads(bytes(data))
+    assert 'this' not in sys.modules
@@ -0,0 +1,64 @@
+import asyncio
+import threading
+import time
+import pytest
+import server
+import stdlib
+from gsn_term import goal, evidence
+
+case = goal(description='Goal', support=evidence(description='Test'))
+source = "from gsn_term import *\nsystem = goal(description='Goal', support=evidence(description='Test'))\n"
+
+
+@pytest.fixture(params=[0, 1])
+def socket_path(request, tmp_path):
+    path = str(tmp_path / 'pgsn.sock')
+    s = server.Server(path, workers=request.param)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(s.start())
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    yield path
+    asyncio.run_coroutine_threadsafe(s.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def test_server(socket_path):
+    with server.Client(socket_path, timeout=60) as client:
+        t = stdlib.integer_sum(stdlib.list_term((stdlib.integer(1), stdlib.integer(2))))
+        assert client.eval(t).value == 3
+        assert client.eval(t, key='doc', engine='need').value == 3
+        with pytest.raises(server.RequestError):
+            client.eval(t, engine='unknown')
+        response = client.call('gsn', source=source, key='case.py', steps=10000)
+        assert response['gsn'][0]['detail'] == 'Goal'
+        assert 'error' in client.call('gsn', source='x = 1\n')
+        assert 'error' in client.call('unknown')
+        metrics = client.call('metrics')['metrics']
+        assert metrics['completed'] == 3 and metrics['failed'] == 2 and metrics['queue_depth'] == 0
+        assert metrics['latency_p95'] >= metrics['latency_p50'] > 0
+
+
+def test_superseded(socket_path):
+    with server.Client(socket_path, timeout=60) as client:
+        first = client.send('gsn', source='import time\ntime.sleep(1)\n' + source, key='doc')
+        second = client.send('gsn', source=source, key='doc')
+        responses = {r['id']: r for r in (client.receive(), client.receive())}
+        assert responses[first] == {'id': first, 'cancelled': True}
+        assert responses[second]['gsn'][0]['detail'] == 'Goal'
+        assert client.call('metrics')['metrics']['cancelled'] == 1
+
+
+def test_cancel_running(socket_path):
+    with server.Client(socket_path, timeout=60) as client:
+        running = client.send('gsn', source='import time\ntime.sleep(1)\n' + source)
+        time.sleep(0.5)
+        cancel = client.send('cancel', target=running)
+        responses = {r['id']: r for r in (client.receive(), client.receive())}
+        assert responses[cancel]['cancelled'] and responses[running] == {'id': running, 'cancelled': True}
+        # The cancelled evaluation still runs in the worker
+        assert client.call('metrics')['metrics']['queue_depth'] == 1
+        time.sleep(1)
+        assert client.call('metrics')['metrics']['queue_depth'] == 0
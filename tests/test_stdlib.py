@@ -1,3 +1,4 @@
+import pytest
 import pgsn_term
 import stdlib
 from stdlib import lambda_abs, lambda_abs_vars, lambda_abs_keywords, plus, let
@@ -34,6 +35,53 @@ def test_fold():
     assert i.fully_eval().value == 2
 
 
+def test_fix():
+    f = stdlib.variable('f')
+    n = stdlib.variable('n')
+    # f n = if n == 0 then 0 else 2 + f (n - 1), counting down with negative numbers
+    count = stdlib.recursive(f, lambda_abs(n, stdlib.if_then_else(stdlib.equal(n)(stdlib.integer(0)))
+                                            (stdlib.integer(0))
+                                            (plus(stdlib.integer(2))(f(plus(n)(stdlib.integer(-1)))))))
+    assert stdlib.value_of(count(stdlib.integer(3))) == 6
+    # fix f is a normal form until applied
+    assert stdlib.fix(lambda_abs(f, f)).fully_eval() == stdlib.fix(lambda_abs(f, f)).remove_name()
+    t = stdlib.let_rec(f, lambda_abs(n, stdlib.if_then_else(n)(stdlib.true)(f(stdlib.true))), f(stdlib.false))
+    assert stdlib.value_of(t)
+
+
+def test_list_all():
+    x = stdlib.variable('x')
+    positive = lambda_abs(x, stdlib.boolean_not(stdlib.equal(x)(stdlib.integer(0))))
+    ll = stdlib.list_term((stdlib.integer(1), stdlib.integer(2)))
+    assert stdlib.value_of(stdlib.list_all(positive)(ll))
+    assert not stdlib.value_of(stdlib.list_all(positive)(stdlib.cons(stdlib.integer(0))(ll)))
+    # The predicate is evaluated with the steps and the engine of the evaluation
+    n = stdlib.variable('n')
+    y = stdlib.variable('y')
+    total = stdlib.foldr(lambda_abs_vars((x, y), plus(x)(y)))(stdlib.integer(0))
+    slow = lambda_abs(n, stdlib.equal(total(stdlib.range_term(stdlib.integer(0))(n)))(stdlib.integer(1225)))
+    ll = stdlib.list_term((stdlib.integer(50), stdlib.integer(50)))
+    with pytest.raises(pgsn_term.LambdaInterpreterError):
+        stdlib.value_of(slow(stdlib.integer(50)))
+    for engine in (None, 'need', 'compiled'):
+        assert stdlib.value_of(slow(stdlib.integer(50)), steps=100000, engine=engine)
+        assert stdlib.value_of(stdlib.list_all(slow)(ll), steps=100000, engine=engine)
+    # The evaluations of the elements share the steps
+    ll = stdlib.list_term((stdlib.integer(50),) * 4)
+    for engine in ('need', 'compiled'):
+        assert stdlib.value_of(slow(stdlib.integer(50)), steps=1000, engine=engine)
+        with pytest.raises(pgsn_term.LambdaInterpreterError):
+            stdlib.value_of(stdlib.list_all(slow)(ll), steps=1000, engine=engine)
+    # Open predicates and elements are not decided
+    p = stdlib.variable('p')
+    ll = stdlib.list_term((stdlib.integer(1), stdlib.integer(2)))
+    for engine in ('substitution', 'machine', 'need', 'focus', 'explicit', 'compiled'):
+        for t in (lambda_abs(p, stdlib.filter_term(p)(ll)), lambda_abs(p, stdlib.list_all(p)(ll)),
+                  lambda_abs(x, stdlib.filter_term(lambda_abs(y, y))(stdlib.list_term((x,))))):
+            nf = t.fully_eval(engine=engine)
+            assert isinstance(nf, pgsn_term.Abs) and nf == t.fully_eval(cache=False), engine
+
+
 def test_map():
     i1 = stdlib.integer(1)
     i2 = stdlib.integer(2)
@@ -225,3 +273,26 @@ def test_value_of():
 def test_format():
     f_string = stdlib.string('{x}, {y}, {z}')
     assert stdlib.value_of(stdlib.format_string(f_string, {'x':1, 'y': 'hoge', 'z': [1, 2]})) == '1, hoge, [1, 2]'
+
+
+def test_strict_list():
+    x = stdlib.variable('x')
+    i = [stdlib.integer(n) for n in range(4)]
+    ll = stdlib.list_term((i[1], i[2], i[3]))
+    assert stdlib.value_of(stdlib.length(ll)) == 3
+    assert stdlib.value_of(stdlib.is_empty(ll)) is False
+    assert stdlib.value_of(stdlib.is_empty(stdlib.empty))
+    assert stdlib.value_of(stdlib.append(ll)(stdlib.cons(i[0])(stdlib.empty))) == [1, 2, 3, 0]
+    assert stdlib.value_of(stdlib.reverse(ll)) == [3, 2, 1]
+    assert stdlib.value_of(stdlib.range_term(i[1])(i[3])) == [1, 2]
+    assert stdlib.value_of(stdlib.zip_term(ll)(stdlib.reverse(ll))) == [[1, 3], [2, 2], [3, 1]]
+    odd = lambda_abs(x, stdlib.boolean_not(stdlib.equal(x)(i[2])))
+    assert stdlib.value_of(stdlib.filter_term(odd)(ll)) == [1, 3]
+    with pytest.raises(pgsn_term.LambdaInterpreterError):
+        stdlib.filter_term(lambda_abs(x, x))(ll).fully_eval()
+    # [1, 2, 3] as binary digits
+    acc = stdlib.variable('acc')
+    binary = lambda_abs_vars((acc, x), plus(plus(acc)(acc))(x))
+    assert stdlib.value_of(stdlib.fold_left(binary)(i[0])(ll)) == 11
+    assert stdlib.value_of(stdlib.fold_right(stdlib.cons)(stdlib.empty)(ll)) == [1, 2, 3]
+    assert stdlib.value_of(stdlib.integer_sum(stdlib.range_term(i[0])(stdlib.integer(1000)))) == 499500
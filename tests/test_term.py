@@ -1,7 +1,11 @@
+import pytest
+import debug_info
+import gsn
 import meta_info
 import pgsn_term
 import stdlib
 from stdlib import let, lambda_abs, lambda_abs_vars
+from tests import engine_terms
 
 
 # import string_term
@@ -111,3 +115,98 @@ def test_self_reference():
                         ))
     assert f(one)(two).fully_eval().value == 5
 
+
+
+def test_free_annotations():
+    x = stdlib.variable('x')
+    y = stdlib.variable('y')
+    t = lambda_abs(x, x(y))
+    assert t.free_variables() == {'y'}
+    assert t.is_closed() is False
+    nameless = t.remove_name()
+    assert nameless.max_free_index() == 0
+    closed = lambda_abs(y, t).remove_name()
+    assert closed.is_closed()
+    assert closed.shift(1, 0) is closed
+    assert closed.subst_or_none(0, stdlib.integer(1).remove_name()) is None
+    assert nameless.shift(1, 0).max_free_index() == 1
+
+
+def test_trusted():
+    x = stdlib.variable('x')
+    t = lambda_abs(x, stdlib.plus(x)(stdlib.integer(1)))(stdlib.integer(2))
+    trusted = pgsn_term.trusted
+    pgsn_term.set_trusted(True)
+    try:
+        assert t.fully_eval() == stdlib.integer(3).remove_name()
+        # Validators of terms are skipped
+        pgsn_term.App.nameless(t1=stdlib.integer(1).remove_name(), t2=stdlib.integer(1))
+        # but not those of other classes
+        with pytest.raises(ValueError):
+            gsn.Strategy(description='Strategy', sub_goals=())
+        with pytest.raises(AssertionError):
+            debug_info.DebugInfo(source=None, location=1)
+    finally:
+        pgsn_term.set_trusted(trusted)
+    assert t.fully_eval() == stdlib.integer(3).remove_name()
+
+
+def test_remove_name():
+    x = stdlib.variable('x')
+    y = stdlib.variable('y')
+    z = stdlib.variable('z')
+    w = stdlib.variable('w')
+    nameless = lambda_abs_vars((x, y), x(y)(z)(w)).remove_name()
+    # Free variables are numbered after the binders in the order of the naming context ['w', 'z']
+    v = [pgsn_term.Variable.nameless(num=i) for i in range(4)]
+    assert nameless == pgsn_term.Abs.nameless(v=None, t=pgsn_term.Abs.nameless(v=None, t=v[1](v[0])(v[3])(v[2])))
+    # Shadowing
+    assert lambda_abs_vars((x, x), x).remove_name() == lambda_abs_vars((y, x), x).remove_name()
+    assert lambda_abs(x, let(x, x, x)).remove_name() == lambda_abs(x, lambda_abs(y, y)(x)).remove_name()
+    # Deep nesting
+    names = [stdlib.variable(f'x{i}') for i in range(200)]
+    t = lambda_abs_vars(names, names[0](z))
+    nameless = t.remove_name()
+    assert nameless.max_free_index() == 0
+    # The nameless form is memoized
+    assert t.remove_name() is nameless
+    assert t.remove_name_with_context(['z']) == nameless
+    closed = lambda_abs(z, t)
+    assert closed.remove_name_with_context(['a', 'b']) is closed.remove_name()
+
+
+engines = ('substitution', 'machine', 'need', 'focus', 'explicit', 'compiled')
+
+
+def test_capture():
+    x, y, z, a = (stdlib.variable(n) for n in ('x', 'y', 'z', 'a'))
+    cases = [
+        # The free variable of the argument is not captured by the binder it is substituted under
+        (lambda_abs(x, lambda_abs(y, x))(y), lambda_abs(z, y)),
+        (lambda_abs(x, lambda_abs(y, x(y)))(a(y)), lambda_abs(z, a(y)(z))),
+        # A redex under a binder, of which the argument is the bound variable
+        (lambda_abs(z, lambda_abs_vars((x, y), x)(z)), lambda_abs_vars((z, y), z)),
+        (lambda_abs_vars((z, a), lambda_abs_vars((x, y), x(y))(z)(a)), lambda_abs_vars((z, a), z(a))),
+        (lambda_abs(z, lambda_abs(x, lambda_abs(y, x(y)))(lambda_abs(a, z(a)))),
+         lambda_abs_vars((z, y), z(y))),
+    ]
+    for engine in engines:
+        for t, expected in cases:
+            assert t.fully_eval(engine=engine) == expected.remove_name(), (engine, t)
+
+
+def test_equal_variable():
+    x = stdlib.variable('x')
+    zero = stdlib.integer(0)
+    # equal does not compare a variable with a value, since the variable may be bound to the value
+    p = lambda_abs(x, stdlib.equal(x)(zero))
+    for engine in engines:
+        assert p.fully_eval(engine=engine) == p.remove_name()
+        assert p(zero).fully_eval(engine=engine).value
+        assert not p(stdlib.integer(1)).fully_eval(engine=engine).value
+
+
+@pytest.mark.parametrize('engine', engines[1:])
+@pytest.mark.parametrize('t', engine_terms.terms)
+def test_differential(t, engine):
+    assert t.fully_eval(steps=10000, engine=engine) == t.fully_eval(steps=10000)